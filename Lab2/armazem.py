@@ -0,0 +1,206 @@
+import sys
+import dbm
+import json
+import threading
+from collections import OrderedDict
+
+_SEM_PADRAO = object()
+"""Marcador de que nenhum valor padrão foi passado para o `pop`."""
+
+class ArmazemLRU:
+    """Componente Armazém - Guarda as entradas do dicionário com um limite de memória.
+    As entradas usadas mais recentemente ficam na memória, e quando o limite é
+    ultrapassado as menos usadas são movidas para um arquivo `dbm` em disco. Uma
+    entrada em disco volta para a memória quando é acessada de novo.
+
+    Pode ser usado no lugar do `dict` das entradas: implementa os métodos que o
+    `Dicionario` usa (`in`, `[]`, `get`, `pop`, `items`, `len` e iteração).
+
+    As entradas iniciais também podem ficar em um snapshot binário (`base`), que é
+    só lido: elas começam fora da memória e são lidas dele quando acessadas."""
+
+    def __init__(self, path, limite, dados=None, serializa=json.dumps, desserializa=json.loads, base=None, converte=None):
+        """Instancia um objeto `ArmazemLRU`. O arquivo em disco é recriado (vazio) a
+        cada execução, já que o estado do dicionário é salvo no snapshot e no log.
+
+        Args:
+            `path` (str): Caminho do arquivo `dbm` onde ficam as entradas que saíram da memória.
+            `limite` (int): Memória (em bytes) que as entradas na memória podem ocupar.
+            `dados` (dict, optional): Entradas iniciais.
+            `serializa` (Callable, optional): Função que converte uma lista de valores para ser guardada no disco.
+            `desserializa` (Callable, optional): Função que converte de volta uma lista de valores lida do disco.
+            `base` (Snapshot, optional): Snapshot binário com entradas iniciais, que começam fora da memória.
+            `converte` (Callable, optional): Função que converte uma lista de valores lida da `base`.
+        """
+
+        self._limite = limite
+        self._serializa = serializa
+        self._desserializa = desserializa
+        self._uso = 0 # Memória estimada das entradas na memória
+        self._quentes = OrderedDict() # Entradas na memória, da menos para a mais usada
+        self._tamanhos = {} # Memória estimada de cada entrada na memória
+        self._sujas = set() # Entradas na memória que mudaram desde que foram lidas do disco
+        self._frias = set() # Entradas que estão só no disco
+        self._base = base
+        self._converte = converte
+        self._na_base = set(base.chaves()) if base is not None else set() # Entradas que ainda estão só na base
+        self._lock = threading.Lock() # Até uma leitura altera a ordem de uso, então todo acesso usa o lock
+
+        # As entradas nunca são apagadas do arquivo (no dbm.dumb, apagar reescreve o índice inteiro):
+        # uma cópia no disco só vale enquanto a chave estiver em `_frias` ou for uma entrada limpa
+        self._db = dbm.open(path, 'n')
+
+        for key, values in (dados or {}).items():
+            self[key] = values
+
+    @staticmethod
+    def _tamanho(key, values):
+        """Estima a memória ocupada por uma entrada (a chave, a lista e os valores)."""
+
+        tamanho = sys.getsizeof(key) + sys.getsizeof(values)
+
+        # Numa lista, cada valor é um objeto separado (nos outros formatos, o tamanho já inclui os valores)
+        if isinstance(values, list):
+            tamanho += sum(sys.getsizeof(value) for value in values)
+        return tamanho
+
+    def _descarta(self):
+        """Move as entradas menos usadas para o disco até o uso de memória voltar ao limite.
+        Deve ser chamado com o `_lock`. A entrada mais usada sempre fica na memória."""
+
+        while self._uso > self._limite and len(self._quentes) > 1:
+            key, values = self._quentes.popitem(last=False)
+            self._uso -= self._tamanhos.pop(key)
+
+            # Só escreve no disco se a cópia do disco não estiver atualizada
+            if key in self._sujas:
+                self._db[key] = self._serializa(values)
+                self._sujas.discard(key)
+
+            self._frias.add(key)
+
+    def _carrega(self, key):
+        """Traz uma entrada do disco para a memória. Deve ser chamado com o `_lock`."""
+
+        if key in self._na_base:
+            # Entrada lida da base: a cópia no arquivo `dbm` ainda não existe, então ela conta como alterada
+            values = self._leBase(key)
+            self._na_base.discard(key)
+            self._sujas.add(key)
+        else:
+            values = self._desserializa(self._db[key])
+            self._frias.discard(key)
+
+        self._quentes[key] = values
+        self._tamanhos[key] = self._tamanho(key, values)
+        self._uso += self._tamanhos[key]
+        self._descarta()
+        return values
+
+    def _leBase(self, key):
+        """Lê uma entrada da base e converte a lista de valores dela."""
+
+        values = self._base.valores(key)
+        return self._converte(values) if self._converte else values
+
+    def __contains__(self, key):
+        return key in self._quentes or key in self._frias or key in self._na_base
+
+    def __len__(self):
+        return len(self._quentes) + len(self._frias) + len(self._na_base)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._quentes) + list(self._frias) + list(self._na_base))
+
+    def __getitem__(self, key):
+        with self._lock:
+            if key in self._quentes:
+                self._quentes.move_to_end(key)
+                return self._quentes[key]
+
+            if key in self._frias or key in self._na_base:
+                return self._carrega(key)
+
+        raise KeyError(key)
+
+    def get(self, key, padrao=None):
+        try:
+            return self[key]
+        except KeyError:
+            return padrao
+
+    def __setitem__(self, key, values):
+        """Guarda uma entrada na memória. Deve ser chamado de novo sempre que a
+        lista de valores de uma entrada for alterada, para atualizar o uso de memória
+        e para a cópia do disco deixar de valer."""
+
+        with self._lock:
+            self._frias.discard(key)
+            self._na_base.discard(key)
+            self._uso -= self._tamanhos.get(key, 0)
+
+            self._quentes[key] = values
+            self._quentes.move_to_end(key)
+            self._tamanhos[key] = self._tamanho(key, values)
+            self._uso += self._tamanhos[key]
+            self._sujas.add(key)
+
+            self._descarta()
+
+    def pop(self, key, padrao=_SEM_PADRAO):
+        with self._lock:
+            if key in self._quentes:
+                self._uso -= self._tamanhos.pop(key)
+                self._sujas.discard(key)
+                return self._quentes.pop(key)
+
+            if key in self._frias:
+                self._frias.discard(key)
+                return self._desserializa(self._db[key])
+
+            if key in self._na_base:
+                self._na_base.discard(key)
+                return self._base.valores(key)
+
+        if padrao is _SEM_PADRAO:
+            raise KeyError(key)
+        return padrao
+
+    def items(self):
+        """Percorre todas as entradas, sem mudar a ordem de uso nem trazer as
+        entradas do disco para a memória. As entradas da base são lidas em sequência,
+        na ordem do snapshot, e não passam pela `converte`.
+
+        Yields:
+            Tuple[str, List]: Cada par `(chave, valores)`.
+        """
+
+        with self._lock:
+            quentes, frias = list(self._quentes), list(self._frias)
+
+        for key in quentes:
+            with self._lock:
+                values = self._quentes.get(key)
+            if values is not None:
+                yield key, values
+
+        for key in frias:
+            with self._lock:
+                values = self._desserializa(self._db[key]) if key in self._frias else None
+            if values is not None:
+                yield key, values
+
+        if self._base is not None:
+            for key, values in self._base:
+                if key in self._na_base:
+                    yield key, values
+
+    def uso(self):
+        """Retorna o uso de memória estimado e o número de entradas na memória e no disco.
+
+        Returns:
+            Tuple[int, int, int]: Bytes usados, entradas na memória e entradas no disco.
+        """
+
+        return self._uso, len(self._quentes), len(self._frias) + len(self._na_base)
@@ -0,0 +1,276 @@
+#!/usr/bin/python3.8
+
+from cliente import Cliente
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+
+class Benchmark:
+    """Gerador de carga para o servidor do dicionário. Inicia um servidor em uma porta
+    local (ou usa um servidor já em execução), envia requisições por várias conexões
+    simultâneas e mede a vazão e a latência das requisições."""
+
+    def __init__(self, opcoes):
+        """Instancia um objeto `Benchmark`.
+
+        Args:
+            `opcoes` (dict): Configuração do benchmark (ver `OPCOES_PADRAO`).
+        """
+
+        self._opcoes = dict(OPCOES_PADRAO, **opcoes)
+        self._servidor = None
+
+    def iniciaServidor(self):
+        """Inicia o servidor em um subprocesso, com um dicionário em um diretório temporário,
+        e espera até que ele aceite conexões."""
+
+        op = self._opcoes
+        self._dir = tempfile.TemporaryDirectory()
+
+        comando = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'servidor.py'),
+                   op['endereco'], str(op['porta']), os.path.join(self._dir.name, 'dict.json'),
+                   '--nivel-log=ERRO'] + op['opcoes_servidor'].split()
+
+        # O stdin do servidor fica em um pipe, para que o benchmark possa enviar o QUIT
+        self._servidor = subprocess.Popen(comando, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True)
+
+        # Espera o servidor começar a aceitar conexões
+        for _ in range(100):
+            try:
+                socket.create_connection((op['endereco'], op['porta'])).close()
+                return
+            except OSError:
+                time.sleep(0.1)
+
+        raise RuntimeError("O servidor não iniciou")
+
+    def encerraServidor(self):
+        """Envia o comando QUIT para o servidor iniciado pelo benchmark e espera ele terminar."""
+
+        if not self._servidor:
+            return
+
+        self._servidor.communicate("QUIT\n", timeout=30)
+        self._dir.cleanup()
+
+    def carregaChaves(self):
+        """Escreve um valor em cada uma das chaves usadas no benchmark, usando os comandos em lote."""
+
+        op = self._opcoes
+        cli = Cliente(op['endereco'], op['porta'])
+        cli.conecta()
+        cli.enviaLote("WRITE chave" + str(i) + " " + 'x' * op['tam_valor'] for i in range(op['chaves']))
+        cli._conn.fechaConexao()
+
+    def executa(self):
+        """Executa o benchmark completo: inicia o servidor (se necessário), carrega as chaves,
+        gera a carga e calcula os resultados.
+
+        Returns:
+            dict: Configuração e resultados do benchmark.
+        """
+
+        op = self._opcoes
+
+        if not op['externo']:
+            self.iniciaServidor()
+
+        try:
+            self.carregaChaves()
+
+            # Divide as conexões entre os processos geradores de carga
+            n_processos = min(op['processos'], op['conexoes'])
+            conexoes = [op['conexoes'] // n_processos + (i < op['conexoes'] % n_processos) for i in range(n_processos)]
+
+            inicio = time.time()
+            with multiprocessing.Pool(n_processos) as pool:
+                parciais = pool.starmap(geraCarga, [(op, n, i) for i, n in enumerate(conexoes)])
+            duracao = time.time() - inicio
+        finally:
+            if not op['externo']:
+                self.encerraServidor()
+
+        return self.calculaResultados(parciais, duracao)
+
+    def calculaResultados(self, parciais, duracao):
+        """Junta as latências medidas por cada processo e calcula a vazão e os percentis.
+
+        Args:
+            `parciais` (List[dict]): Latências e erros medidos por cada processo.
+            `duracao` (float): Duração total da geração de carga, em segundos.
+
+        Returns:
+            dict: Configuração e resultados do benchmark.
+        """
+
+        resultados = {'config': self._opcoes, 'instante': time.strftime('%Y-%m-%dT%H:%M:%S'), 'operacoes': {}}
+
+        total = 0
+        for tipo in ('READ', 'WRITE'):
+            latencias = sorted(lat for parcial in parciais for lat in parcial['latencias'][tipo])
+            total += len(latencias)
+            resultados['operacoes'][tipo] = resumoLatencias(latencias)
+
+        todas = sorted(lat for parcial in parciais for lista in parcial['latencias'].values() for lat in lista)
+        resultados['total'] = resumoLatencias(todas)
+        resultados['duracao_s'] = duracao
+        resultados['vazao_ops'] = total / duracao
+        resultados['erros'] = sum(parcial['erros'] for parcial in parciais)
+        return resultados
+
+def percentil(ordenadas, p):
+    """Retorna o percentil `p` (entre 0 e 100) de uma lista ordenada."""
+
+    if not ordenadas:
+        return None
+    return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p / 100))]
+
+def resumoLatencias(latencias):
+    """Resume uma lista ordenada de latências (em segundos) em milissegundos."""
+
+    return {
+        'n': len(latencias),
+        'media_ms': sum(latencias) / len(latencias) * 1000 if latencias else None,
+        'p50_ms': percentil(latencias, 50) * 1000 if latencias else None,
+        'p99_ms': percentil(latencias, 99) * 1000 if latencias else None,
+        'p999_ms': percentil(latencias, 99.9) * 1000 if latencias else None,
+        'max_ms': latencias[-1] * 1000 if latencias else None,
+    }
+
+def distribuicaoChaves(op):
+    """Retorna uma função que sorteia a próxima chave, de acordo com a distribuição configurada.
+
+    Args:
+        `op` (dict): Configuração do benchmark.
+
+    Returns:
+        Callable[[random.Random], str]: Função que recebe um gerador aleatório e retorna uma chave.
+    """
+
+    chaves = ["chave" + str(i) for i in range(op['chaves'])]
+
+    if op['distribuicao'] == 'zipf':
+        # Peso da i-ésima chave mais popular é 1 / i^s. Os pesos acumulados deixam o sorteio em O(log n)
+        acumulado, soma = [], 0.0
+        for i in range(1, len(chaves) + 1):
+            soma += 1 / i ** op['zipf_s']
+            acumulado.append(soma)
+        return lambda rnd: rnd.choices(chaves, cum_weights=acumulado)[0]
+
+    return lambda rnd: chaves[rnd.randrange(len(chaves))]
+
+def geraCarga(op, n_conexoes, id_processo):
+    """Gera carga no servidor com `n_conexoes` conexões (uma thread por conexão).
+    Função executada em cada processo gerador de carga.
+
+    Args:
+        `op` (dict): Configuração do benchmark.
+        `n_conexoes` (int): Número de conexões abertas por este processo.
+        `id_processo` (int): Número do processo (usado na semente aleatória).
+
+    Returns:
+        dict: As latências (em segundos) de cada tipo de operação e o número de erros.
+    """
+
+    sorteiaChave = distribuicaoChaves(op)
+    valor = 'v' * op['tam_valor']
+    latencias = {'READ': [], 'WRITE': []}
+    erros = [0]
+    lock = threading.Lock()
+
+    def executaConexao(id_conexao):
+        rnd = random.Random(op['semente'] * 1000003 + id_processo * 1000 + id_conexao)
+        locais = {'READ': [], 'WRITE': []}
+
+        cli = Cliente(op['endereco'], op['porta'])
+        cli.conecta()
+        binario = op['protocolo'] == 'binario' and cli.ativaProtocoloBinario()
+
+        fim = time.perf_counter() + op['duracao']
+        while time.perf_counter() < fim:
+            chave = sorteiaChave(rnd)
+            tipo = 'READ' if rnd.random() < op['leituras'] else 'WRITE'
+
+            inicio = time.perf_counter()
+            try:
+                if binario:
+                    cli.le(chave) if tipo == 'READ' else cli.escreve(chave, valor)
+                else:
+                    cli.enviaComando(tipo + " " + chave if tipo == 'READ' else tipo + " " + chave + " " + valor)
+            except (OSError, RuntimeError):
+                with lock:
+                    erros[0] += 1
+                break
+            locais[tipo].append(time.perf_counter() - inicio)
+
+        cli._conn.fechaConexao()
+
+        with lock:
+            for tipo in locais:
+                latencias[tipo].extend(locais[tipo])
+
+    threads = [threading.Thread(target=executaConexao, args=[i]) for i in range(n_conexoes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {'latencias': latencias, 'erros': erros[0]}
+
+OPCOES_PADRAO = {
+    'endereco': 'localhost',
+    'porta': 5116,
+    'externo': False, # Se True, usa um servidor já em execução em vez de iniciar um
+    'opcoes_servidor': '', # Opções extras passadas para o servidor (ex.: '--async --log')
+    'conexoes': 16,
+    'processos': 4,
+    'duracao': 10.0,
+    'leituras': 0.9, # Fração das operações que são READ (o resto é WRITE)
+    'chaves': 10000,
+    'distribuicao': 'uniforme', # 'uniforme' ou 'zipf'
+    'zipf_s': 1.0,
+    'tam_valor': 16,
+    'protocolo': 'texto', # 'texto' ou 'binario'
+    'semente': 0,
+    'saida': 'benchmark.json',
+}
+"""Configuração padrão do benchmark. Cada opção pode ser alterada na linha de comando com `--opcao=valor`."""
+
+if __name__ == '__main__':
+    # Pega as opções da linha de comando (no formato --opcao=valor), convertendo para o tipo do valor padrão
+    opcoes = {}
+    for arg in sys.argv[1:]:
+        nome, _, valor = arg.lstrip('-').partition('=')
+        nome = nome.replace('-', '_')
+        if nome not in OPCOES_PADRAO:
+            print("Opção desconhecida: " + arg)
+            print("Opções disponíveis: " + ", ".join('--' + op.replace('_', '-') for op in OPCOES_PADRAO))
+            sys.exit(1)
+
+        padrao = OPCOES_PADRAO[nome]
+        if isinstance(padrao, bool):
+            opcoes[nome] = valor.lower() not in ('0', 'false', 'nao')
+        else:
+            opcoes[nome] = type(padrao)(valor)
+
+    resultados = Benchmark(opcoes).executa()
+
+    # Salva os resultados em json, para comparar execuções diferentes
+    with open(resultados['config']['saida'], 'w') as f:
+        json.dump(resultados, f, indent=2)
+
+    # Imprime um resumo dos resultados
+    print("Vazão: {:.0f} ops/s em {:.1f} s ({} erros)".format(resultados['vazao_ops'], resultados['duracao_s'], resultados['erros']))
+    for tipo, res in list(resultados['operacoes'].items()) + [('TOTAL', resultados['total'])]:
+        if res['n']:
+            print("{:6} n={:<8} p50={:.3f}ms p99={:.3f}ms p999={:.3f}ms max={:.3f}ms".format(
+                tipo, res['n'], res['p50_ms'], res['p99_ms'], res['p999_ms'], res['max_ms']))
+    print("Resultados salvos em " + resultados['config']['saida'])
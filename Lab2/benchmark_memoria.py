@@ -0,0 +1,94 @@
+#!/usr/bin/python3.8
+
+from dicionario import Dicionario
+
+import os
+import sys
+import json
+import time
+import random
+import resource
+import tempfile
+import multiprocessing
+
+def memoriaMaxima():
+    """Retorna o pico de memória residente do processo, em bytes."""
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024 # No Linux, o ru_maxrss é em kilobytes
+
+def medeRepresentacao(op, compacto):
+    """Carrega um dicionário com os valores do benchmark e mede a memória usada.
+    Executada em um processo novo para cada representação, para que uma medição
+    não interfira na outra.
+
+    Args:
+        `op` (dict): Configuração do benchmark.
+        `compacto` (bool): Se True, usa a representação compacta dos valores.
+
+    Returns:
+        dict: Memória usada e tempo de carga.
+    """
+
+    rnd = random.Random(op['semente'])
+    n_chaves = op['valores'] // op['por_chave']
+
+    with tempfile.TemporaryDirectory() as dir:
+        d = Dicionario(os.path.join(dir, 'dict.json'), compacto=compacto)
+        antes = memoriaMaxima()
+
+        # Cada valor é uma string nova, como se tivesse chegado por uma conexão
+        inicio = time.time()
+        for i in range(op['valores']):
+            d.setItem("chave" + str(i % n_chaves), "valor" + str(rnd.randrange(op['distintos'])))
+        duracao = time.time() - inicio
+
+        usada = memoriaMaxima() - antes
+
+    return {
+        'memoria_bytes': usada,
+        'bytes_por_valor': usada / op['valores'],
+        'carga_s': duracao,
+    }
+
+OPCOES_PADRAO = {
+    'valores': 5000000, # Número total de valores escritos
+    'por_chave': 5, # Número médio de valores por chave
+    'distintos': 100000, # Número de valores diferentes
+    'semente': 0,
+    'saida': 'benchmark_memoria.json',
+}
+"""Configuração padrão do benchmark. Cada opção pode ser alterada na linha de comando com `--opcao=valor`."""
+
+if __name__ == '__main__':
+    # Pega as opções da linha de comando (no formato --opcao=valor), convertendo para o tipo do valor padrão
+    opcoes = dict(OPCOES_PADRAO)
+    for arg in sys.argv[1:]:
+        nome, _, valor = arg.lstrip('-').partition('=')
+        nome = nome.replace('-', '_')
+        if nome not in OPCOES_PADRAO:
+            print("Opção desconhecida: " + arg)
+            print("Opções disponíveis: " + ", ".join('--' + op.replace('_', '-') for op in OPCOES_PADRAO))
+            sys.exit(1)
+        opcoes[nome] = type(OPCOES_PADRAO[nome])(valor)
+
+    # Mede cada representação em um processo novo (spawn), que começa sem nada na memória
+    contexto = multiprocessing.get_context('spawn')
+    resultados = {'config': opcoes, 'instante': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    for nome, compacto in (('lista', False), ('compacto', True)):
+        with contexto.Pool(1) as pool:
+            resultados[nome] = pool.apply(medeRepresentacao, (opcoes, compacto))
+
+    resultados['reducao'] = resultados['lista']['memoria_bytes'] / max(1, resultados['compacto']['memoria_bytes'])
+
+    # Salva os resultados em json, para comparar execuções diferentes
+    with open(opcoes['saida'], 'w') as f:
+        json.dump(resultados, f, indent=2)
+
+    # Imprime um resumo dos resultados
+    for nome in ('lista', 'compacto'):
+        res = resultados[nome]
+        print("{:8} {:8.1f} MB ({:.1f} bytes por valor), carga em {:.1f} s".format(
+            nome, res['memoria_bytes'] / 1024 ** 2, res['bytes_por_valor'], res['carga_s']))
+    print("Redução: {:.1f}x".format(resultados['reducao']))
+    print("Resultados salvos em " + opcoes['saida'])
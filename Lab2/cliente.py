@@ -1,6 +1,7 @@
 #!/usr/bin/python3.8 
 
 from conexao import Conexao
+import protocolo
 
 import sys
 
@@ -38,6 +39,203 @@ class Cliente:
         resp = self._conn.recebeMensagem()
         return resp
 
+    def enviaPaginado(self, comando):
+        """Envia um comando com resposta paginada (`PREFIX` ou `RANGE`) e recebe as
+        páginas da resposta conforme elas chegam, até a mensagem vazia que indica o fim.
+
+        Args:
+            `comando` (str): Comando que sera enviado para o servidor.
+
+        Yields:
+            str: Cada página da resposta. Deve ser consumido até o final antes de enviar outro comando.
+        """
+        self._conn.enviaMensagem(comando)
+
+        while True:
+            pagina = self._conn.recebeMensagem()
+            if not pagina: return # Fim da resposta (ou o servidor fechou a conexao)
+            yield pagina
+
+    def chavesPrefixo(self, prefixo, limite=None):
+        """Lista, em ordem, as chaves que começam com `prefixo`.
+
+        Args:
+            `prefixo` (str): O prefixo das chaves.
+            `limite` (int, optional): Número máximo de chaves.
+
+        Returns:
+            List[str]: As chaves encontradas.
+        """
+        comando = "PREFIX " + prefixo + ("" if limite is None else " " + str(limite))
+        return [chave for pagina in self.enviaPaginado(comando) for chave in pagina.split('\n')]
+
+    def chavesIntervalo(self, de, ate, limite=None):
+        """Lista, em ordem, as chaves entre `de` e `ate` (inclusive).
+
+        Args:
+            `de` (str): Menor chave do intervalo.
+            `ate` (str): Maior chave do intervalo.
+            `limite` (int, optional): Número máximo de chaves.
+
+        Returns:
+            List[str]: As chaves encontradas.
+        """
+        comando = "RANGE " + de + " " + ate + ("" if limite is None else " " + str(limite))
+        return [chave for pagina in self.enviaPaginado(comando) for chave in pagina.split('\n')]
+
+    def ativaProtocoloBinario(self):
+        """Troca a conexão para o protocolo binário. Depois disso, as operações devem
+        ser feitas pelos métodos `le`, `escreve`, `remove`, `leVarias`, `escreveVarias`
+        e `removeVarias`, e não mais por comandos de texto.
+
+        Returns:
+            bool: True se o servidor aceitou a troca de protocolo.
+        """
+
+        return self.enviaComando(protocolo.COMANDO_NEGOCIACAO) == "OK"
+
+    def enviaBinario(self, op, *campos):
+        """Envia uma operação do protocolo binário e retorna a resposta decodificada.
+
+        Args:
+            `op` (int): Código da operação (`protocolo.OP_*`).
+            `campos` (str): Chaves e valores da operação.
+
+        Returns:
+            Any: O conteúdo da resposta (lista de valores, booleano, etc.).
+
+        Raises:
+            RuntimeError: Se o servidor respondeu com uma mensagem de erro.
+        """
+
+        self._conn.enviaBytes(protocolo.codificaRequisicao(op, *campos))
+        tipo, valor = protocolo.decodificaResposta(self._conn.recebeBytes())
+
+        if tipo == protocolo.RESP_ERRO:
+            raise RuntimeError(valor)
+        return valor
+
+    def le(self, chave):
+        """Lê os valores da entrada `chave` (protocolo binário)."""
+        return self.enviaBinario(protocolo.OP_READ, chave)
+
+    def escreve(self, chave, valor):
+        """Adiciona `valor` na entrada `chave` e retorna se a entrada já existia (protocolo binário)."""
+        return self.enviaBinario(protocolo.OP_WRITE, chave, valor)
+
+    def remove(self, chave):
+        """Remove a entrada `chave` e retorna se ela existia (protocolo binário, apenas administrador)."""
+        return self.enviaBinario(protocolo.OP_REMOVE, chave)
+
+    def leVarias(self, chaves):
+        """Lê os valores de várias entradas, retornando uma lista por chave (protocolo binário)."""
+        return self.enviaBinario(protocolo.OP_MREAD, *chaves)
+
+    def escreveVarias(self, pares):
+        """Adiciona vários pares `(chave, valor)` e retorna, para cada um, se a entrada já existia (protocolo binário)."""
+        return self.enviaBinario(protocolo.OP_MWRITE, *[campo for par in pares for campo in par])
+
+    def removeVarias(self, chaves):
+        """Remove várias entradas e retorna, para cada uma, se ela existia (protocolo binário, apenas administrador)."""
+        return self.enviaBinario(protocolo.OP_MREMOVE, *chaves)
+
+    def operacaoLote(self, operacao):
+        """Converte uma linha de um arquivo de operações no comando e nos argumentos
+        que serão enviados ao servidor.
+
+        Args:
+            `operacao` (str): A linha, com um comando `READ`, `WRITE` ou `REMOVE`.
+
+        Returns:
+            Tuple[str, List[str]]: O comando e os argumentos, ou `None` se a linha for inválida.
+        """
+
+        comandos = operacao.split()
+
+        if comandos[0] in ("READ", "REMOVE") and len(comandos) == 2:
+            return comandos[0], comandos[1:]
+        if comandos[0] == "WRITE" and (len(comandos) == 3 or (len(comandos) == 5 and comandos[3] == "EX")):
+            return comandos[0], comandos[1:]
+        return None
+
+    def enviaLote(self, operacoes, tam_lote=1000, janela=4):
+        """Envia muitas operações para o servidor usando os comandos em lote
+        (`MREAD`, `MWRITE` e `MREMOVE`). Operações seguidas do mesmo tipo são
+        agrupadas em um único comando de até `tam_lote` operações, e até `janela`
+        comandos são enviados antes de esperar as respostas.
+
+        Todas as linhas são validadas antes do envio: uma linha inválida não é enviada,
+        e no lugar da resposta dela fica uma mensagem de erro. As escritas com tempo de
+        vida (`WRITE [chave] [valor] EX [segundos]`) são enviadas uma por vez, já que o
+        `MWRITE` não tem tempo de vida.
+
+        Args:
+            `operacoes` (str | Iterable[str]): Caminho de um arquivo com um comando
+                (`READ`, `WRITE` ou `REMOVE`) por linha, ou um iterável de comandos.
+            `tam_lote` (int, optional): Número máximo de operações por comando em lote.
+            `janela` (int, optional): Número máximo de comandos enviados sem resposta.
+
+        Returns:
+            List[str]: As respostas do servidor para cada comando enviado e as mensagens
+            das linhas inválidas, na ordem do arquivo.
+
+        Raises:
+            OSError: Se não foi possível ler o arquivo.
+        """
+
+        # Se recebeu um caminho de arquivo, le os comandos do arquivo
+        if isinstance(operacoes, str):
+            with open(operacoes, 'r', encoding='utf-8') as f:
+                return self.enviaLote(f.read().splitlines(), tam_lote, janela)
+
+        # Monta as mensagens antes de enviar qualquer uma. Cada item do plano é
+        # `(True, mensagem)` para enviar ao servidor ou `(False, erro)` para uma linha inválida
+        plano = []
+        comando_atual, args, n_ops = None, [], 0
+        for n_linha, operacao in enumerate(operacoes, 1):
+            if not operacao.split():
+                continue
+
+            op = self.operacaoLote(operacao)
+
+            # Quando o tipo da operação muda, o lote enche ou a operação não pode ir em lote, fecha o lote atual
+            if comando_atual and (op is None or op[0] != comando_atual or len(op[1]) > 2 or n_ops == tam_lote):
+                plano.append((True, 'M' + comando_atual + ' ' + ' '.join(args)))
+                comando_atual, args, n_ops = None, [], 0
+
+            if op is None:
+                plano.append((False, "Linha " + str(n_linha) + " inválida: '" + operacao.strip() + "'"))
+            elif len(op[1]) > 2:
+                plano.append((True, op[0] + ' ' + ' '.join(op[1]))) # Escrita com tempo de vida
+            else:
+                comando_atual = op[0]
+                args.extend(op[1])
+                n_ops += 1
+
+        if comando_atual:
+            plano.append((True, 'M' + comando_atual + ' ' + ' '.join(args)))
+
+        respostas = [None] * len(plano)
+        pendentes = [] # Posições dos comandos enviados que ainda não foram respondidos
+
+        for i, (envia, mensagem) in enumerate(plano):
+            if not envia:
+                respostas[i] = mensagem
+                continue
+
+            # Se a janela está cheia, espera a resposta mais antiga antes de enviar outro comando
+            if len(pendentes) == janela:
+                respostas[pendentes.pop(0)] = self._conn.recebeMensagem()
+
+            self._conn.enviaMensagem(mensagem)
+            pendentes.append(i)
+
+        # Recebe as respostas que faltam
+        for i in pendentes:
+            respostas[i] = self._conn.recebeMensagem()
+
+        return respostas
+
     def enviaRequisicoes(self):
         """Aceita entrada do usuário e envia como requisicao para o servidor.
         Continua aceitando entradas até que o usuário indique para parar o cliente.
@@ -52,6 +250,23 @@ class Cliente:
             result = self.validaComando(comando)
 
             if result == 'encerra': break # Se o usuario pedir para encerrar o cliente, sai do loop
+            elif result == 'lote':
+                # Envia as operações do arquivo em lote e imprime as respostas
+                try:
+                    with open(comando.split(' ')[1], 'r', encoding='utf-8') as f:
+                        operacoes = f.read().splitlines()
+                except OSError as e:
+                    print("Não foi possível ler o arquivo: " + str(e))
+                    continue
+
+                for resp in self.enviaLote(operacoes):
+                    print("\033[94mS >>\033[0m " + resp)
+                continue
+            elif result == 'paginado':
+                # Imprime as páginas da resposta conforme elas chegam
+                for pagina in self.enviaPaginado(comando):
+                    print("\033[94mS >>\033[0m " + pagina.replace('\n', '\n     '))
+                continue
             elif result != 'valido':
                 # Se o comando nao for valido, imprime as
                 # instrucoes do comando e recomeca o loop
@@ -81,6 +296,10 @@ class Cliente:
                 
                 Comando 'QUIT': Retorna a string `'encerra'`, indicando que deve encerrar o cliente.
                 
+                Comando 'LOAD': Retorna a string `'lote'`, indicando que deve enviar as operações de um arquivo em lote.
+                
+                Comandos 'PREFIX' e 'RANGE': Retorna a string `'paginado'`, indicando que a resposta vem em páginas.
+                
                 Qualquer outra string: Retorna a string `'valido'`, indicando que o comando pode ser enviado para o servidor.
         """
 
@@ -92,8 +311,32 @@ class Cliente:
             return "Uso do comando READ: READ [chave]"
         elif comandos[0] == "WRITE" and len(comandos) < 3:
             return "Uso do comando WRITE: WRITE [chave] [valor]"
+        elif comandos[0] == "WRITE" and len(comandos) > 3 and (comandos[3] != "EX" or len(comandos) != 5):
+            return "Uso do comando WRITE: WRITE [chave] [valor] EX [segundos]"
+        elif comandos[0] == "EXPIRE" and len(comandos) < 3:
+            return "Uso do comando EXPIRE: EXPIRE [chave] [segundos]"
         elif comandos[0] == "REMOVE" and len(comandos) < 2:
             return "Uso do comando REMOVE: REMOVE [chave]"
+        elif comandos[0] == "MREAD" and len(comandos) < 2:
+            return "Uso do comando MREAD: MREAD [chave] [chave] ..."
+        elif comandos[0] == "MWRITE" and (len(comandos) < 3 or len(comandos) % 2 == 0):
+            return "Uso do comando MWRITE: MWRITE [chave] [valor] [chave] [valor] ..."
+        elif comandos[0] == "MREMOVE" and len(comandos) < 2:
+            return "Uso do comando MREMOVE: MREMOVE [chave] [chave] ..."
+        elif comandos[0] == "FIND" and len(comandos) < 2:
+            return "Uso do comando FIND: FIND [valor]"
+        elif comandos[0] == "PREFIX":
+            if len(comandos) not in (2, 3) or not all(arg.isdigit() for arg in comandos[2:]):
+                return "Uso do comando PREFIX: PREFIX [prefixo] [limite]"
+            return "paginado" # Indica que a resposta vem em páginas
+        elif comandos[0] == "RANGE":
+            if len(comandos) not in (3, 4) or not all(arg.isdigit() for arg in comandos[3:]):
+                return "Uso do comando RANGE: RANGE [de] [ate] [limite]"
+            return "paginado" # Indica que a resposta vem em páginas
+        elif comandos[0] == "LOAD":
+            if len(comandos) < 2:
+                return "Uso do comando LOAD: LOAD [arquivo]"
+            return "lote" # Indica que as operações do arquivo devem ser enviadas em lote
         elif comandos[0] == "QUIT":
             return "encerra" # Indica que o cliente deve ser encerrado
         else:
@@ -110,7 +353,16 @@ class Cliente:
         print()
         print("\033[33mREAD [chave]          - \033[0mLê uma entrada do dicionário.")
         print("\033[33mWRITE [chave] [valor] - \033[0mEscreve uma nova entrada no dicionário.")
+        print("\033[33mWRITE [chave] [valor] EX [segundos] - \033[0mEscreve e define o tempo de vida da entrada.")
+        print("\033[33mEXPIRE [chave] [segundos] - \033[0mDefine o tempo de vida de uma entrada.")
         print("\033[33mREMOVE [chave]        - \033[0mRemove uma entrada do dicionário. \033[91m(Apenas para administrador)\033[0m")
+        print("\033[33mMREAD [chave] ...     - \033[0mLê várias entradas do dicionário.")
+        print("\033[33mMWRITE [chave] [valor] ... - \033[0mEscreve vários valores no dicionário.")
+        print("\033[33mLOAD [arquivo]        - \033[0mEnvia em lote os comandos de um arquivo (um por linha).")
+        print("\033[33mPREFIX [prefixo] [limite] - \033[0mLista as chaves que começam com o prefixo.")
+        print("\033[33mRANGE [de] [ate] [limite] - \033[0mLista as chaves entre duas chaves (inclusive).")
+        print("\033[33mFIND [valor]          - \033[0mLista as chaves que têm o valor.")
+        print("\033[33mSTATS                 - \033[0mMostra as estatísticas do servidor.")
         print("\033[33mQUIT                  - \033[0mEncerra o cliente.")
         print()
 
@@ -0,0 +1,204 @@
+import bisect
+import threading
+from array import array
+
+class TabelaValores:
+    """Tabela de valores - Guarda uma única cópia de cada valor diferente do dicionário
+    e dá um número (id) para ele. As listas de valores das entradas guardam só os ids,
+    e cada valor conta quantas vezes é usado, para sair da tabela quando não for mais usado."""
+
+    def __init__(self):
+        """Instancia uma `TabelaValores` vazia."""
+
+        self._ids = {} # Id de cada valor
+        self._strings = [] # Valor de cada id (None se o id estiver livre)
+        self._refs = array('I') # Número de usos de cada id
+        self._livres = [] # Ids liberados, que podem ser reaproveitados
+        self._lock = threading.Lock() # Entradas de partições diferentes podem ser alteradas ao mesmo tempo
+
+    def __len__(self):
+        return len(self._ids)
+
+    def idDe(self, value):
+        """Retorna o id do valor `value`, ou None se ele não estiver na tabela."""
+
+        return self._ids.get(value)
+
+    def registra(self, value):
+        """Registra mais um uso do valor `value`, adicionando ele na tabela se for novo.
+
+        Args:
+            `value` (str): O valor.
+
+        Returns:
+            int: O id do valor.
+        """
+
+        with self._lock:
+            i = self._ids.get(value)
+
+            if i is None:
+                # Valor novo: reaproveita um id livre ou cria um id novo
+                if self._livres:
+                    i = self._livres.pop()
+                    self._strings[i] = value
+                else:
+                    i = len(self._strings)
+                    self._strings.append(value)
+                    self._refs.append(0)
+                self._ids[value] = i
+
+            self._refs[i] += 1
+            return i
+
+    def libera(self, ids):
+        """Remove um uso de cada um dos ids. Os valores que não são mais usados saem da tabela.
+
+        Args:
+            `ids` (Iterable[int]): Os ids dos valores.
+        """
+
+        with self._lock:
+            for i in ids:
+                self._refs[i] -= 1
+                if not self._refs[i]:
+                    del self._ids[self._strings[i]]
+                    self._strings[i] = None
+                    self._livres.append(i)
+
+class ValoresCompactos:
+    """Lista de valores de uma entrada guardada como um array de ids da `TabelaValores`
+    (4 bytes por valor, em vez de um ponteiro e um objeto string por valor).
+
+    Se comporta como uma lista de strings para leitura (`len`, `[]`, iteração) e tem
+    o método `insert`, então funciona com o `bisect.insort`."""
+
+    __slots__ = ('_tabela', '_ids')
+
+    def __init__(self, tabela, values=()):
+        """Instancia um objeto `ValoresCompactos`.
+
+        Args:
+            `tabela` (TabelaValores): A tabela onde os valores são registrados.
+            `values` (Iterable[str], optional): Valores iniciais, já em ordem.
+        """
+
+        self._tabela = tabela
+        self._ids = array('I', [tabela.registra(value) for value in values])
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, i):
+        strings = self._tabela._strings
+
+        if isinstance(i, slice):
+            return [strings[j] for j in self._ids[i]]
+        return strings[self._ids[i]]
+
+    def __iter__(self):
+        strings = self._tabela._strings
+        return (strings[i] for i in self._ids)
+
+    def __eq__(self, outro):
+        return list(self) == list(outro)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + self._ids.__sizeof__()
+
+    def insert(self, i, value):
+        """Insere o valor `value` na posição `i`."""
+
+        self._ids.insert(i, self._tabela.registra(value))
+
+    def libera(self):
+        """Libera os valores na tabela, quando a entrada sai do dicionário."""
+
+        self._tabela.libera(self._ids)
+        self._ids = array('I')
+
+    def serializa(self):
+        """Retorna os ids dos valores em bytes, para guardar a entrada em disco.
+        Os usos dos valores na tabela continuam registrados, em nome da cópia em disco."""
+
+        return self._ids.tobytes()
+
+    @classmethod
+    def desserializa(cls, tabela, dados):
+        """Recria uma lista de valores guardada com `serializa`, sem registrar os usos
+        de novo (eles passam da cópia em disco para o objeto criado).
+
+        Args:
+            `tabela` (TabelaValores): A tabela dos valores.
+            `dados` (bytes): Os ids dos valores.
+
+        Returns:
+            ValoresCompactos: A lista de valores.
+        """
+
+        values = cls(tabela)
+        values._ids.frombytes(dados)
+        return values
+
+class IndiceValoresCompacto:
+    """Índice invertido do modo compacto - Guarda, para cada id de valor, um array
+    ordenado com os ids das chaves que têm esse valor (em vez de um `set` de strings).
+    As chaves ganham ids numa tabela própria, com um uso registrado por valor da chave.
+    Não tem lock próprio: o `Dicionario` usa o `_indice_lock`."""
+
+    def __init__(self, tabela):
+        """Instancia um `IndiceValoresCompacto` vazio.
+
+        Args:
+            `tabela` (TabelaValores): A tabela dos valores do dicionário.
+        """
+
+        self._tabela = tabela
+        self._chaves = TabelaValores()
+        self._indice = {} # Array com os ids das chaves de cada id de valor
+
+    def adiciona(self, key, value):
+        """ Registra que a entrada `key` tem o valor `value`."""
+
+        i = self._tabela.registra(value) # O índice também usa o valor, para o id continuar valendo
+        chaves = self._indice.setdefault(i, array('I'))
+        k = self._chaves.idDe(key)
+
+        pos = bisect.bisect_left(chaves, k) if k is not None else 0
+        if k is not None and pos < len(chaves) and chaves[pos] == k:
+            self._tabela.libera((i,)) # A chave já estava no conjunto do valor
+            return
+
+        k = self._chaves.registra(key)
+        chaves.insert(bisect.bisect_left(chaves, k), k)
+
+    def remove(self, key, values):
+        """ Remove a entrada `key` do conjunto de cada um dos seus valores `values`."""
+
+        k = self._chaves.idDe(key)
+        if k is None:
+            return
+
+        for value in set(values):
+            i = self._tabela.idDe(value)
+            chaves = self._indice.get(i)
+            if chaves is None:
+                continue
+
+            pos = bisect.bisect_left(chaves, k)
+            if pos < len(chaves) and chaves[pos] == k:
+                del chaves[pos]
+                if not chaves:
+                    del self._indice[i]
+                self._chaves.libera((k,))
+                self._tabela.libera((i,))
+
+    def busca(self, value):
+        """ Retorna, em ordem, as chaves que têm o valor `value`."""
+
+        chaves = self._indice.get(self._tabela.idDe(value), ())
+        strings = self._chaves._strings
+        return sorted(strings[k] for k in chaves)
@@ -1,5 +1,175 @@
 import socket
 
+_TAM_CABECALHO = 4
+"""Número de bytes no início de cada mensagem reservados para o tamanho dela."""
+
+_MAX_IOV = 512
+"""Número máximo de buffers passados de uma vez para o `sendmsg`."""
+
+class LeitorMensagens:
+    """Lê mensagens de um socket usando um buffer reutilizável. Os bytes são
+    recebidos com `recv_into` diretamente no buffer até que uma mensagem completa
+    esteja disponível, e os bytes que sobrarem (o início das próximas mensagens)
+    continuam no buffer para as próximas leituras."""
+
+    _TAM_MAXIMO = 256 * 1024 * 1024
+    """Tamanho máximo aceito para uma mensagem (protege contra cabeçalhos inválidos)."""
+
+    def __init__(self, sock, tam_buffer=64 * 1024):
+        """Instancia um objeto `LeitorMensagens` para o socket `sock`.
+
+        Args:
+            `sock` (socket): Socket de onde as mensagens serão lidas.
+            `tam_buffer` (int, optional): Tamanho inicial do buffer de leitura.
+        """
+
+        self._sock = sock
+        self._buffer = bytearray(tam_buffer)
+        self._inicio = 0 # Início dos bytes recebidos que ainda não foram consumidos
+        self._fim = 0 # Fim dos bytes recebidos
+
+    def _tamanhoProxima(self):
+        """Retorna o tamanho total (com cabeçalho) da próxima mensagem do buffer,
+        ou `None` se nem o cabeçalho dela chegou ainda."""
+
+        if self._fim - self._inicio < _TAM_CABECALHO:
+            return None
+
+        with memoryview(self._buffer) as buf:
+            tam = int.from_bytes(buf[self._inicio:self._inicio + _TAM_CABECALHO], byteorder='big', signed=False)
+
+        if tam > self._TAM_MAXIMO:
+            raise ConnectionError("Mensagem de " + str(tam) + " bytes excede o tamanho máximo")
+
+        return _TAM_CABECALHO + tam
+
+    def _reserva(self, tam):
+        """Garante que cabem `tam` bytes no buffer a partir de `_inicio`, movendo
+        os bytes não consumidos para o início do buffer ou aumentando ele."""
+
+        if self._inicio + tam <= len(self._buffer):
+            return
+
+        # Move os bytes não consumidos para o início do buffer
+        pendentes = self._fim - self._inicio
+        self._buffer[:pendentes] = self._buffer[self._inicio:self._fim]
+        self._inicio, self._fim = 0, pendentes
+
+        # Se ainda não couber, aumenta o buffer
+        if tam > len(self._buffer):
+            self._buffer.extend(bytes(tam - len(self._buffer)))
+
+    def _recebe(self):
+        """Recebe mais bytes do socket no final do buffer.
+
+        Returns:
+            bool: False se o outro lado fechou a conexão, True caso contrário.
+        """
+
+        # Se não há espaço no final do buffer, abre espaço
+        if self._fim == len(self._buffer):
+            self._reserva(self._fim - self._inicio + 1)
+
+        with memoryview(self._buffer) as buf:
+            n = self._sock.recv_into(buf[self._fim:])
+
+        self._fim += n
+        return n > 0
+
+    def recebeDisponivel(self):
+        """Recebe do socket os bytes que já chegaram (com uma única chamada ao `recv_into`),
+        sem esperar uma mensagem completa. Deve ser chamado quando o socket estiver
+        pronto para leitura, para não bloquear.
+
+        Returns:
+            bool: False se o outro lado fechou a conexão, True caso contrário.
+        """
+
+        # Se o cabeçalho já chegou, garante espaço para a mensagem inteira
+        tam = self._tamanhoProxima()
+        if tam is not None:
+            self._reserva(tam)
+
+        return self._recebe()
+
+    def temMensagem(self):
+        """Informa se já existe uma mensagem completa no buffer, que pode ser
+        lida sem receber mais nada do socket.
+
+        Returns:
+            bool: True se existe uma mensagem completa no buffer.
+        """
+
+        tam = self._tamanhoProxima()
+        return tam is not None and self._fim - self._inicio >= tam
+
+    def proximaMensagem(self, texto=False):
+        """Retorna a próxima mensagem, recebendo mais bytes do socket se necessário.
+
+        Args:
+            `texto` (bool, optional): Se True, decodifica a mensagem como UTF-8 direto do buffer.
+
+        Returns:
+            bytes | str: O conteúdo da mensagem (sem o cabeçalho). Se o outro
+            lado fechou a conexão, retorna `None`.
+        """
+
+        while not self.temMensagem():
+            # Se o cabeçalho já chegou, garante espaço para a mensagem inteira
+            tam = self._tamanhoProxima()
+            if tam is not None:
+                self._reserva(tam)
+
+            if not self._recebe():
+                return None
+
+        tam = self._tamanhoProxima()
+        with memoryview(self._buffer) as buf:
+            conteudo = buf[self._inicio + _TAM_CABECALHO:self._inicio + tam]
+            msg = str(conteudo, encoding='utf-8') if texto else bytes(conteudo)
+            conteudo.release()
+
+        # Consome a mensagem do buffer. Se o buffer ficou vazio, volta para o início dele
+        self._inicio += tam
+        if self._inicio == self._fim:
+            self._inicio = self._fim = 0
+
+        return msg
+
+def enviaQuadros(sock, mensagens):
+    """Envia uma ou mais mensagens (em bytes) pelo socket `sock`, cada uma precedida
+    do seu tamanho. Os cabeçalhos e mensagens são enviados juntos com `sendmsg`
+    (scatter-gather), sem concatená-los em um buffer novo.
+
+    Args:
+        `sock` (socket): Socket pelo qual as mensagens serão enviadas.
+        `mensagens` (List[bytes]): As mensagens a serem enviadas.
+    """
+
+    buffers = []
+    for msg in mensagens:
+        buffers.append(len(msg).to_bytes(_TAM_CABECALHO, 'big'))
+        buffers.append(msg)
+
+    # Sem sendmsg (ex.: Windows), junta tudo e usa sendall
+    if not hasattr(sock, 'sendmsg'):
+        sock.sendall(b''.join(buffers))
+        return
+
+    while buffers:
+        lote = buffers[:_MAX_IOV]
+        enviados = sock.sendmsg(lote)
+
+        # O sendmsg pode enviar só uma parte, então pula os buffers já enviados
+        # e continua do ponto onde ele parou
+        for i, buf in enumerate(lote):
+            if enviados < len(buf):
+                buffers = [memoryview(buf)[enviados:]] + buffers[i + 1:]
+                break
+            enviados -= len(buf)
+        else:
+            buffers = buffers[len(lote):]
+
 class Conexao:
     """Componente Conexão - Encapsula todo o código para enviar e receber mensagens através de um socket de rede."""
 
@@ -9,35 +179,48 @@ class Conexao:
     _PORTA = 5000
     """Porta do socket de conexão."""
 
-    _main_socket = socket.socket()
+    _main_socket = None
     """Socket principal."""
 
-    _conexoes = []
+    _conexoes = None
     """Lista de conexoes atualmente ativas."""
 
-    def __init__(self, end, porta):
+    _leitores = None
+    """Leitores de mensagens de cada socket (cada um guarda os bytes já recebidos do seu socket)."""
+
+    def __init__(self, end, porta, sock=None):
         """ Recebe um endereco IP e um numero de porta e instancia um objeto `Conexao`. 
 
         Args:
             `end` (str): Endereco IP para o socket de conexão.
             `porta` (int): Porta para o socket de conexão.
+            `sock` (socket, optional): Socket já conectado que será usado no lugar de um novo (ex.: um lado de um `socket.socketpair`).
         """
 
         self._ENDERECO = end
         self._PORTA = porta
 
+        # Cada objeto tem o seu próprio socket, então um processo pode ter várias conexões
+        self._main_socket = sock or socket.socket()
+        self._conexoes = []
+        self._leitores = {}
+
     def conecta(self):
         """Tenta se conectar com o endereço `_ENDERECO` na porta `_PORTA`"""
 
         self._main_socket.connect((self._ENDERECO, self._PORTA))
 
-    def iniciaServidor(self, n_conexoes):
+    def iniciaServidor(self, n_conexoes, reusa_porta=False):
         """Inicia um servidor na porta `_PORTA` que aceita ate `n_conexoes` conexoes.
 
         Args:
             `n_conexoes` (int): Numero de conexoes que o socket pode aceitar.
+            `reusa_porta` (bool, optional): Se True, outros processos também podem escutar na mesma
+                porta (`SO_REUSEPORT`), e o sistema operacional divide as novas conexões entre eles.
         """
 
+        if reusa_porta:
+            self._main_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self._main_socket.bind((self._ENDERECO, self._PORTA))
         self._main_socket.listen(n_conexoes)
 
@@ -50,8 +233,17 @@ class Conexao:
 
         sock, end = self._main_socket.accept()
         self._conexoes.append(sock)
+        self._leitores[sock] = LeitorMensagens(sock)
         return sock, end
 
+    def _leitor(self, sock):
+        """Retorna o leitor de mensagens do socket `sock`, criando um se ele ainda não existir."""
+
+        leitor = self._leitores.get(sock)
+        if not leitor:
+            leitor = self._leitores[sock] = LeitorMensagens(sock)
+        return leitor
+
     def recebeMensagem(self, sock=None):
         """Recebe uma nova mensagem da conexão `sock`. Se `sock` não  for informado, usa o `_main_socket`.
 
@@ -66,19 +258,55 @@ class Conexao:
         if not sock:
             sock = self._main_socket
 
-        # Pega o tamanho da mensagem lendo os 4 primeiros bytes
-        msg_len_raw = sock.recv(4)
-        if not msg_len_raw:
-            return None
+        # Le a mensagem completa (os 4 primeiros bytes indicam o tamanho dela) e transforma em string
+        return self._leitor(sock).proximaMensagem(texto=True)
 
-        # Transforma os 4 primeiros bytes em int para saber o tamanho da mensagem
-        msg_len = int.from_bytes(msg_len_raw, byteorder='big', signed=False)
+    def recebeBytes(self, sock=None):
+        """Recebe uma nova mensagem da conexão `sock` sem decodificá-la. Se `sock` não  for informado, usa o `_main_socket`.
 
-        # Recebe a mensagem completa
-        msg_raw = sock.recv(msg_len)
+        Args:
+            `sock` (socket, optional): Conexão que vai receber uma nova mensagem. Se não for informada usa `_main_socket`.
+
+        Returns:
+            bytes: A mensagem recebida. Se o outro lado fechou a conexão retorna `None`.
+        """
+
+        # Se sock for None, usa o _main_socket
+        if not sock:
+            sock = self._main_socket
+
+        return self._leitor(sock).proximaMensagem()
+
+    def recebeDisponivel(self, sock):
+        """Recebe os bytes que já chegaram na conexão `sock`, sem esperar uma mensagem
+        completa. As mensagens completas podem então ser lidas com `recebeBytes`
+        enquanto `temMensagem` for True.
+
+        Args:
+            `sock` (socket): Conexão pronta para leitura.
+
+        Returns:
+            bool: False se o outro lado fechou a conexão, True caso contrário.
+        """
+
+        return self._leitor(sock).recebeDisponivel()
+
+    def temMensagem(self, sock=None):
+        """Informa se já existe uma mensagem completa recebida da conexão `sock`,
+        que pode ser lida sem esperar o socket.
+
+        Args:
+            `sock` (socket, optional): Conexão que será verificada. Se não for informada usa `_main_socket`.
+
+        Returns:
+            bool: True se existe uma mensagem completa esperando para ser lida.
+        """
+
+        # Se sock for None, usa o _main_socket
+        if not sock:
+            sock = self._main_socket
 
-        # Transforma a mensagem recebida em string e retorna
-        return str(msg_raw,  encoding='utf-8')
+        return self._leitor(sock).temMensagem()
 
     def enviaMensagem(self, msg, sock=None):
         """Envia uma nova mensagem pela conexão `sock`. Se `sock` não  for informado, usa o `_main_socket`.
@@ -92,11 +320,36 @@ class Conexao:
         if not sock:
             sock = self._main_socket
         
-        # Transforma a string de mensagem em bytearray, colocando o tamanho da mensagem no inicio.
-        msg_raw = bytearray(len(msg).to_bytes(4, 'big')) + bytearray(msg, 'utf-8')
+        # Transforma a string de mensagem em bytes e envia, com o tamanho (em bytes) da mensagem no inicio
+        enviaQuadros(sock, [msg.encode('utf-8')])
+
+    def enviaBytes(self, msg, sock=None):
+        """Envia uma mensagem já codificada em bytes pela conexão `sock`. Se `sock` não  for informado, usa o `_main_socket`.
 
-        # Envia a mensagem
-        sock.send(msg_raw)
+        Args:
+            `msg` (bytes): A mensagem a ser enviada.
+            `sock` (socket, optional): Conexão pela qual vai ser enviada uma nova mensagem. Se não for informada usa `_main_socket`.
+        """
+
+        # Se sock for None, usa o _main_socket
+        if not sock:
+            sock = self._main_socket
+
+        enviaQuadros(sock, [msg])
+
+    def enviaMensagens(self, msgs, sock=None):
+        """Envia várias mensagens de uma vez pela conexão `sock`. Se `sock` não  for informado, usa o `_main_socket`.
+
+        Args:
+            `msgs` (List[str | bytes]): As mensagens a serem enviadas.
+            `sock` (socket, optional): Conexão pela qual vão ser enviadas as mensagens. Se não for informada usa `_main_socket`.
+        """
+
+        # Se sock for None, usa o _main_socket
+        if not sock:
+            sock = self._main_socket
+
+        enviaQuadros(sock, [msg.encode('utf-8') if isinstance(msg, str) else msg for msg in msgs])
     
     def fechaConexao(self, sock=None):
         """Fecha a conexão `sock`. Se `sock` não  for informado, usa o `_main_socket`.
@@ -111,10 +364,22 @@ class Conexao:
         else:
             # Se sock nao for a conexao principal, remove da lista de conexoes
             self._conexoes.remove(sock)
+
+        # Descarta o leitor de mensagens da conexao
+        self._leitores.pop(sock, None)
         
         # Fecha a conexao sock
         sock.close()
     
+    def numeroConexoes(self):
+        """Retorna o número de conexoes ativas.
+
+        Returns:
+            int: Número de conexoes ativas.
+        """
+
+        return len(self._conexoes)
+
     def temConexoes(self):
         """Informa se ainda existem conexoes ativas.
 
@@ -1,5 +1,159 @@
 import os
+import gc
+import glob
 import json
+import time
+import heapq
+import bisect
+import shutil
+import threading
+
+import snapshot
+from armazem import ArmazemLRU
+from compacto import TabelaValores, ValoresCompactos, IndiceValoresCompacto
+
+def fimPrefixo(prefixo):
+    """ Retorna a menor string maior que todas as strings que começam com `prefixo`,
+    ou `None` se esse limite não existir (prefixo vazio).
+
+    Args:
+        `prefixo` (str): O prefixo.
+
+    Returns:
+        str: O limite superior (exclusivo) das strings com o prefixo.
+    """
+    prefixo = prefixo.rstrip(chr(0x10ffff))
+    if not prefixo:
+        return None
+
+    # Troca o último caractere pelo seguinte (ex.: 'cas' -> 'cat')
+    return prefixo[:-1] + chr(ord(prefixo[-1]) + 1)
+
+def escreveArquivo(path, partes, modo='w'):
+    """ Escreve um texto no arquivo `path` de forma atômica,
+    escrevendo primeiro em um arquivo temporário e depois substituindo o original.
+
+    Args:
+        `path` (str): Caminho do arquivo.
+        `partes` (Iterable[str]): Pedaços do texto, escritos conforme são gerados.
+        `modo` (str, optional): Modo de abertura do arquivo (`'wb'` para pedaços em bytes).
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, modo) as f:
+        for parte in partes:
+            f.write(parte)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+
+def escreveSnapshot(dict_path, entradas, expiracoes):
+    """ Escreve as entradas de um dicionario no arquivo `dict_path` e as expirações
+    das chaves no arquivo `[dict_path].expira`. As entradas são salvas no formato
+    binário do componente `snapshot`, uma entrada por vez, sem montar o arquivo
+    inteiro na memória.
+
+    Args:
+        `dict_path` (str): Caminho do arquivo do dicionario.
+        `entradas` (Iterable[Tuple[str, List]]): Pares `(chave, valores)` que serão salvos.
+        `expiracoes` (dict): Instante de expiração de cada chave com tempo de vida.
+    """
+    expira_path = dict_path + '.expira'
+
+    # As expirações são escritas antes, então uma chave do snapshot nunca fica sem a sua expiração
+    if expiracoes:
+        escreveArquivo(expira_path, [json.dumps(expiracoes)])
+    elif os.path.isfile(expira_path):
+        os.remove(expira_path)
+
+    escreveArquivo(dict_path, snapshot.codifica(entradas), 'wb')
+
+def removeArquivos(dict_path):
+    """ Remove o arquivo de um dicionario e todos os arquivos auxiliares dele
+    (log, expirações, entradas frias e temporários).
+
+    Args:
+        `dict_path` (str): Caminho do arquivo do dicionario.
+    """
+    for path in [dict_path] + glob.glob(glob.escape(dict_path) + '.*'):
+        if os.path.isfile(path):
+            os.remove(path)
+
+def divideDicionario(dict_path, paths, particao, usa_log=False):
+    """ Divide o dicionario salvo em `dict_path` em vários dicionarios, um para cada
+    partição das chaves (usado pelo servidor com vários processos). O dicionario
+    original não é alterado.
+
+    Args:
+        `dict_path` (str): Caminho do arquivo do dicionario.
+        `paths` (List[str]): Caminhos dos arquivos de cada partição.
+        `particao` (Callable[[str], int]): Função que retorna a partição (índice de `paths`) de uma chave.
+        `usa_log` (bool, optional): Se o dicionario usa o log de escrita (que é reaplicado antes da divisão).
+    """
+    origem = Dicionario(dict_path, usa_log=usa_log)
+    entradas, expiracoes = origem._estadoPersistente(copia=False)
+
+    partes = [[] for _ in paths]
+    for key, values in entradas:
+        partes[particao(key)].append((key, values))
+
+    for path, parte in zip(paths, partes):
+        removeArquivos(path) # Restos de uma divisão anterior
+        escreveSnapshot(path, parte, {key: expiracoes[key] for key, _ in parte if key in expiracoes})
+
+    origem.fecha()
+
+def juntaDicionarios(paths, dict_path):
+    """ Junta os dicionarios das partições `paths` (criados por `divideDicionario`)
+    no arquivo `dict_path`, e remove os arquivos das partições.
+
+    Args:
+        `paths` (List[str]): Caminhos dos arquivos de cada partição.
+        `dict_path` (str): Caminho do arquivo do dicionario.
+    """
+    entradas, expiracoes = [], {}
+    for path in paths:
+        # Reaplica o log da partição, se ela usava um
+        parte = Dicionario(path, usa_log=os.path.isfile(path + '.log'))
+        entradas_parte, expiracoes_parte = parte._estadoPersistente()
+        entradas.extend(entradas_parte)
+        expiracoes.update(expiracoes_parte)
+        parte.fecha()
+
+    escreveSnapshot(dict_path, entradas, expiracoes)
+
+    # O log do dicionario é anterior à divisão, e as partições já têm as alterações dele
+    for path in (dict_path + '.log', dict_path + '.log.antigo'):
+        if os.path.isfile(path):
+            os.remove(path)
+
+    for path in paths:
+        removeArquivos(path)
+
+class IndiceValores:
+    """Índice invertido do dicionário - Guarda, para cada valor, o conjunto das chaves
+    que têm esse valor. Não tem lock próprio: o `Dicionario` usa o `_indice_lock`."""
+
+    def __init__(self):
+        """Instancia um `IndiceValores` vazio."""
+        self._indice = {}
+
+    def adiciona(self, key, value):
+        """ Registra que a entrada `key` tem o valor `value`."""
+        self._indice.setdefault(value, set()).add(key)
+
+    def remove(self, key, values):
+        """ Remove a entrada `key` do conjunto de cada um dos seus valores `values`."""
+        for value in set(values):
+            chaves = self._indice.get(value)
+            if chaves is not None:
+                chaves.discard(key)
+                if not chaves:
+                    del self._indice[value]
+
+    def busca(self, value):
+        """ Retorna, em ordem, as chaves que têm o valor `value`."""
+        return sorted(self._indice.get(value, ()))
 
 class Dicionario:
     """Componente Dicionário - Implementa o acesso, a remoção e a edição do dicionário
@@ -8,36 +162,427 @@ class Dicionario:
     _DICT_FILE_PATH = ''
     """Caminho para o arquivo que guarda o dicionario"""
 
+    _LOG_FILE_PATH = ''
+    """Caminho para o arquivo de log de escrita (usado apenas no modo de log)."""
+
+    _EXPIRA_FILE_PATH = ''
+    """Caminho para o arquivo que guarda os instantes de expiração das chaves."""
+
+    _LIMITE_LOG = 4 * 1024 * 1024
+    """Tamanho (em bytes) a partir do qual o log é compactado em um novo snapshot."""
+
     _dict = {}
     """Dicionario que guarda os pares chave-valor."""
 
-    def __init__(self, dict_path):
-        """ Recebe um arquivo contendo o dicionario em json
-        e inctancia um objeto `Dicionario`. Se o caminho de arquivo
-        informado não existir, cria o arquivo.
+    _chaves = []
+    """Lista ordenada das chaves do dicionario (índice usado nas buscas por prefixo e intervalo)."""
+
+    _valores = None
+    """Índice invertido, que guarda para cada valor as chaves que têm esse valor
+    (`IndiceValores`, ou `IndiceValoresCompacto` no modo compacto). É `None` com limite
+    de memória, já que o índice guardaria todos os valores na memória."""
+
+    _indice_lock = None
+    """Lock dos índices de chaves e de valores, já que entradas de partições diferentes podem ser alteradas ao mesmo tempo."""
+
+    _expiracoes = {}
+    """Instante (em segundos desde a época) em que cada chave com tempo de vida expira."""
+
+    _fila_expiracao = []
+    """Heap de pares `(instante, chave)`, ordenado pelo instante de expiração. Pode ter
+    pares antigos (de chaves removidas ou com a expiração alterada), que são ignorados."""
+
+    _expira_lock = None
+    """Lock das expirações, já que chaves de partições diferentes podem receber um tempo de vida ao mesmo tempo."""
+
+    _tabela = None
+    """Tabela dos valores distintos do dicionario. É `None` se a representação compacta estiver desativada."""
+
+    _log = None
+    """Arquivo de log aberto para escrita. É `None` se o modo de log estiver desativado."""
+
+    _compactacao = None
+    """Thread da compactação do log (ou do snapshot periódico) em andamento, se houver."""
+
+    _intervalo_snapshot = None
+    """Intervalo (em segundos) entre dois snapshots periódicos. É `None` se eles não forem feitos por tempo."""
+
+    _escritas_snapshot = None
+    """Número de alterações que dispara um snapshot periódico. É `None` se eles não forem feitos por alterações."""
+
+    _alteracoes = 0
+    """Número de alterações do dicionario desde o último snapshot."""
+
+    _ultimo_snapshot = 0
+    """Instante (em segundos desde a época) do último snapshot."""
+
+    _log_lock = None
+    """Lock para escrita no arquivo de log, já que entradas diferentes podem ser alteradas ao mesmo tempo."""
+
+    _tam_log = 0
+    """Tamanho (em bytes) do log atual. Atualizado com o `_log_lock`, junto com as escritas no log,
+    para ser lido sem acessar o arquivo (que pode estar sendo fechado por uma compactação)."""
+
+    def __init__(self, dict_path, usa_log=False, limite_log=None, limite_memoria=None, compacto=False,
+                 intervalo_snapshot=None, escritas_snapshot=None):
+        """ Recebe um arquivo contendo o dicionario (no formato binário do
+        componente `snapshot`, ou em json) e inctancia um objeto `Dicionario`.
+        Se o caminho de arquivo informado não existir, cria o arquivo. Um
+        arquivo em json é convertido para o formato binário ao ser carregado.
+
+        No modo de log, cada alteração do dicionário é adicionada ao final
+        de um arquivo de log (`[dict_path].log`) em vez de reescrever o arquivo
+        inteiro. Ao iniciar, o dicionário é reconstruído a partir do snapshot
+        (`dict_path`) e do log.
 
         Args:
             `dict_path` (str): Caminho para o arquivo contendo o dicionario
+            `usa_log` (bool, optional): Ativa o modo de log de escrita.
+            `limite_log` (int, optional): Tamanho do log (em bytes) que dispara uma compactação.
+            `limite_memoria` (int, optional): Memória (em bytes) que as entradas podem ocupar. Se for
+                informado, as entradas menos usadas são movidas para o arquivo `[dict_path].frio`.
+            `compacto` (bool, optional): Guarda cada valor distinto uma vez só, e as listas de valores
+                das entradas como arrays de ids (`ValoresCompactos`), em vez de listas de strings.
+            `intervalo_snapshot` (float, optional): Intervalo (em segundos) entre snapshots periódicos.
+            `escritas_snapshot` (int, optional): Número de alterações que dispara um snapshot periódico.
         """
         self._DICT_FILE_PATH = dict_path
+        self._LOG_FILE_PATH = dict_path + '.log'
+        self._EXPIRA_FILE_PATH = dict_path + '.expira'
+        self._dict = {}
+        self._expiracoes = {}
+        self._log_lock = threading.Lock()
+        self._indice_lock = threading.Lock()
+        self._expira_lock = threading.Lock()
+        self._tabela = TabelaValores() if compacto else None
+        self._intervalo_snapshot = intervalo_snapshot
+        self._escritas_snapshot = escritas_snapshot
+        self._alteracoes = 0
+        self._ultimo_snapshot = time.time()
+
+        if limite_log is not None:
+            self._LIMITE_LOG = limite_log
+
+        base = None # Snapshot binário de onde as entradas são lidas quando forem acessadas (com limite de memória)
+        converte = False # Se o arquivo está em json e deve ser convertido para o formato binário
+
+        # A carga cria muitas listas de uma vez, e o coletor de lixo não teria nada para liberar nelas
+        coletor = gc.isenabled()
+        gc.disable()
 
         # Se o arquivo nao existir, ele chama saveDict, que cria um 
         # arquivo e escreve o dicionario vazio nele
         if not os.path.isfile(self._DICT_FILE_PATH):
             self.saveDict()
+        elif snapshot.ehBinario(self._DICT_FILE_PATH):
+            # Com limite de memória, as entradas ficam no snapshot até serem acessadas.
+            # Sem o limite, o snapshot é lido em sequência, uma entrada por vez
+            base = snapshot.Snapshot(self._DICT_FILE_PATH)
+            if limite_memoria is None:
+                for key, values in base:
+                    self._dict[key] = self._compacta(values)
+                base.fecha()
+                base = None
+        else:
+            # Snapshot antigo, em json: le o dicionario inteiro
+            with open(self._DICT_FILE_PATH, 'r') as f:
+                self._dict = json.loads(f.read())
+            converte = True
+
+            # Converte as listas de valores (uma por vez, liberando as listas originais)
+            if self._tabela is not None:
+                for key in self._dict:
+                    self._dict[key] = self._compacta(self._dict[key])
+
+        # Le os instantes de expiração, se alguma chave tiver tempo de vida
+        if os.path.isfile(self._EXPIRA_FILE_PATH):
+            with open(self._EXPIRA_FILE_PATH, 'r') as f:
+                self._expiracoes = json.loads(f.read())
+
+        # Com limite de memória, as entradas passam para um armazém que move as menos usadas para o disco
+        if limite_memoria is not None:
+            if self._tabela is not None:
+                # No disco, a entrada compacta guarda só os ids (a tabela continua na memória)
+                self._dict = ArmazemLRU(dict_path + '.frio', limite_memoria, self._dict, ValoresCompactos.serializa,
+                                        lambda dados: ValoresCompactos.desserializa(self._tabela, dados),
+                                        base=base, converte=self._compacta)
+            else:
+                self._dict = ArmazemLRU(dict_path + '.frio', limite_memoria, self._dict, base=base)
+
+        if usa_log:
+            # Reaplica os logs que ainda não foram incorporados ao snapshot.
+            # O log antigo só existe se uma compactação foi interrompida.
+            self._reaplicaLog(self._LOG_FILE_PATH + '.antigo')
+            self._reaplicaLog(self._LOG_FILE_PATH)
+
+            # Abre o log para adicionar novos registros no final
+            self._log = open(self._LOG_FILE_PATH, 'a', encoding='utf-8')
+            self._tam_log = os.path.getsize(self._LOG_FILE_PATH)
+
+        # Descarta as chaves que expiraram enquanto o servidor estava parado
+        # e monta a fila de expiração com as restantes
+        agora = time.time()
+        for key, instante in list(self._expiracoes.items()):
+            if instante <= agora or key not in self._dict:
+                self._libera(self._dict.pop(key, None))
+                del self._expiracoes[key]
+        self._fila_expiracao = [(instante, key) for key, instante in self._expiracoes.items()]
+        heapq.heapify(self._fila_expiracao)
+
+        # Monta o índice ordenado das chaves e o índice invertido dos valores carregados.
+        # Com limite de memória, o índice invertido não é montado, e o `buscaValor` percorre as entradas
+        self._chaves = sorted(self._dict)
+        if limite_memoria is None:
+            self._valores = IndiceValoresCompacto(self._tabela) if self._tabela is not None else IndiceValores()
+            for key, values in self._dict.items():
+                for value in values:
+                    self._valores.adiciona(key, value)
+
+        if coletor:
+            gc.enable()
+
+        # Grava o snapshot em json no formato binário, para as próximas cargas
+        if converte:
+            self.saveDict()
+
+    def _reaplicaLog(self, path):
+        """ Reaplica no dicionario os registros de um arquivo de log.
+
+        Cada registro guarda o estado final da entrada alterada (ou o instante
+        de expiração dela), então reaplicar um registro que já está no snapshot
+        não altera o dicionario.
+
+        Args:
+            `path` (str): Caminho do arquivo de log.
+        """
+        if not os.path.isfile(path):
+            return
+
+        with open(path, 'r', encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                except json.JSONDecodeError:
+                    # Registro incompleto (o servidor caiu no meio da escrita), ignora o resto
+                    break
+
+                if registro[0] == 'S':
+                    self._libera(self._dict.get(registro[1]))
+                    self._dict[registro[1]] = self._compacta(registro[2])
+                elif registro[0] == 'R':
+                    self._libera(self._dict.pop(registro[1], None))
+                    self._expiracoes.pop(registro[1], None)
+                elif registro[0] == 'E':
+                    self._expiracoes[registro[1]] = registro[2]
+
+    def _compacta(self, values):
+        """ Converte uma lista de valores para a representação usada no dicionario.
+
+        Args:
+            `values` (List[str]): Lista de valores, em ordem.
+
+        Returns:
+            List[str] | ValoresCompactos: A própria lista, ou a lista compacta no modo compacto.
+        """
+        return ValoresCompactos(self._tabela, values) if self._tabela is not None else values
+
+    def _libera(self, values):
+        """ Libera os valores de uma entrada que saiu do dicionario (só faz algo no modo compacto).
+
+        Args:
+            `values` (List[str] | ValoresCompactos): Os valores da entrada, ou `None`.
+        """
+        if isinstance(values, ValoresCompactos):
+            values.libera()
+
+    def _registra(self, *registros):
+        """ Adiciona registros no final do log, se o modo de log estiver ativo.
+        Todos os registros são escritos de uma vez só.
+
+        Args:
+            `registros` (list): Registros das alterações (`['S', chave, valores]`, `['R', chave]` ou `['E', chave, instante]`).
+        """
+        # Conta as alterações para os snapshots periódicos (sem lock: a contagem só precisa ser aproximada)
+        self._alteracoes += len(registros)
+
+        if not self._log or not registros:
             return
 
-        # Se o arquivo existe, le o dicionario dele
-        with open(self._DICT_FILE_PATH, 'r') as f:
-            self._dict = json.loads(f.read())
+        linhas = ''.join(json.dumps(registro, separators=(',', ':')) + '\n' for registro in registros)
+
+        with self._log_lock:
+            if self._log: # O log pode ter sido fechado (`fecha`) enquanto esta thread esperava o lock
+                self._log.write(linhas)
+                self._log.flush()
+                self._tam_log += len(linhas)
+
+    def _escreveSnapshot(self, entradas, expiracoes):
+        """ Escreve as entradas do dicionario no arquivo `_DICT_FILE_PATH` e as expirações
+        das chaves no arquivo `_EXPIRA_FILE_PATH` (ver `escreveSnapshot`).
+
+        Args:
+            `entradas` (Iterable[Tuple[str, List]]): Pares `(chave, valores)` que serão salvos.
+            `expiracoes` (dict): Instante de expiração de cada chave com tempo de vida.
+        """
+        escreveSnapshot(self._DICT_FILE_PATH, entradas, expiracoes)
+
+    def _estadoPersistente(self, copia=True):
+        """ Retorna o estado atual do dicionario para ser salvo, sem as chaves já expiradas.
+
+        Args:
+            `copia` (bool, optional): Se True, copia as entradas (para serem salvas enquanto o
+                dicionario continua sendo alterado). Se False, as entradas são lidas durante a escrita.
+
+        Returns:
+            Tuple[Iterable[Tuple[str, List]], dict]: As entradas e as expirações.
+        """
+        agora = time.time()
+        expiradas = {key for key, instante in self._expiracoes.items() if instante <= agora}
+
+        entradas = ((key, list(value)) for key, value in self._dict.items() if key not in expiradas)
+        if copia:
+            entradas = list(entradas)
+
+        expiracoes = {key: instante for key, instante in self._expiracoes.items() if key not in expiradas}
+        return entradas, expiracoes
 
     def saveDict(self):
-        """ Salva o dicionario para o arquivo json
+        """ Salva o dicionario para o arquivo do snapshot
         """
         
-        # Salva o dicionario inteiro no arquivo em _DICT_FILE_PATH
-        with open(self._DICT_FILE_PATH, 'w') as f:
-            f.write(json.dumps(self._dict))
+        # Espera alguma compactação em andamento terminar
+        if self._compactacao:
+            self._compactacao.join()
+
+        # Salva o dicionario inteiro (sem as chaves expiradas) no arquivo em _DICT_FILE_PATH
+        self._escreveSnapshot(*self._estadoPersistente(copia=False))
+        self._alteracoes = 0
+        self._ultimo_snapshot = time.time()
+
+        # Com o snapshot atualizado, os logs não são mais necessários. O log antigo (de uma
+        # compactação que falhou) é apagado antes do atual: reaplicado sem o log atual, ele
+        # voltaria as entradas para um estado antigo
+        antigo_path = self._LOG_FILE_PATH + '.antigo'
+        if os.path.isfile(antigo_path):
+            os.remove(antigo_path)
+
+        if self._log:
+            with self._log_lock:
+                self._log.close()
+                self._log = open(self._LOG_FILE_PATH, 'w', encoding='utf-8')
+                self._tam_log = 0
+
+    def fecha(self):
+        """ Fecha o arquivo de log, sem salvar o dicionario (para descartar o objeto)."""
+        if self._compactacao:
+            self._compactacao.join()
+        with self._log_lock:
+            if self._log:
+                self._log.close()
+                self._log = None
+
+    def precisaCompactar(self):
+        """ Informa se o log passou do tamanho limite e deve ser compactado, ou se
+        está na hora de um snapshot periódico (pelo tempo ou pelo número de alterações).
+
+        Returns:
+            bool:
+                True - O log deve ser compactado (ou o snapshot periódico deve ser escrito).
+
+                False - Nenhum limite foi atingido ou já existe uma compactação em andamento.
+        """
+        if self._compactacao and self._compactacao.is_alive():
+            return False
+
+        if self._log and self._tam_log >= self._LIMITE_LOG:
+            return True
+
+        # Os snapshots periódicos só são escritos se o dicionario mudou desde o último
+        if not self._alteracoes:
+            return False
+
+        if self._escritas_snapshot is not None and self._alteracoes >= self._escritas_snapshot:
+            return True
+
+        return self._intervalo_snapshot is not None and time.time() - self._ultimo_snapshot >= self._intervalo_snapshot
+
+    def compactaLog(self):
+        """ Escreve um novo snapshot em segundo plano, incorporando o log (no modo de
+        log, o log atual é renomeado e um log novo é aberto, e o log antigo é apagado
+        quando o snapshot terminar de ser escrito). Se uma compactação anterior falhou
+        e o log antigo dela ainda existe, o log atual é adicionado no final dele, e o
+        snapshot novo também incorpora os dois.
+
+        Deve ser chamado com acesso exclusivo ao dicionario, já que guarda o estado
+        atual dele. Onde existe `os.fork`, o snapshot é escrito por um processo filho,
+        que vê uma cópia do dicionario no instante do fork (as páginas de memória só
+        são copiadas quando o processo pai altera elas), então o dicionario não é
+        copiado e o lock fica com o servidor só durante o fork. Sem o `fork`, o estado
+        é copiado e escrito por uma thread. Com limite de memória, as entradas que estão
+        no disco podem ser alteradas durante a escrita, então o snapshot é escrito
+        antes de retornar.
+        """
+        antigo_path = self._LOG_FILE_PATH + '.antigo'
+        rotaciona = self._log is not None
+        self._alteracoes = 0
+        self._ultimo_snapshot = time.time()
+
+        # Troca o log atual por um vazio
+        if rotaciona:
+            with self._log_lock:
+                self._log.close()
+                if os.path.isfile(antigo_path):
+                    # Uma compactação anterior falhou: os registros do log atual vão para o final do log antigo
+                    with open(self._LOG_FILE_PATH, 'rb') as atual, open(antigo_path, 'ab') as antigo:
+                        shutil.copyfileobj(atual, antigo)
+                        antigo.flush()
+                        os.fsync(antigo.fileno())
+                    self._log = open(self._LOG_FILE_PATH, 'w', encoding='utf-8')
+                else:
+                    os.replace(self._LOG_FILE_PATH, antigo_path)
+                    self._log = open(self._LOG_FILE_PATH, 'a', encoding='utf-8')
+                self._tam_log = 0
+
+        def concluiu():
+            # O snapshot incorpora o log antigo (se uma compactação falhar, ele fica no disco e é incorporado na próxima)
+            if os.path.isfile(antigo_path):
+                os.remove(antigo_path)
+
+        def compacta(entradas, expiracoes):
+            self._escreveSnapshot(entradas, expiracoes)
+            concluiu()
+
+        if isinstance(self._dict, ArmazemLRU):
+            compacta(*self._estadoPersistente(copia=False))
+            return
+
+        if hasattr(os, 'fork'):
+            pid = os.fork()
+
+            if pid == 0:
+                # Processo filho: escreve o snapshot e sai, sem executar mais nada do servidor
+                codigo = 1
+                try:
+                    self._escreveSnapshot(*self._estadoPersistente(copia=False))
+                    codigo = 0
+                finally:
+                    os._exit(codigo)
+
+            def espera():
+                # Se o filho falhar, o log antigo continua no disco e é reaplicado ao reiniciar
+                _, status = os.waitpid(pid, 0)
+                if status == 0:
+                    concluiu()
+
+            self._compactacao = threading.Thread(target=espera, daemon=True)
+            self._compactacao.start()
+            return
+
+        # Copia o estado atual, que vai ser escrito enquanto o dicionario continua sendo alterado
+        entradas, expiracoes = self._estadoPersistente()
+
+        self._compactacao = threading.Thread(target=compacta, args=[entradas, expiracoes], daemon=True)
+        self._compactacao.start()
 
     def getItem(self, key):
         """ Acessa um valor associado a uma chave no dicionario.
@@ -49,8 +594,8 @@ class Dicionario:
         Returns:
             Any: O valor associado a chave `key`
         """
-        # Se a chave ja existe no dicionario, retorna o valor
-        if key in self._dict:
+        # Se a chave ja existe no dicionario (e não expirou), retorna o valor
+        if key in self._dict and not self.expirou(key):
             return self._dict[key]
         
         # Se a chave nao existe no dicionario, retorna None
@@ -66,18 +611,137 @@ class Dicionario:
             `value` (Any): O valor do par chave-valor
         """
 
-        # Se a chave ja existe no dicionario,
-        # concatena um valor novo na lista de valores
+        self._purgaExpirada(key)
+        res = self._insere(key, value)
+        self._registra(['S', key, list(self._dict[key])])
+        return res
+
+    def setItems(self, pares):
+        """ Adiciona vários pares chave-valor no dicionario, como o `setItem`,
+        mas escrevendo os registros de todos eles no log de uma vez só.
+
+        Args:
+            `pares` (List[Tuple]): Pares `(chave, valor)` que serão adicionados.
+
+        Returns:
+            List[bool]: Para cada par, se a chave já existia no dicionário.
+        """
+
+        for key, _ in pares:
+            self._purgaExpirada(key)
+
+        res = [self._insere(key, value) for key, value in pares]
+
+        # Registra o estado final de cada entrada alterada (uma vez por chave)
+        self._registra(*[['S', key, list(self._dict[key])] for key in dict.fromkeys(key for key, _ in pares)])
+        return res
+
+    def _insere(self, key, value):
+        """ Adiciona um par chave-valor no dicionario, sem registrar no log.
+
+        Args:
+            `key` (str): A chave do par chave-valor
+            `value` (Any): O valor do par chave-valor
+
+        Returns:
+            bool: Se a chave já existia no dicionário.
+        """
+
+        # Se a chave ja existe no dicionario, insere o valor novo
+        # na posição correta da lista (que já está ordenada)
         if key in self._dict:
-            self._dict[key].append(value)
-            self._dict[key].sort()
+            values = self._dict[key]
+            bisect.insort(values, value)
+            self._dict[key] = values # Avisa o armazém (se houver limite de memória) que a entrada mudou
+            if self._valores is not None:
+                with self._indice_lock:
+                    self._valores.adiciona(key, value)
             return True
         
         # Se a chave nao existe no dicionario, 
-        # cria uma lista com um unico valor
-        self._dict[key] = [value]
+        # cria uma lista com um unico valor e adiciona a chave nos índices
+        self._dict[key] = self._compacta([value])
+        with self._indice_lock:
+            bisect.insort(self._chaves, key)
+            if self._valores is not None:
+                self._valores.adiciona(key, value)
         return False
 
+    def _desindexa(self, key, values):
+        """ Remove uma entrada dos índices de chaves e de valores.
+
+        Args:
+            `key` (str): A chave removida do dicionario.
+            `values` (List[str]): Os valores que a entrada tinha.
+        """
+        with self._indice_lock:
+            i = bisect.bisect_left(self._chaves, key)
+            if i < len(self._chaves) and self._chaves[i] == key:
+                del self._chaves[i]
+
+            if self._valores is not None:
+                self._valores.remove(key, values)
+
+    def buscaValor(self, value):
+        """ Busca as chaves que têm `value` entre os seus valores, usando o índice invertido.
+        Com limite de memória (sem o índice), percorre todas as entradas, inclusive as que
+        estão em disco, sem trazê-las para a memória. Nesse caso, as entradas alteradas
+        durante a busca podem ou não aparecer no resultado.
+
+        Args:
+            `value` (str): O valor procurado.
+
+        Returns:
+            List[str]: As chaves que têm o valor, em ordem.
+        """
+        if self._valores is None:
+            return sorted(key for key, values in self._dict.items() if value in values)
+
+        with self._indice_lock:
+            return self._valores.busca(value)
+
+    def percorreChaves(self, inicio, fim=None, limite=None, tam_pagina=100):
+        """ Percorre em ordem as chaves do dicionario a partir de `inicio`, em páginas.
+        Cada página é lida do índice separadamente, então as chaves criadas ou removidas
+        durante a busca podem ou não aparecer nas páginas seguintes.
+
+        Args:
+            `inicio` (str): Menor chave que pode ser retornada.
+            `fim` (str, optional): Limite superior (exclusivo) das chaves. Se não for informado, vai até a última chave.
+            `limite` (int, optional): Número máximo de chaves retornadas.
+            `tam_pagina` (int, optional): Número máximo de chaves por página.
+
+        Yields:
+            List[str]: As chaves de cada página, em ordem.
+        """
+        restantes = limite
+        ultima = None
+
+        while restantes is None or restantes > 0:
+            n = tam_pagina if restantes is None else min(tam_pagina, restantes)
+
+            with self._indice_lock:
+                # Começa logo depois da última chave da página anterior
+                if ultima is None:
+                    i = bisect.bisect_left(self._chaves, inicio)
+                else:
+                    i = bisect.bisect_right(self._chaves, ultima)
+
+                j = min(i + n, len(self._chaves))
+                if fim is not None:
+                    j = bisect.bisect_left(self._chaves, fim, i, j)
+
+                pagina = self._chaves[i:j]
+
+            if not pagina:
+                return
+
+            yield pagina
+
+            ultima = pagina[-1]
+            if restantes is not None:
+                restantes -= len(pagina)
+
     def removeItem(self, key):
         """ Remove uma entrada do dicionario. Se a entrada 
         com chave `key` existir, remove-a e retorna True, 
@@ -93,12 +757,150 @@ class Dicionario:
                 False - A entrada com chave `key` nao foi encontrada
         """
 
+        self._purgaExpirada(key)
+
         # Se a chave ja existe no dicionario,
         # remove a entrada do dicionario e retorna True
         if key in self._dict:
-            self._dict.pop(key)
+            values = self._dict.pop(key)
+            self._desindexa(key, values)
+            self._libera(values)
+            self._cancelaExpiracao(key)
+            self._registra(['R', key])
             return True
         
         # Se a chave nao existe no dicionario, 
         # nao remove nada e retorna False
-        return False
\ No newline at end of file
+        return False
+
+    def removeItems(self, keys):
+        """ Remove várias entradas do dicionario, como o `removeItem`,
+        mas escrevendo os registros de todas elas no log de uma vez só.
+
+        Args:
+            `keys` (List[str]): As chaves das entradas que serão removidas.
+
+        Returns:
+            List[bool]: Para cada chave, se a entrada foi removida.
+        """
+
+        res = []
+        for key in keys:
+            self._purgaExpirada(key)
+            values = self._dict.pop(key, None)
+            res.append(values is not None)
+            if values is not None:
+                self._desindexa(key, values)
+                self._libera(values)
+                self._cancelaExpiracao(key)
+
+        self._registra(*[['R', key] for key, removida in zip(keys, res) if removida])
+        return res
+
+    def expirou(self, key):
+        """ Informa se a chave `key` tem tempo de vida e ele já acabou.
+
+        Args:
+            `key` (str): A chave verificada.
+
+        Returns:
+            bool: True se a chave expirou (mesmo que ainda não tenha sido removida).
+        """
+        instante = self._expiracoes.get(key)
+        return instante is not None and instante <= time.time()
+
+    def defineExpiracao(self, key, segundos):
+        """ Define o tempo de vida da entrada `key`. Depois desse tempo, a entrada
+        deixa de ser retornada e é removida do dicionario.
+
+        Args:
+            `key` (str): A chave da entrada.
+            `segundos` (float): Tempo de vida da entrada, a partir de agora.
+
+        Returns:
+            bool: False se a entrada não existe no dicionario.
+        """
+        self._purgaExpirada(key)
+        if key not in self._dict:
+            return False
+
+        instante = time.time() + segundos
+        with self._expira_lock:
+            self._expiracoes[key] = instante
+            heapq.heappush(self._fila_expiracao, (instante, key))
+
+        self._registra(['E', key, instante])
+        return True
+
+    def _cancelaExpiracao(self, key):
+        """ Remove o tempo de vida de uma entrada removida. O par dela que fica na
+        fila de expiração é ignorado quando sair da fila.
+
+        Args:
+            `key` (str): A chave da entrada removida.
+        """
+        if key in self._expiracoes:
+            with self._expira_lock:
+                self._expiracoes.pop(key, None)
+
+    def _purgaExpirada(self, key):
+        """ Remove a entrada `key` se ela já expirou (expiração preguiçosa), para que
+        uma escrita ou remoção não encontre a entrada antiga. Deve ser chamado com
+        o lock de escrita da chave.
+
+        Args:
+            `key` (str): A chave da entrada.
+
+        Returns:
+            bool: True se a entrada tinha expirado e foi removida.
+        """
+        if not self.expirou(key):
+            return False
+
+        values = self._dict.pop(key, None)
+        if values is not None:
+            self._desindexa(key, values)
+            self._libera(values)
+        self._cancelaExpiracao(key)
+        self._registra(['R', key])
+        return True
+
+    def chavesExpiradas(self, limite=1000):
+        """ Tira da fila de expiração as chaves cujo tempo de vida acabou.
+        Só olha o início da fila, então o custo não depende do tamanho do dicionario.
+
+        Args:
+            `limite` (int, optional): Número máximo de chaves retornadas.
+
+        Returns:
+            List[str]: As chaves expiradas, que devem ser removidas com `removeExpiradas`.
+        """
+        agora = time.time()
+        chaves = []
+
+        with self._expira_lock:
+            while self._fila_expiracao and self._fila_expiracao[0][0] <= agora and len(chaves) < limite:
+                instante, key = heapq.heappop(self._fila_expiracao)
+
+                # Ignora pares antigos, de chaves removidas ou com outra expiração
+                if self._expiracoes.get(key) == instante:
+                    chaves.append(key)
+
+        return chaves
+
+    def proximaExpiracao(self):
+        """ Retorna o instante da próxima expiração da fila, ou `None` se ela estiver vazia."""
+        with self._expira_lock:
+            return self._fila_expiracao[0][0] if self._fila_expiracao else None
+
+    def removeExpiradas(self, keys):
+        """ Remove as entradas expiradas entre `keys`. Deve ser chamado com o lock
+        de escrita das chaves.
+
+        Args:
+            `keys` (List[str]): Chaves retornadas por `chavesExpiradas`.
+
+        Returns:
+            int: Número de entradas removidas.
+        """
+        return sum(self._purgaExpirada(key) for key in keys)
@@ -0,0 +1,199 @@
+import time
+import threading
+from collections import Counter
+
+_N_FAIXAS = 40
+"""Número de faixas dos histogramas de latência (a faixa `i` vai de 2^(i-1) a 2^i microssegundos)."""
+
+class _Fragmento:
+    """Contadores de uma única thread. Cada thread só altera o seu próprio fragmento,
+    então o registro das métricas não precisa de locks."""
+
+    __slots__ = ('ops', 'histogramas', 'hits', 'misses', 'chaves')
+
+    def __init__(self):
+        self.ops = Counter()
+        self.histogramas = {}
+        self.hits = 0
+        self.misses = 0
+        self.chaves = Counter()
+
+class Metricas:
+    """Componente Métricas - Registra contadores e histogramas de latência do servidor.
+    Os contadores ficam divididos em fragmentos por thread, que só são somados quando
+    alguém pede as estatísticas (comando `STATS`)."""
+
+    _MAX_CHAVES = 10000
+    """Número de chaves contadas por fragmento antes de descartar as menos acessadas."""
+
+    def __init__(self):
+        """Instancia um objeto `Metricas` vazio."""
+
+        self._local = threading.local()
+        self._fragmentos = []
+        self._lock = threading.Lock() # Usado apenas quando uma thread cria o seu fragmento ou uma conexão fecha ou é recusada
+        self._conexoes = {}
+        self._bytes = [0, 0] # Bytes recebidos e enviados pelas conexões já encerradas
+        self._recusadas = [0, 0] # Conexões rejeitadas (servidor cheio) e encerradas por inatividade
+        self._inicio = time.time()
+
+    def _fragmento(self):
+        """Retorna o fragmento da thread atual, criando um se ela ainda não tiver."""
+
+        fragmento = getattr(self._local, 'fragmento', None)
+        if fragmento is None:
+            fragmento = self._local.fragmento = _Fragmento()
+            with self._lock:
+                self._fragmentos.append(fragmento)
+        return fragmento
+
+    def registraComando(self, comando, duracao):
+        """Registra a execução de um comando.
+
+        Args:
+            `comando` (str): Nome do comando (ex.: `'READ'`).
+            `duracao` (float): Tempo de execução do comando, em segundos.
+        """
+
+        fragmento = self._fragmento()
+        fragmento.ops[comando] += 1
+
+        histograma = fragmento.histogramas.get(comando)
+        if histograma is None:
+            histograma = fragmento.histogramas[comando] = [0] * _N_FAIXAS
+        histograma[min(int(duracao * 1e6).bit_length(), _N_FAIXAS - 1)] += 1
+
+    def registraLeitura(self, key, encontrada):
+        """Registra uma leitura da chave `key`, contando se ela foi encontrada no dicionário.
+
+        Args:
+            `key` (str): A chave lida.
+            `encontrada` (bool): Se a chave existia no dicionário.
+        """
+
+        fragmento = self._fragmento()
+        if encontrada:
+            fragmento.hits += 1
+        else:
+            fragmento.misses += 1
+        self.registraChave(key, fragmento)
+
+    def registraChave(self, key, fragmento=None):
+        """Conta um acesso à chave `key`, para encontrar as chaves mais acessadas.
+
+        Args:
+            `key` (str): A chave acessada.
+        """
+
+        fragmento = fragmento or self._fragmento()
+        fragmento.chaves[key] += 1
+
+        # Mantém só as chaves mais acessadas, para a memória não crescer com o dicionário
+        if len(fragmento.chaves) > 2 * self._MAX_CHAVES:
+            fragmento.chaves = Counter(dict(fragmento.chaves.most_common(self._MAX_CHAVES)))
+
+    def abreConexao(self, end):
+        """Registra uma nova conexão e retorna os contadores de bytes dela.
+
+        Args:
+            `end` (Tuple): Endereço do outro lado da conexão.
+
+        Returns:
+            List[int]: Lista `[bytes recebidos, bytes enviados]`, que deve ser atualizada pela conexão.
+        """
+
+        contadores = self._conexoes[end] = [0, 0]
+        return contadores
+
+    def fechaConexao(self, end):
+        """Registra que a conexão `end` foi encerrada, guardando o total de bytes dela."""
+
+        contadores = self._conexoes.pop(end, None)
+        if contadores:
+            with self._lock:
+                self._bytes[0] += contadores[0]
+                self._bytes[1] += contadores[1]
+
+    def registraRecusa(self, ociosa=False):
+        """Registra uma conexão rejeitada por falta de vaga no servidor, ou encerrada por inatividade.
+
+        Args:
+            `ociosa` (bool, optional): Se True, a conexão foi encerrada por inatividade.
+        """
+
+        with self._lock:
+            self._recusadas[1 if ociosa else 0] += 1
+
+    def estatisticas(self, n_conexoes, espera_lock, n_top=10):
+        """Soma os fragmentos de todas as threads e monta um relatório das métricas.
+
+        Args:
+            `n_conexoes` (int): Número de conexões ativas.
+            `espera_lock` (Tuple[float, int]): Tempo total de espera pelos locks do dicionário e número de aquisições.
+            `n_top` (int, optional): Número de chaves e conexões mais ativas listadas.
+
+        Returns:
+            str: O relatório, com uma métrica por linha.
+        """
+
+        ops, chaves, histogramas = Counter(), Counter(), {}
+        hits = misses = 0
+
+        # Os fragmentos continuam sendo alterados pelas suas threads, então
+        # cada um é copiado (de forma atômica) antes de ser somado
+        for fragmento in list(self._fragmentos):
+            ops.update(dict(fragmento.ops))
+            chaves.update(dict(fragmento.chaves))
+            hits += fragmento.hits
+            misses += fragmento.misses
+            for comando, histograma in list(fragmento.histogramas.items()):
+                total = histogramas.setdefault(comando, [0] * _N_FAIXAS)
+                for i, n in enumerate(list(histograma)):
+                    total[i] += n
+
+        conexoes = list(self._conexoes.items())
+        bytes_in = self._bytes[0] + sum(c[0] for _, c in conexoes)
+        bytes_out = self._bytes[1] + sum(c[1] for _, c in conexoes)
+        tempo = time.time() - self._inicio
+
+        linhas = ["Tempo ativo: {:.1f}s".format(tempo)]
+        linhas.append("Conexões ativas: " + str(n_conexoes))
+        linhas.append("Conexões rejeitadas/encerradas por inatividade: {}/{}".format(*self._recusadas))
+        linhas.append("Bytes recebidos/enviados: " + str(bytes_in) + "/" + str(bytes_out))
+        linhas.append("READ hits/misses: " + str(hits) + "/" + str(misses))
+        linhas.append("Espera pelos locks do dicionário: {:.3f}s em {} aquisições".format(*espera_lock))
+
+        linhas.append("Comandos:")
+        for comando, n in ops.most_common():
+            p50, p99, p999 = (percentilHistograma(histogramas[comando], p) for p in (50, 99, 99.9))
+            linhas.append("  {:8} {:>10} ops ({:.1f}/s)  p50<{}us p99<{}us p999<{}us".format(
+                comando, n, n / tempo, p50, p99, p999))
+
+        linhas.append("Chaves mais acessadas:")
+        for key, n in chaves.most_common(n_top):
+            linhas.append("  " + key + ": " + str(n))
+
+        linhas.append("Conexões com mais tráfego:")
+        for end, (b_in, b_out) in sorted(conexoes, key=lambda c: -(c[1][0] + c[1][1]))[:n_top]:
+            linhas.append("  " + str(end) + ": " + str(b_in) + "/" + str(b_out) + " bytes")
+
+        return '\n'.join(linhas)
+
+def percentilHistograma(histograma, p):
+    """Estima o percentil `p` de um histograma de latências.
+
+    Args:
+        `histograma` (List[int]): Número de ocorrências em cada faixa.
+        `p` (float): Percentil (entre 0 e 100).
+
+    Returns:
+        int: Limite superior (em microssegundos) da faixa onde está o percentil.
+    """
+
+    alvo = sum(histograma) * p / 100
+    acumulado = 0
+    for i, n in enumerate(histograma):
+        acumulado += n
+        if acumulado >= alvo:
+            return 2 ** i
+    return 2 ** (len(histograma) - 1)
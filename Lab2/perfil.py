@@ -0,0 +1,234 @@
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from collections import Counter
+
+def nomeFuncao(funcao):
+    """Formata uma função do perfil como `arquivo:linha(nome)`, no estilo do `pstats`.
+
+    Args:
+        `funcao` (Tuple[str, int, str]): Arquivo, linha de início e nome da função.
+
+    Returns:
+        str: A função formatada.
+    """
+
+    arquivo, linha, nome = funcao
+    return os.path.basename(arquivo) + ":" + str(linha) + "(" + nome + ")"
+
+class Perfilador:
+    """Componente Perfilador - Perfil de CPU por amostragem de todas as threads do servidor.
+    Uma thread separada olha, a cada intervalo, a pilha de chamadas das outras threads
+    (`sys._current_frames`) e conta em quais funções elas estão. Como as chamadas não
+    são instrumentadas (como no `cProfile`), o perfil pode ser ligado e desligado com o
+    servidor atendendo requisições.
+
+    As amostras de threads paradas em uma espera conhecida (`_ESPERAS`) só são contadas
+    por thread, e ficam fora das tabelas de funções e das pilhas."""
+
+    _MAX_PROFUNDIDADE = 64
+    """Número máximo de chamadas guardadas de cada pilha (as mais externas são descartadas)."""
+
+    _ESPERAS = {
+        ('threading.py', 'wait'): 'wait', # Event.wait (thread de expiração). A espera pelos locks do dicionário continua no perfil
+        ('threading.py', '_wait_for_tstate_lock'): None, # Thread.join
+        ('selectors.py', 'select'): None, # Laço do seletor (servidor e asyncio)
+        ('thread.py', '_worker'): None, # Trabalhador do ThreadPoolExecutor esperando uma tarefa
+        ('registro.py', '_proximoLote'): None, # Registrador esperando mensagens na fila
+        ('conexao.py', '_recebe'): 'proximaMensagem', # Leitura bloqueante de um socket
+    }
+    """Funções em que uma thread fica parada esperando, como `(arquivo, função)`. Uma amostra
+    em que a chamada mais interna é uma delas é de espera. Se o valor não for None, a amostra
+    só é de espera quando a função foi chamada pela função do valor (a mesma função também
+    é usada sem bloquear)."""
+
+    def __init__(self, intervalo=0.005):
+        """Instancia um objeto `Perfilador` parado.
+
+        Args:
+            `intervalo` (float, optional): Tempo entre duas amostras, em segundos.
+        """
+
+        self._intervalo = intervalo
+        self._pilhas = Counter() # (nome da thread, pilha) -> número de amostras
+        self._esperas = Counter() # Nome da thread -> número de amostras em que ela estava esperando
+        self._amostras = 0
+        self._inicio = 0.0
+        self._duracao = 0.0
+        self._parar = threading.Event()
+        self._thread = None
+
+    def inicia(self):
+        """Inicia a thread que coleta as amostras."""
+
+        self._inicio = time.time()
+        self._thread = threading.Thread(target=self._executa, name='perfilador', daemon=True)
+        self._thread.start()
+
+    def encerra(self):
+        """Para a coleta das amostras (as amostras coletadas continuam guardadas).
+
+        Returns:
+            int: O número de amostras coletadas.
+        """
+
+        self._parar.set()
+        self._thread.join()
+        self._duracao = time.time() - self._inicio
+        return self._amostras
+
+    def _executa(self):
+        """Laço da thread do perfilador: coleta uma amostra das pilhas a cada intervalo."""
+
+        propria = threading.get_ident()
+        nomes = {} # Identificador -> nome de cada thread
+        esperas = {} # Código de cada função -> valor dela no `_ESPERAS` (False se não for uma espera)
+
+        while not self._parar.wait(self._intervalo):
+            for ident, frame in sys._current_frames().items():
+                if ident == propria:
+                    continue
+
+                # Só percorre a lista de threads quando aparece uma thread nova
+                nome = nomes.get(ident)
+                if nome is None:
+                    nomes = {t.ident: t.name for t in threading.enumerate()}
+                    nome = nomes.get(ident, str(ident))
+
+                # Descarta a amostra se a thread está parada em uma espera
+                espera = esperas.get(frame.f_code)
+                if espera is None and frame.f_code not in esperas:
+                    espera = esperas[frame.f_code] = self._ESPERAS.get(
+                        (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name), False)
+                if espera is None or (espera and frame.f_back is not None and frame.f_back.f_code.co_name == espera):
+                    self._esperas[nome] += 1
+                    continue
+
+                # Pilha da chamada mais interna para a mais externa
+                pilha = []
+                while frame is not None and len(pilha) < self._MAX_PROFUNDIDADE:
+                    codigo = frame.f_code
+                    pilha.append((codigo.co_filename, codigo.co_firstlineno, codigo.co_name))
+                    frame = frame.f_back
+
+                self._pilhas[(nome, tuple(pilha))] += 1
+
+            self._amostras += 1
+
+    def relatorio(self, n_top=30):
+        """Monta o relatório do perfil.
+
+        Args:
+            `n_top` (int, optional): Número de funções listadas em cada tabela.
+
+        Returns:
+            str: O relatório, com as amostras por thread e as funções com mais amostras.
+        """
+
+        threads, proprias, acumuladas = Counter(), Counter(), Counter()
+        for (nome, pilha), n in self._pilhas.items():
+            threads[nome] += n
+            if pilha:
+                proprias[pilha[0]] += n
+            for funcao in set(pilha): # Uma função recursiva conta uma vez por amostra
+                acumuladas[funcao] += n
+
+        total = sum(threads.values()) or 1
+        linhas = ["Perfil de CPU: {} amostras em {:.1f}s (uma a cada {:.1f}ms)".format(
+            self._amostras, self._duracao, self._intervalo * 1000)]
+
+        linhas.append("Amostras por thread (executando e esperando):")
+        for nome in sorted(set(threads) | set(self._esperas), key=lambda nome: -threads[nome]):
+            linhas.append("  {:30} {:>8} {:>8}".format(nome, threads[nome], self._esperas[nome]))
+
+        # As amostras de espera ficam de fora. Uma thread bloqueada em uma chamada que não
+        # está no `_ESPERAS` ainda aparece na função que fez a chamada
+        for titulo, contagem in (("Funções executando (sem as funções chamadas por elas):", proprias),
+                                 ("Funções na pilha (incluindo as funções chamadas por elas):", acumuladas)):
+            linhas.append(titulo)
+            linhas.append("  {:>8} {:>6}  {}".format("amostras", "%", "função"))
+            for funcao, n in contagem.most_common(n_top):
+                linhas.append("  {:>8} {:>6.1f}  {}".format(n, 100 * n / total, nomeFuncao(funcao)))
+
+        return '\n'.join(linhas)
+
+    def escreve(self, path):
+        """Escreve o relatório no arquivo `path`, e as pilhas completas em `path + '.pilhas'`,
+        no formato usado para gerar flame graphs (`thread;externa;...;interna amostras`).
+
+        Args:
+            `path` (str): Caminho do arquivo do relatório.
+        """
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.relatorio() + '\n')
+
+        with open(path + '.pilhas', 'w', encoding='utf-8') as f:
+            for (nome, pilha), n in self._pilhas.most_common():
+                f.write(';'.join([nome] + [nomeFuncao(funcao) for funcao in reversed(pilha)]) + " " + str(n) + '\n')
+
+class RastreadorMemoria:
+    """Componente RastreadorMemoria - Salva snapshots das alocações de memória do servidor,
+    usando o `tracemalloc`. O rastreamento deixa as alocações mais lentas, então só fica
+    ligado entre `inicia` e `encerra`."""
+
+    def __init__(self, n_quadros=10):
+        """Instancia um objeto `RastreadorMemoria` desligado.
+
+        Args:
+            `n_quadros` (int, optional): Número de chamadas guardadas da pilha de cada alocação.
+        """
+
+        self._n_quadros = n_quadros
+        self._anterior = None # Último snapshot salvo, para mostrar o que mudou desde ele
+
+    def ativo(self):
+        """Informa se o rastreamento das alocações está ligado."""
+
+        return tracemalloc.is_tracing()
+
+    def inicia(self):
+        """Liga o rastreamento das alocações (só as alocações feitas a partir daqui são vistas)."""
+
+        tracemalloc.start(self._n_quadros)
+        self._anterior = None
+
+    def encerra(self):
+        """Desliga o rastreamento das alocações e libera a memória usada por ele."""
+
+        tracemalloc.stop()
+        self._anterior = None
+
+    def salvaSnapshot(self, path, n_top=30):
+        """Tira um snapshot das alocações e salva no arquivo `path + '.snapshot'` (que pode ser
+        lido com `tracemalloc.Snapshot.load`), com um relatório em texto no arquivo `path`.
+
+        Args:
+            `path` (str): Caminho do arquivo do relatório.
+            `n_top` (int, optional): Número de linhas listadas em cada tabela.
+
+        Returns:
+            str: Resumo do uso de memória rastreado.
+        """
+
+        # As alocações do próprio tracemalloc não interessam
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),))
+        snapshot.dump(path + '.snapshot')
+        atual, pico = tracemalloc.get_traced_memory()
+
+        resumo = "Memória rastreada: {:.1f} MB (pico de {:.1f} MB)".format(atual / 2**20, pico / 2**20)
+        linhas = [resumo, "Linhas com mais memória alocada:"]
+        linhas += ["  " + str(estat) for estat in snapshot.statistics('lineno')[:n_top]]
+
+        if self._anterior is not None:
+            linhas.append("Diferença para o snapshot anterior:")
+            linhas += ["  " + str(estat) for estat in snapshot.compare_to(self._anterior, 'lineno')[:n_top]]
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(linhas) + '\n')
+
+        self._anterior = snapshot
+        return resumo
@@ -0,0 +1,571 @@
+"""Servidor com vários processos - Como só uma thread de cada processo executa código
+Python por vez (GIL), o servidor com threads usa no máximo um núcleo. Neste modo, o
+`Supervisor` cria vários processos (`os.fork`), todos escutando na mesma porta
+(`SO_REUSEPORT`), e o sistema operacional divide as novas conexões entre eles.
+
+Cada processo (`ServidorParticionado`) guarda só as chaves da sua partição
+(`particao(chave)`), em um arquivo de dicionário próprio. As requisições de chaves de
+outras partições são encaminhadas para o processo dono delas pelo protocolo binário,
+por canais locais (`socket.socketpair`) criados pelo supervisor.
+"""
+
+from servidor import Servidor
+from remoto import ConexaoRemota
+from dicionario import divideDicionario, juntaDicionarios
+import protocolo
+import registro
+
+import os
+import re
+import sys
+import glob
+import heapq
+import zlib
+import socket
+import selectors
+import threading
+import itertools
+import traceback
+
+def particao(key, n_processos):
+    """Retorna a partição (o índice do processo dono) de uma chave. Usa o crc32, que
+    não muda entre execuções (ao contrário do `hash`), já que as partições ficam salvas.
+
+    Args:
+        `key` (str): A chave.
+        `n_processos` (int): Número de processos (partições).
+
+    Returns:
+        int: O índice da partição, entre 0 e `n_processos - 1`.
+    """
+
+    return zlib.crc32(key.encode('utf-8')) % n_processos
+
+def arquivoParticao(dict_path, indice, n_processos):
+    """Retorna o caminho do arquivo de dicionário de uma partição.
+
+    Args:
+        `dict_path` (str): Caminho do arquivo do dicionário.
+        `indice` (int): Índice da partição.
+        `n_processos` (int): Número de partições.
+
+    Returns:
+        str: O caminho, no formato `[dict_path].p[indice]de[n_processos]`.
+    """
+
+    return dict_path + '.p' + str(indice) + 'de' + str(n_processos)
+
+def particoesExistentes(dict_path):
+    """Retorna os arquivos de partições do dicionário `dict_path` que ainda existem.
+    Eles só continuam existindo se o servidor com vários processos não foi encerrado
+    normalmente, e nesse caso são mais novos que o arquivo do dicionário.
+
+    Args:
+        `dict_path` (str): Caminho do arquivo do dicionário.
+
+    Returns:
+        List[str]: Os caminhos dos arquivos das partições.
+    """
+
+    padrao = re.compile(re.escape(dict_path) + r'\.p\d+de\d+')
+    return sorted(path for path in glob.glob(glob.escape(dict_path) + '.p*de*') if padrao.fullmatch(path))
+
+def preparaParticoes(dict_path, n_processos, usa_log=False):
+    """Prepara os arquivos das partições para `n_processos` processos. Se as partições
+    de uma execução anterior (com o mesmo número de processos) ainda existirem, elas são
+    usadas. Se não, o dicionário é dividido (depois de juntar as partições de uma
+    execução com outro número de processos, se existirem).
+
+    Args:
+        `dict_path` (str): Caminho do arquivo do dicionário.
+        `n_processos` (int): Número de processos (partições).
+        `usa_log` (bool, optional): Se o dicionário usa o log de escrita.
+
+    Returns:
+        List[str]: Os caminhos dos arquivos das partições, na ordem dos processos.
+    """
+
+    existentes = particoesExistentes(dict_path)
+    paths = [arquivoParticao(dict_path, i, n_processos) for i in range(n_processos)]
+
+    if sorted(paths) == existentes:
+        return paths
+
+    if existentes:
+        juntaDicionarios(existentes, dict_path)
+    divideDicionario(dict_path, paths, lambda key: particao(key, n_processos), usa_log)
+    return paths
+
+class ServidorParticionado(Servidor):
+    """Componente Servidor Particionado - Processo do servidor com vários processos.
+    Atende as conexões como o `Servidor`, mas só guarda as chaves da sua partição: as
+    operações em chaves de outras partições são encaminhadas (com pipelining) para os
+    outros processos, e as operações em lote são divididas entre os donos das chaves.
+
+    As requisições encaminhadas por outros processos são atendidas por uma thread para
+    cada canal, e não pelo pool de trabalhadores. Como elas são sempre executadas na
+    partição local, um processo nunca espera outro enquanto atende um encaminhamento,
+    então os processos não podem ficar esperando uns pelos outros."""
+
+    def __init__(self, indice, n_processos, entradas, saidas, aviso, end, porta, dict_path, **opcoes):
+        """Instancia o processo `indice` do servidor, carregando o dicionário da sua partição.
+
+        Args:
+            `indice` (int): Índice do processo (e da sua partição).
+            `n_processos` (int): Número de processos.
+            `entradas` (List[socket]): Canais por onde os outros processos encaminham requisições.
+            `saidas` (dict): Canal (socket) para encaminhar requisições para cada outro processo.
+            `aviso` (int): Descritor do pipe usado para avisar o supervisor que o processo está encerrando.
+            `end` (str): Endereço IP do servidor.
+            `porta` (int): Porta do servidor (compartilhada por todos os processos).
+            `dict_path` (str): Caminho do arquivo do dicionário (cada processo usa o da sua partição).
+            `opcoes`: Demais opções do `Servidor`.
+        """
+
+        super().__init__(end, porta, arquivoParticao(dict_path, indice, n_processos), **opcoes)
+        self._indice = indice
+        self._n_processos = n_processos
+        self._entradas = entradas
+        self._saidas = saidas
+        self._aviso = aviso
+        self._canais = {} # Conexões com os outros processos (abertas no primeiro encaminhamento)
+        self._canais_lock = threading.Lock()
+        self._local = threading.local() # `interno` indica que a thread atende um canal de entrada
+        self._abertas = len(entradas) # Canais de entrada que os outros processos ainda não fecharam
+        self._abertas_lock = threading.Lock()
+        self._saindo = False
+        self._reusa_porta = True
+
+    def imprimeAjuda(self):
+        """Imprime a mensagem de início do servidor só no primeiro processo."""
+
+        if self._indice == 0:
+            super().imprimeAjuda()
+
+    def print_log(self, msg, nivel=registro.INFO):
+        """Imprime uma mensagem de log, indicando o processo que a imprimiu."""
+
+        super().print_log("[p" + str(self._indice) + "] " + msg, nivel)
+
+    def arquivoDiagnostico(self, arquivo):
+        """Cada processo salva os resultados dos comandos de diagnóstico em um arquivo
+        próprio, com o índice do processo no nome (ex.: `perfil-p1.txt`)."""
+
+        raiz, extensao = os.path.splitext(arquivo)
+        return raiz + "-p" + str(self._indice) + extensao
+
+    def estatisticas(self):
+        """Monta o relatório das métricas deste processo (comando `STATS`)."""
+
+        return ("Processo " + str(self._indice) + " de " + str(self._n_processos) + "\n"
+                + super().estatisticas())
+
+    def _canal(self, dono):
+        """Retorna a conexão com o processo `dono`, abrindo ela se necessário.
+
+        Returns:
+            ConexaoRemota: A conexão.
+        """
+
+        canal = self._canais.get(dono)
+        if canal is None:
+            with self._canais_lock:
+                canal = self._canais.get(dono)
+                if canal is None:
+                    canal = self._canais[dono] = ConexaoRemota(None, None, self._saidas[dono])
+        return canal
+
+    def _remoto(self, key):
+        """Retorna a conexão com o processo dono da chave `key`, ou `None` se a operação
+        deve ser executada neste processo (a chave é da partição local ou a requisição
+        foi encaminhada por outro processo)."""
+
+        if getattr(self._local, 'interno', False):
+            return None
+
+        dono = particao(key, self._n_processos)
+        return None if dono == self._indice else self._canal(dono)
+
+    def _distribui(self, itens, chave, op, campos, local):
+        """Executa uma operação em lote, dividindo os itens entre os processos donos das chaves.
+        As requisições dos outros processos são enviadas antes de executar a parte local,
+        então todas as partes são executadas ao mesmo tempo.
+
+        Args:
+            `itens` (List): Os itens da operação (chaves ou pares).
+            `chave` (Callable): Função que retorna a chave de um item.
+            `op` (int): Operação do protocolo binário usada para encaminhar os itens.
+            `campos` (Callable): Função que retorna os campos de um item na requisição.
+            `local` (Callable): Função que executa a operação em uma lista de itens da partição local.
+
+        Returns:
+            List: O resultado de cada item, na ordem dos itens.
+        """
+
+        if getattr(self._local, 'interno', False):
+            return local(itens)
+
+        grupos = {}
+        for pos, item in enumerate(itens):
+            grupos.setdefault(particao(chave(item), self._n_processos), []).append(pos)
+
+        pendentes = {dono: self._canal(dono).requisita(op, *[campo for pos in posicoes for campo in campos(itens[pos])])
+                     for dono, posicoes in grupos.items() if dono != self._indice}
+
+        res = [None] * len(itens)
+        posicoes = grupos.get(self._indice)
+        if posicoes:
+            for pos, valor in zip(posicoes, local([itens[pos] for pos in posicoes])):
+                res[pos] = valor
+
+        for dono, resposta in pendentes.items():
+            for pos, valor in zip(grupos[dono], resposta.resultado()):
+                res[pos] = valor
+        return res
+
+    def leEntrada(self, key):
+        canal = self._remoto(key)
+        return super().leEntrada(key) if canal is None else canal.le(key)
+
+    def adicionaValor(self, key, value, segundos=None):
+        canal = self._remoto(key)
+        return super().adicionaValor(key, value, segundos) if canal is None else canal.escreve(key, value, segundos)
+
+    def apagaEntrada(self, key):
+        canal = self._remoto(key)
+        return super().apagaEntrada(key) if canal is None else canal.remove(key)
+
+    def defineTempoVida(self, key, segundos):
+        canal = self._remoto(key)
+        return super().defineTempoVida(key, segundos) if canal is None else canal.expira(key, segundos)
+
+    def leEntradas(self, keys):
+        return self._distribui(keys, lambda key: key, protocolo.OP_MREAD, lambda key: (key,), super().leEntradas)
+
+    def adicionaValores(self, pares):
+        return self._distribui(pares, lambda par: par[0], protocolo.OP_MWRITE, lambda par: par, super().adicionaValores)
+
+    def apagaEntradas(self, keys):
+        return self._distribui(keys, lambda key: key, protocolo.OP_MREMOVE, lambda key: (key,), super().apagaEntradas)
+
+    def _chavesParticao(self, dono, inicio, fim):
+        """Percorre, em ordem, as chaves da partição `dono` a partir de `inicio`,
+        buscando uma página de cada vez.
+
+        Yields:
+            str: Cada chave.
+        """
+
+        if dono == self._indice:
+            for pagina in self._dict.percorreChaves(inicio, fim, None, self._TAM_PAGINA):
+                yield from pagina
+            return
+
+        canal = self._canal(dono)
+        while True:
+            pagina = canal.listaChaves(inicio, fim, self._TAM_PAGINA)
+            yield from pagina
+            if len(pagina) < self._TAM_PAGINA:
+                return
+            inicio = pagina[-1] + '\0' # A menor chave maior que a última recebida
+
+    def _chavesOrdenadas(self, inicio, fim, limite):
+        """Junta, em ordem, as chaves de todas as partições (ver `Servidor.buscaChaves`)."""
+
+        chaves = heapq.merge(*[self._chavesParticao(dono, inicio, fim) for dono in range(self._n_processos)])
+        return itertools.islice(chaves, limite)
+
+    def buscaChaves(self, inicio, fim, limite):
+        if getattr(self._local, 'interno', False):
+            yield from super().buscaChaves(inicio, fim, limite)
+            return
+
+        chaves = self._chavesOrdenadas(inicio, fim, limite)
+        while True:
+            pagina = list(itertools.islice(chaves, self._TAM_PAGINA))
+            if not pagina:
+                return
+            yield '\n'.join(pagina)
+
+    def listaChaves(self, inicio, fim, limite):
+        if getattr(self._local, 'interno', False):
+            return super().listaChaves(inicio, fim, limite)
+        return list(self._chavesOrdenadas(inicio, fim, limite))
+
+    def buscaValor(self, value):
+        if getattr(self._local, 'interno', False):
+            return super().buscaValor(value)
+
+        pendentes = [self._canal(dono).requisita(protocolo.OP_FIND, value)
+                     for dono in range(self._n_processos) if dono != self._indice]
+        partes = [super().buscaValor(value)] + [resposta.resultado() for resposta in pendentes]
+        return list(heapq.merge(*partes))
+
+    def processaMensagem(self, msg, sessao, priv, registrar=True):
+        """Processa uma mensagem como o `Servidor`, mas responde com uma mensagem de erro
+        se outro processo não puder atender a parte encaminhada da requisição."""
+
+        try:
+            return super().processaMensagem(msg, sessao, priv, registrar)
+        except (ConnectionError, RuntimeError) as e:
+            erro = "Erro no processo de outra partição: " + str(e)
+            self.print_log(erro, registro.ERRO)
+            if sessao['binario']:
+                return protocolo.codificaResposta(protocolo.RESP_ERRO, erro), None
+            return erro.encode('utf-8'), None
+
+    def atendeInterna(self, sock):
+        """Atende as requisições encaminhadas por outro processo pelo canal `sock`, até o
+        outro processo fechar o canal. Função executada por uma thread para cada canal.
+
+        Args:
+            sock (socket): O canal de entrada.
+        """
+
+        self._local.interno = True
+        sessao = {'binario': False, 'bytes': [0, 0]}
+
+        try:
+            while True:
+                msg = self._conn.recebeBytes(sock)
+                if msg is None:
+                    break
+
+                # Responde de uma vez as requisições que chegaram juntas (encaminhadas com pipelining)
+                respostas = [self.processaMensagem(msg, sessao, 'admin', False)[0]]
+                while self._conn.temMensagem(sock):
+                    respostas.append(self.processaMensagem(self._conn.recebeBytes(sock), sessao, 'admin', False)[0])
+                self._conn.enviaMensagens(respostas, sock=sock)
+        except OSError:
+            pass
+        finally:
+            sock.close()
+            with self._abertas_lock:
+                self._abertas -= 1
+
+        # Se o processo está encerrando, acorda a thread principal para ela ver se ainda falta algum canal
+        if self._saindo:
+            try:
+                self._despertador[1].send(b'\0')
+            except OSError:
+                pass
+
+    def trataComando(self, comando):
+        """Trata os comandos do administrador (repassados pelo supervisor) como o `Servidor`.
+        Quando o `QUIT` é aceito, o processo para de aceitar conexões e fecha os canais de
+        encaminhamento, mas continua atendendo os canais de entrada até os outros processos
+        também encerrarem (eles ainda podem precisar das chaves desta partição)."""
+
+        if super().trataComando(comando):
+            return True
+
+        if not self._saindo:
+            self._saindo = True
+            self._seletor.unregister(self._conn)
+            self._conn.fechaConexao()
+            for sock in self._saidas.values():
+                sock.close()
+
+            # Avisa o supervisor, para ele não mandar mais comandos para este processo
+            os.write(self._aviso, b'S')
+
+        return self._abertas > 0
+
+    def multiplex(self):
+        """Executa a multiplexação do `Servidor`, até o processo terminar de encerrar."""
+
+        if not super().multiplex():
+            return False
+        return not (self._saindo and self._abertas == 0)
+
+    def main(self):
+        """Inicia as threads dos canais de entrada e executa o servidor."""
+
+        for sock in self._entradas:
+            threading.Thread(target=self.atendeInterna, args=(sock,), name='encaminhamentos', daemon=True).start()
+
+        super().main()
+
+class Supervisor:
+    """Componente Supervisor - Executa o servidor em vários processos (um `ServidorParticionado`
+    para cada partição das chaves). O supervisor não atende conexões: ele divide o dicionário
+    nas partições, cria os processos e os canais entre eles, repassa os comandos do
+    administrador e, quando todos os processos encerram, junta as partições de volta no
+    arquivo do dicionário."""
+
+    _COMANDOS_TODOS = ("QUIT", "STATS", "PROFILE", "MEMSNAP")
+    """Comandos do administrador repassados para todos os processos. Os outros são executados por um processo só."""
+
+    def __init__(self, n_processos, end, porta, dict_path, usa_log=False, limite_memoria=None, **opcoes):
+        """Instancia um objeto `Supervisor`.
+
+        Args:
+            `n_processos` (int): Número de processos (e de partições).
+            `end` (str): Endereço IP do servidor.
+            `porta` (int): Porta do servidor.
+            `dict_path` (str): Caminho do arquivo do dicionário.
+            `usa_log` (bool, optional): Ativa o modo de log de escrita.
+            `limite_memoria` (int, optional): Memória (em bytes) das entradas, dividida entre os processos.
+            `opcoes`: Demais opções do `Servidor`.
+        """
+
+        self._n_processos = n_processos
+        self._end = end
+        self._porta = porta
+        self._dict_path = dict_path
+        self._opcoes = dict(opcoes, usa_log=usa_log)
+        if limite_memoria is not None:
+            self._opcoes['limite_memoria'] = limite_memoria // n_processos
+        self._processos = {} # pid -> índice do processo
+        self._comandos = {} # Índice -> pipe (escrita) da entrada de comandos do processo
+        self._saindo = set() # Índices dos processos que já aceitaram o QUIT
+        self._erros = 0 # Número de processos que terminaram com erro
+
+    def iniciaProcessos(self):
+        """Cria os canais de encaminhamento e os processos. Cada processo recebe um lado
+        dos canais que usa, e a entrada de comandos dele passa a ser um pipe do supervisor."""
+
+        n = self._n_processos
+        canais = {(origem, destino): socket.socketpair()
+                  for origem in range(n) for destino in range(n) if origem != destino}
+        avisos = {} # Índice -> pipe (leitura) dos avisos do processo
+
+        for indice in range(n):
+            leitura, escrita = os.pipe()
+            aviso_leitura, aviso_escrita = os.pipe()
+
+            sys.stdout.flush()
+            pid = os.fork()
+            if pid == 0:
+                # Processo filho: usa o pipe como entrada padrão e fecha o que é dos outros processos
+                os.dup2(leitura, 0)
+                for fd in [leitura, escrita, aviso_leitura] + list(self._comandos.values()) + list(avisos.values()):
+                    os.close(fd)
+
+                entradas = [par[1] for (origem, destino), par in canais.items() if destino == indice]
+                saidas = {destino: par[0] for (origem, destino), par in canais.items() if origem == indice}
+                for (origem, destino), par in canais.items():
+                    if origem != indice:
+                        par[0].close()
+                    if destino != indice:
+                        par[1].close()
+
+                self.executaProcesso(indice, entradas, saidas, aviso_escrita)
+
+            os.close(leitura)
+            os.close(aviso_escrita)
+            self._processos[pid] = indice
+            self._comandos[indice] = escrita
+            avisos[indice] = aviso_leitura
+
+        for par in canais.values():
+            par[0].close()
+            par[1].close()
+
+        return avisos
+
+    def executaProcesso(self, indice, entradas, saidas, aviso):
+        """Executa o servidor de uma partição no processo filho, e termina o processo."""
+
+        codigo = 1
+        try:
+            serv = ServidorParticionado(indice, self._n_processos, entradas, saidas, aviso,
+                                        self._end, self._porta, self._dict_path, **self._opcoes)
+            serv.main()
+            codigo = 0
+        except KeyboardInterrupt:
+            pass
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(codigo)
+
+    def repassaComando(self, comando):
+        """Repassa um comando do administrador para os processos.
+
+        Args:
+            `comando` (str): O comando digitado.
+        """
+
+        ativos = sorted(indice for indice in self._comandos if indice not in self._saindo)
+        if comando.split(' ')[0] in self._COMANDOS_TODOS:
+            alvos = sorted(self._comandos)
+        elif ativos:
+            alvos = ativos[:1]
+        else:
+            print("Todos os processos estão encerrando - comando ignorado")
+            return
+
+        for indice in alvos:
+            try:
+                os.write(self._comandos[indice], (comando + '\n').encode('utf-8'))
+            except BrokenPipeError:
+                pass
+
+    def recolheProcessos(self):
+        """Registra os processos que terminaram."""
+
+        while self._processos:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+
+            indice = self._processos.pop(pid)
+            os.close(self._comandos.pop(indice))
+            if not (os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0):
+                self._erros += 1
+                print("Processo " + str(indice) + " terminou com erro")
+
+    def main(self):
+        """Função principal - Executa o servidor com vários processos até todos encerrarem."""
+
+        paths = preparaParticoes(self._dict_path, self._n_processos, self._opcoes['usa_log'])
+        avisos = self.iniciaProcessos()
+
+        seletor = selectors.DefaultSelector()
+        seletor.register(sys.stdin, selectors.EVENT_READ, 'stdin')
+        for indice, fd in avisos.items():
+            seletor.register(fd, selectors.EVENT_READ, indice)
+
+        pendente = b'' # Parte de um comando que ainda não terminou de chegar
+        try:
+            while self._processos:
+                for chave, _ in seletor.select(0.5):
+                    dados = os.read(chave.fd, 4096)
+                    if chave.data != 'stdin':
+                        # Aviso de encerramento de um processo (ou o fim do pipe, quando ele termina)
+                        if dados:
+                            self._saindo.add(chave.data)
+                        else:
+                            seletor.unregister(chave.fd)
+                            os.close(chave.fd)
+                        continue
+
+                    if not dados:
+                        seletor.unregister(sys.stdin)
+                        continue
+
+                    *linhas, pendente = (pendente + dados).split(b'\n')
+                    for linha in linhas:
+                        if linha.strip():
+                            self.repassaComando(linha.decode('utf-8', 'replace').strip())
+
+                self.recolheProcessos()
+        except KeyboardInterrupt:
+            # Os processos também recebem o Ctrl+C: espera eles terminarem
+            while self._processos:
+                pid, status = os.waitpid(-1, 0)
+                self._processos.pop(pid, None)
+                self._erros += not (os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0)
+
+        seletor.close()
+
+        # As partições só são juntadas se todos os processos salvaram a sua partição
+        if self._erros:
+            print("As partições foram mantidas e serão usadas na próxima execução do servidor.")
+            return
+
+        juntaDicionarios(paths, self._dict_path)
+        print("Dicionário salvo em " + self._dict_path)
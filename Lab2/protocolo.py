@@ -0,0 +1,199 @@
+"""Protocolo binário do dicionário - Alternativa compacta aos comandos de texto.
+
+Uma conexão passa a usar o protocolo binário depois que o cliente envia o comando
+de texto `PROTOCOLO BINARIO` e o servidor responde `OK`. A partir daí, cada mensagem
+(ainda precedida do seu tamanho pelo componente Conexão) tem o formato:
+
+* Requisição: 1 byte com o código da operação, seguido dos campos (chaves e valores).
+* Resposta: 1 byte com o tipo da resposta, seguido do conteúdo dela.
+
+Cada campo é uma string UTF-8 precedida do seu tamanho em 4 bytes, então chaves e
+valores podem conter espaços.
+"""
+
+import struct
+
+COMANDO_NEGOCIACAO = "PROTOCOLO BINARIO"
+"""Comando de texto que troca a conexão para o protocolo binário."""
+
+# Códigos das operações
+OP_READ = 1
+OP_WRITE = 2
+OP_REMOVE = 3
+OP_MREAD = 4
+OP_MWRITE = 5
+OP_MREMOVE = 6
+OP_EXPIRE = 7
+OP_RANGE = 8
+OP_FIND = 9
+
+NOMES_OPERACOES = {
+    OP_READ: "READ",
+    OP_WRITE: "WRITE",
+    OP_REMOVE: "REMOVE",
+    OP_MREAD: "MREAD",
+    OP_MWRITE: "MWRITE",
+    OP_MREMOVE: "MREMOVE",
+    OP_EXPIRE: "EXPIRE",
+    OP_RANGE: "RANGE",
+    OP_FIND: "FIND",
+}
+"""Nome do comando de texto equivalente a cada operação."""
+
+# Tipos das respostas
+RESP_LISTA = 1
+"""Lista de strings: 4 bytes com o número de itens, seguidos dos itens como campos."""
+
+RESP_LISTAS = 2
+"""Lista de listas de strings: 4 bytes com o número de listas, seguidos das listas."""
+
+RESP_BOOL = 3
+"""Booleano: 1 byte."""
+
+RESP_BOOLS = 4
+"""Lista de booleanos: 4 bytes com o número de itens, seguidos de 1 byte por item."""
+
+RESP_ERRO = 5
+"""Mensagem de erro: um campo."""
+
+_UINT = struct.Struct('>I')
+
+def codificaCampos(campos):
+    """Codifica uma lista de strings, cada uma precedida do seu tamanho em bytes.
+
+    Args:
+        `campos` (Iterable[str]): As strings que serão codificadas.
+
+    Returns:
+        List[bytes]: Os pedaços da codificação (para serem juntados uma vez só).
+    """
+
+    partes = []
+    for campo in campos:
+        raw = campo.encode('utf-8')
+        partes.append(_UINT.pack(len(raw)))
+        partes.append(raw)
+    return partes
+
+def decodificaCampos(dados, inicio=0, n=None):
+    """Decodifica strings codificadas com `codificaCampos`.
+
+    Args:
+        `dados` (bytes): Os bytes codificados.
+        `inicio` (int, optional): Posição de `dados` onde começa o primeiro campo.
+        `n` (int, optional): Número de campos. Se não for informado, lê até o final.
+
+    Returns:
+        Tuple[List[str], int]: Os campos e a posição logo depois do último campo.
+
+    Raises:
+        ValueError: Se um campo está incompleto ou não é UTF-8 válido.
+    """
+
+    campos = []
+    with memoryview(dados) as buf:
+        while (n is None and inicio < len(buf)) or (n is not None and len(campos) < n):
+            if inicio + _UINT.size > len(buf):
+                raise ValueError("Tamanho do campo incompleto")
+            tam, = _UINT.unpack_from(buf, inicio)
+            inicio += _UINT.size
+            if inicio + tam > len(buf):
+                raise ValueError("Campo incompleto")
+            campos.append(str(buf[inicio:inicio + tam], encoding='utf-8'))
+            inicio += tam
+    return campos, inicio
+
+def codificaRequisicao(op, *campos):
+    """Codifica uma requisição do protocolo binário.
+
+    Args:
+        `op` (int): Código da operação (`OP_*`).
+        `campos` (str): Chaves e valores da operação.
+
+    Returns:
+        bytes: A requisição codificada.
+    """
+
+    return b''.join([bytes((op,))] + codificaCampos(campos))
+
+def decodificaRequisicao(dados):
+    """Decodifica uma requisição do protocolo binário.
+
+    Args:
+        `dados` (bytes): A requisição codificada.
+
+    Returns:
+        Tuple[int, List[str]]: O código da operação e os campos dela.
+
+    Raises:
+        ValueError: Se a requisição está vazia ou os campos dela estão mal formados.
+    """
+
+    if not dados:
+        raise ValueError("Requisição vazia")
+
+    campos, _ = decodificaCampos(dados, 1)
+    return dados[0], campos
+
+def codificaResposta(tipo, valor):
+    """Codifica uma resposta do protocolo binário.
+
+    Args:
+        `tipo` (int): Tipo da resposta (`RESP_*`).
+        `valor` (Any): Conteúdo da resposta, de acordo com o tipo.
+
+    Returns:
+        bytes: A resposta codificada.
+    """
+
+    partes = [bytes((tipo,))]
+
+    if tipo == RESP_LISTA:
+        partes.append(_UINT.pack(len(valor)))
+        partes.extend(codificaCampos(valor))
+    elif tipo == RESP_LISTAS:
+        partes.append(_UINT.pack(len(valor)))
+        for lista in valor:
+            partes.append(_UINT.pack(len(lista)))
+            partes.extend(codificaCampos(lista))
+    elif tipo == RESP_BOOL:
+        partes.append(bytes((bool(valor),)))
+    elif tipo == RESP_BOOLS:
+        partes.append(_UINT.pack(len(valor)))
+        partes.append(bytes(bool(v) for v in valor))
+    elif tipo == RESP_ERRO:
+        partes.extend(codificaCampos([valor]))
+
+    return b''.join(partes)
+
+def decodificaResposta(dados):
+    """Decodifica uma resposta do protocolo binário.
+
+    Args:
+        `dados` (bytes): A resposta codificada.
+
+    Returns:
+        Tuple[int, Any]: O tipo da resposta e o conteúdo dela.
+    """
+
+    tipo = dados[0]
+
+    if tipo == RESP_LISTA:
+        n, = _UINT.unpack_from(dados, 1)
+        valor, _ = decodificaCampos(dados, 1 + _UINT.size, n)
+    elif tipo == RESP_LISTAS:
+        n, = _UINT.unpack_from(dados, 1)
+        valor, pos = [], 1 + _UINT.size
+        for _ in range(n):
+            n_itens, = _UINT.unpack_from(dados, pos)
+            lista, pos = decodificaCampos(dados, pos + _UINT.size, n_itens)
+            valor.append(lista)
+    elif tipo == RESP_BOOL:
+        valor = bool(dados[1])
+    elif tipo == RESP_BOOLS:
+        n, = _UINT.unpack_from(dados, 1)
+        valor = [bool(b) for b in dados[1 + _UINT.size:1 + _UINT.size + n]]
+    else:
+        valor = decodificaCampos(dados, 1, 1)[0][0]
+
+    return tipo, valor
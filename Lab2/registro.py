@@ -0,0 +1,149 @@
+import sys
+import time
+import queue
+import random
+import threading
+
+DEBUG = 10
+INFO = 20
+AVISO = 30
+ERRO = 40
+
+NOMES_NIVEIS = {DEBUG: 'DEBUG', INFO: 'INFO', AVISO: 'AVISO', ERRO: 'ERRO'}
+"""Nome de cada nível de log."""
+
+_CORES_NIVEIS = {DEBUG: '\033[90m', INFO: '\033[94m', AVISO: '\033[33m', ERRO: '\033[91m'}
+"""Cor usada no terminal para o tempo de cada nível de log."""
+
+class Registrador:
+    """Componente Registrador - Imprime as mensagens de log do servidor em uma thread
+    separada. As threads que atendem requisições só colocam as mensagens em uma fila
+    (`queue.SimpleQueue`, sem locks em Python), então o tempo de resposta não depende
+    da velocidade do terminal. A thread do registrador junta as mensagens pendentes e
+    escreve todas de uma vez, no terminal ou em um arquivo."""
+
+    _MAX_LOTE = 1000
+    """Número máximo de mensagens escritas de uma vez."""
+
+    _FIM = object()
+    """Marcador colocado na fila para indicar que a thread deve terminar."""
+
+    def __init__(self, nivel=INFO, amostragem=1.0, arquivo=None):
+        """Instancia um objeto `Registrador`.
+
+        Args:
+            `nivel` (int, optional): Nível mínimo das mensagens que serão registradas.
+            `amostragem` (float, optional): Fração (entre 0 e 1) das requisições que serão registradas.
+            `arquivo` (str, optional): Caminho de um arquivo onde o log será escrito. Se não for informado, usa o terminal.
+        """
+
+        self._nivel = nivel
+        self._amostragem = amostragem
+        self._fila = queue.SimpleQueue()
+        self._thread = None
+        self._start_time = time.time()
+
+        # Se recebeu um arquivo, escreve nele sem as cores e o prompt do terminal
+        self._saida = open(arquivo, 'a', encoding='utf-8') if arquivo else sys.stdout
+        self._terminal = not arquivo and sys.stdout.isatty()
+
+    def inicia(self):
+        """Marca o tempo inicial (usado nos logs) e inicia a thread do registrador."""
+
+        self._start_time = time.time()
+        self._thread = threading.Thread(target=self._executa, daemon=True)
+        self._thread.start()
+
+    def encerra(self):
+        """Escreve as mensagens que ainda estão na fila e termina a thread do registrador."""
+
+        if not self._thread:
+            return
+
+        self._fila.put(self._FIM)
+        self._thread.join()
+        self._thread = None
+
+        # Apaga a última linha do terminal (evita que fique um 'S >>' solto após a execuçao do programa)
+        if self._terminal:
+            self._saida.write("\r\033[K")
+        self._saida.flush()
+
+        if self._saida is not sys.stdout:
+            self._saida.close()
+
+    def amostra(self, nivel=INFO):
+        """Sorteia se uma requisição deve ser registrada, de acordo com a taxa de amostragem.
+        Serve para evitar até mesmo a formatação da mensagem quando ela não será registrada.
+
+        Args:
+            `nivel` (int, optional): Nível em que a requisição seria registrada.
+
+        Returns:
+            bool: True se a requisição deve ser registrada.
+        """
+
+        if nivel < self._nivel:
+            return False
+
+        return self._amostragem >= 1 or random.random() < self._amostragem
+
+    def registra(self, msg, nivel=INFO):
+        """Coloca uma mensagem na fila do registrador, sem esperar ela ser escrita.
+
+        Args:
+            `msg` (str): Mensagem de log.
+            `nivel` (int, optional): Nível da mensagem.
+        """
+
+        if nivel < self._nivel:
+            return
+
+        self._fila.put((time.time(), nivel, msg))
+
+    def _formata(self, instante, nivel, msg):
+        """Formata uma mensagem de log, indicando o tempo desde que o registrador iniciou."""
+
+        timestamp = "{:7.2f}".format(instante - self._start_time)
+
+        if self._terminal:
+            return _CORES_NIVEIS[nivel] + "[" + timestamp + "]\033[0m " + msg + "\n"
+
+        return "[" + timestamp + "] " + NOMES_NIVEIS[nivel] + " " + msg + "\n"
+
+    def _proximoLote(self):
+        """Espera a próxima mensagem da fila e junta as que já estiverem nela. Fica em
+        uma função separada para o perfilador reconhecer a espera (ver `Perfilador._ESPERAS`).
+
+        Returns:
+            List[Tuple]: As mensagens pendentes, até `_MAX_LOTE`.
+        """
+
+        lote = [self._fila.get()]
+        while len(lote) < self._MAX_LOTE:
+            try:
+                lote.append(self._fila.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _executa(self):
+        """Função executada pela thread do registrador. Espera mensagens na fila
+        e escreve todas as que estiverem pendentes de uma vez."""
+
+        while True:
+            lote = self._proximoLote()
+
+            fim = any(item is self._FIM for item in lote)
+            linhas = ''.join(self._formata(*item) for item in lote if item is not self._FIM)
+
+            if self._terminal:
+                # Limpa a última linha do terminal (o 'S >>'), escreve os logs
+                # e imprime um 'S >>' de novo, indicando que o administrador pode enviar um comando
+                linhas = "\r\033[K" + linhas + "\r\033[92mS >> \033[0m"
+
+            self._saida.write(linhas)
+            self._saida.flush()
+
+            if fim:
+                return
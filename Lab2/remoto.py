@@ -0,0 +1,536 @@
+"""Biblioteca de acesso remoto ao dicionário - Permite usar o servidor a partir de
+outros programas, sem a interface interativa do `Cliente`.
+
+As conexões usam o protocolo binário e aceitam várias requisições em andamento ao
+mesmo tempo (pipelining): cada requisição é enviada na hora e retorna uma resposta
+pendente, e como o servidor responde as requisições de uma conexão na ordem em que
+elas chegaram, as respostas são associadas às requisições pela ordem. O número de
+requisições sem resposta é limitado pela janela da conexão: quando ela está cheia, as
+respostas mais antigas são recebidas (e guardadas) antes de enviar outras requisições.
+Sem esse limite, as respostas não lidas enchiam os buffers dos sockets e o cliente e o
+servidor ficavam os dois parados no envio.
+
+* `ConexaoRemota` e `PoolConexoes`: interface síncrona, que pode ser usada por várias threads.
+* `ConexaoRemotaAsync` e `PoolConexoesAsync`: interface para o `asyncio`.
+
+Exemplo::
+
+    pool = PoolConexoes('localhost', 5016, tamanho=4)
+    pool.escreve('chave', 'valor')
+    print(pool.le('chave'))
+
+    # Várias requisições em andamento na mesma conexão (até `janela` sem resposta)
+    conn = pool.conexao()
+    pendentes = conn.requisitaVarias([(protocolo.OP_READ, chave) for chave in chaves])
+    valores = [resposta.resultado() for resposta in pendentes]
+"""
+
+from conexao import Conexao
+import protocolo
+
+import socket
+import asyncio
+import threading
+import itertools
+from collections import deque
+
+JANELA_PADRAO = 32
+"""Número padrão de requisições sem resposta em cada conexão. As respostas dessas requisições
+ficam nos buffers dos sockets até serem lidas, então a janela não deve ser muito maior."""
+
+def _valorResposta(dados):
+    """Decodifica uma resposta do protocolo binário, lançando o erro se for uma mensagem de erro.
+
+    Args:
+        `dados` (bytes): A resposta codificada.
+
+    Returns:
+        Any: O conteúdo da resposta.
+
+    Raises:
+        RuntimeError: Se o servidor respondeu com uma mensagem de erro.
+    """
+
+    tipo, valor = protocolo.decodificaResposta(dados)
+    if tipo == protocolo.RESP_ERRO:
+        raise RuntimeError(valor)
+    return valor
+
+class _Operacoes:
+    """Métodos de conveniência para cada operação do protocolo binário, usando o
+    método `executa(op, *campos)` da classe que herda deles."""
+
+    def le(self, chave):
+        """Lê os valores da entrada `chave`."""
+        return self.executa(protocolo.OP_READ, chave)
+
+    def escreve(self, chave, valor, segundos=None):
+        """Adiciona `valor` na entrada `chave` (com tempo de vida, se `segundos` for informado)
+        e retorna se a entrada já existia."""
+        if segundos is None:
+            return self.executa(protocolo.OP_WRITE, chave, valor)
+        return self.executa(protocolo.OP_WRITE, chave, valor, repr(float(segundos)))
+
+    def expira(self, chave, segundos):
+        """Define o tempo de vida da entrada `chave` e retorna se ela existe."""
+        return self.executa(protocolo.OP_EXPIRE, chave, repr(float(segundos)))
+
+    def remove(self, chave):
+        """Remove a entrada `chave` e retorna se ela existia (apenas administrador)."""
+        return self.executa(protocolo.OP_REMOVE, chave)
+
+    def leVarias(self, chaves):
+        """Lê os valores de várias entradas, retornando uma lista por chave."""
+        return self.executa(protocolo.OP_MREAD, *chaves)
+
+    def escreveVarias(self, pares):
+        """Adiciona vários pares `(chave, valor)` e retorna, para cada um, se a entrada já existia."""
+        return self.executa(protocolo.OP_MWRITE, *[campo for par in pares for campo in par])
+
+    def removeVarias(self, chaves):
+        """Remove várias entradas e retorna, para cada uma, se ela existia (apenas administrador)."""
+        return self.executa(protocolo.OP_MREMOVE, *chaves)
+
+    def listaChaves(self, inicio, fim=None, limite=None):
+        """Lista, em ordem, as chaves a partir de `inicio` e menores que `fim` (até `limite` chaves)."""
+        return self.executa(protocolo.OP_RANGE, inicio, fim or '', '' if limite is None else str(limite))
+
+    def buscaValor(self, valor):
+        """Lista, em ordem, as chaves que têm o valor `valor`."""
+        return self.executa(protocolo.OP_FIND, valor)
+
+class Resposta:
+    """Resposta pendente de uma requisição enviada por uma `ConexaoRemota`."""
+
+    __slots__ = ('_conexao', '_pronta', '_dados', '_erro')
+
+    def __init__(self, conexao):
+        self._conexao = conexao
+        self._pronta = False
+        self._dados = None
+        self._erro = None
+
+    def pronta(self):
+        """Informa se a resposta já foi recebida."""
+        return self._pronta
+
+    def resultado(self):
+        """Espera a resposta chegar e retorna o conteúdo dela.
+
+        Returns:
+            Any: O conteúdo da resposta (lista de valores, booleano, etc.).
+
+        Raises:
+            RuntimeError: Se o servidor respondeu com uma mensagem de erro.
+            ConnectionError: Se a conexão foi fechada antes da resposta chegar.
+        """
+
+        if not self._pronta:
+            self._conexao._recebeAte(self)
+
+        if self._erro:
+            raise self._erro
+        return _valorResposta(self._dados)
+
+class ConexaoRemota(_Operacoes):
+    """Conexão síncrona com o servidor, com várias requisições em andamento ao mesmo tempo.
+    Pode ser usada por várias threads: o envio de cada requisição e a leitura das respostas
+    são protegidos por locks, e quem espera uma resposta lê as respostas anteriores a ela
+    (guardando-as para as outras requisições), sem uma thread só para a leitura. Quem envia
+    com a janela cheia também lê as respostas mais antigas antes de enviar."""
+
+    def __init__(self, end, porta, sock=None, janela=JANELA_PADRAO):
+        """Conecta no servidor e troca a conexão para o protocolo binário.
+
+        Args:
+            `end` (str): Endereço IP do servidor.
+            `porta` (int): Porta do servidor.
+            `sock` (socket, optional): Socket já conectado ao servidor (ex.: um lado de um
+                `socket.socketpair`). Se for informado, `end` e `porta` não são usados.
+            `janela` (int, optional): Número máximo de requisições enviadas sem resposta.
+
+        Raises:
+            ConnectionError: Se o servidor recusou a conexão ou a troca de protocolo.
+        """
+
+        self._janela = max(1, janela)
+        self._conn = Conexao(end, porta, sock)
+        if sock is None:
+            self._conn.conecta()
+            self._conn._main_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # Requisições pequenas não esperam
+
+        self._pendentes = deque() # Respostas ainda não recebidas, na ordem de envio
+        self._envio_lock = threading.Lock()
+        self._recebe_lock = threading.Lock()
+        self._erro = None # Erro que fechou a conexão
+
+        # A resposta da negociação pode ser a mensagem de servidor cheio, que encerra a conexão
+        self._conn.enviaMensagem(protocolo.COMANDO_NEGOCIACAO)
+        resp = self._conn.recebeMensagem()
+        if resp != "OK":
+            self._conn.fechaConexao()
+            raise ConnectionError(resp or "Conexão fechada pelo servidor")
+
+    def requisitaVarias(self, requisicoes):
+        """Envia várias requisições, em partes de até `janela` requisições (cada parte em uma
+        única chamada ao socket), sem esperar as respostas. Antes de cada parte, recebe as
+        respostas mais antigas até a parte caber na janela.
+
+        Args:
+            `requisicoes` (Iterable[Tuple]): Tuplas `(op, campo, ...)` com o código da operação e os campos.
+
+        Returns:
+            List[Resposta]: As respostas pendentes, na ordem das requisições.
+
+        Raises:
+            ConnectionError: Se a conexão foi fechada.
+        """
+
+        msgs = [protocolo.codificaRequisicao(op, *campos) for op, *campos in requisicoes]
+        respostas = [Resposta(self) for _ in msgs]
+
+        for inicio in range(0, len(msgs), self._janela):
+            fim = inicio + self._janela
+            parte = msgs[inicio:fim]
+
+            while True:
+                # O envio e a fila de pendentes ficam na mesma ordem
+                with self._envio_lock:
+                    if self._erro:
+                        raise self._erro
+                    if not self._pendentes or len(self._pendentes) + len(parte) <= self._janela:
+                        self._pendentes.extend(respostas[inicio:fim])
+                        self._conn.enviaMensagens(parte)
+                        break
+
+                # Janela cheia: recebe a resposta mais antiga (se outra thread não recebeu enquanto esta esperava o lock)
+                with self._recebe_lock:
+                    if self._pendentes and len(self._pendentes) + len(parte) > self._janela:
+                        self._recebeProxima()
+
+        return respostas
+
+    def requisita(self, op, *campos):
+        """Envia uma requisição sem esperar a resposta.
+
+        Args:
+            `op` (int): Código da operação (`protocolo.OP_*`).
+            `campos` (str): Chaves e valores da operação.
+
+        Returns:
+            Resposta: A resposta pendente.
+        """
+
+        return self.requisitaVarias([(op, *campos)])[0]
+
+    def executa(self, op, *campos):
+        """Envia uma requisição e espera a resposta.
+
+        Args:
+            `op` (int): Código da operação (`protocolo.OP_*`).
+            `campos` (str): Chaves e valores da operação.
+
+        Returns:
+            Any: O conteúdo da resposta.
+        """
+
+        return self.requisita(op, *campos).resultado()
+
+    def _recebeAte(self, resposta):
+        """Recebe as respostas, na ordem, até a resposta `resposta` chegar."""
+
+        with self._recebe_lock:
+            while not resposta._pronta:
+                self._recebeProxima()
+
+    def _recebeProxima(self):
+        """Recebe a resposta pendente mais antiga. Deve ser chamada com o `_recebe_lock`."""
+
+        pendente = self._pendentes.popleft()
+        try:
+            dados = self._conn.recebeBytes()
+        except OSError as e:
+            dados, self._erro = None, ConnectionError(str(e))
+
+        if dados is None:
+            # Conexão fechada: todas as respostas pendentes ficam com o erro
+            self._erro = self._erro or ConnectionError("Conexão fechada pelo servidor")
+            with self._envio_lock:
+                for outra in [pendente] + list(self._pendentes):
+                    outra._erro, outra._pronta = self._erro, True
+                self._pendentes.clear()
+            return
+
+        pendente._dados, pendente._pronta = dados, True
+
+    def fecha(self):
+        """Fecha a conexão."""
+
+        self._conn.fechaConexao()
+
+class PoolConexoes(_Operacoes):
+    """Conjunto de conexões com o servidor, usadas em rodízio. Como cada conexão aceita
+    várias requisições em andamento, as threads não precisam esperar uma conexão livre."""
+
+    def __init__(self, end, porta, tamanho=4, janela=JANELA_PADRAO):
+        """Instancia um `PoolConexoes`. As conexões são abertas quando forem usadas pela primeira vez.
+
+        Args:
+            `end` (str): Endereço IP do servidor.
+            `porta` (int): Porta do servidor.
+            `tamanho` (int, optional): Número de conexões.
+            `janela` (int, optional): Número máximo de requisições sem resposta em cada conexão.
+        """
+
+        self._end = end
+        self._porta = porta
+        self._janela = janela
+        self._conexoes = [None] * tamanho
+        self._proxima = itertools.count() # O next() de um count é atômico
+        self._lock = threading.Lock()
+
+    def conexao(self):
+        """Retorna a próxima conexão do rodízio, abrindo ela se necessário.
+
+        Returns:
+            ConexaoRemota: A conexão.
+        """
+
+        i = next(self._proxima) % len(self._conexoes)
+        conexao = self._conexoes[i]
+
+        if conexao is None:
+            with self._lock:
+                conexao = self._conexoes[i]
+                if conexao is None:
+                    conexao = self._conexoes[i] = ConexaoRemota(self._end, self._porta, janela=self._janela)
+        return conexao
+
+    def executa(self, op, *campos):
+        """Envia uma requisição por uma das conexões e espera a resposta."""
+
+        return self.conexao().executa(op, *campos)
+
+    def fecha(self):
+        """Fecha todas as conexões abertas."""
+
+        for conexao in self._conexoes:
+            if conexao is not None:
+                conexao.fecha()
+        self._conexoes = [None] * len(self._conexoes)
+
+class ConexaoRemotaAsync(_Operacoes):
+    """Conexão com o servidor para o `asyncio`, com várias requisições em andamento ao
+    mesmo tempo. Uma tarefa lê as respostas e completa as futures das requisições, na ordem.
+    Os métodos de operação (`le`, `escreve`, ...) retornam corrotinas."""
+
+    def __init__(self, reader, writer, janela=JANELA_PADRAO):
+        """Instancia uma `ConexaoRemotaAsync` a partir dos streams de uma conexão
+        já no protocolo binário. Use `ConexaoRemotaAsync.abre` para conectar.
+
+        Args:
+            `reader` (asyncio.StreamReader): Stream de leitura da conexão.
+            `writer` (asyncio.StreamWriter): Stream de escrita da conexão.
+            `janela` (int, optional): Número máximo de requisições enviadas sem resposta.
+        """
+
+        self._reader = reader
+        self._writer = writer
+        self._janela = max(1, janela)
+        self._pendentes = deque() # Futures das respostas ainda não recebidas, na ordem de envio
+        self._vagas = asyncio.Semaphore(self._janela) # Uma vaga por requisição que pode ser enviada sem resposta
+        self._envio_lock = asyncio.Lock() # Só uma tarefa de cada vez pega as vagas de uma parte e envia
+        self._leitora = asyncio.get_running_loop().create_task(self._recebeRespostas())
+
+    @classmethod
+    async def abre(cls, end, porta, janela=JANELA_PADRAO):
+        """Conecta no servidor e troca a conexão para o protocolo binário.
+
+        Args:
+            `end` (str): Endereço IP do servidor.
+            `porta` (int): Porta do servidor.
+            `janela` (int, optional): Número máximo de requisições enviadas sem resposta.
+
+        Returns:
+            ConexaoRemotaAsync: A conexão.
+
+        Raises:
+            ConnectionError: Se o servidor recusou a conexão ou a troca de protocolo.
+        """
+
+        reader, writer = await asyncio.open_connection(end, porta)
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        msg = protocolo.COMANDO_NEGOCIACAO.encode('utf-8')
+        writer.writelines([len(msg).to_bytes(4, 'big'), msg])
+        try:
+            tam = int.from_bytes(await reader.readexactly(4), 'big')
+            resp = (await reader.readexactly(tam)).decode('utf-8')
+        except asyncio.IncompleteReadError:
+            resp = None
+
+        if resp != "OK":
+            writer.close()
+            raise ConnectionError(resp or "Conexão fechada pelo servidor")
+
+        return cls(reader, writer, janela)
+
+    async def _recebeRespostas(self):
+        """Tarefa que lê as respostas e completa as futures pendentes, na ordem. Quando
+        termina (a conexão caiu ou uma resposta não pôde ser lida), as futures pendentes
+        falham e as tarefas que esperam uma vaga são acordadas."""
+
+        try:
+            while True:
+                tam = int.from_bytes(await self._reader.readexactly(4), 'big')
+                dados = await self._reader.readexactly(tam)
+
+                futuro = self._pendentes.popleft()
+                self._vagas.release()
+                if futuro.cancelled():
+                    continue
+
+                try:
+                    futuro.set_result(_valorResposta(dados))
+                except RuntimeError as e:
+                    futuro.set_exception(e)
+                except Exception:
+                    self._pendentes.appendleft(futuro) # Falha junto com as outras pendentes
+                    raise
+        except Exception as e:
+            if isinstance(e, asyncio.IncompleteReadError):
+                erro = ConnectionError("Conexão fechada pelo servidor")
+            else:
+                # Depois de uma resposta que não pôde ser lida, as próximas ficariam fora de ordem
+                erro = ConnectionError("Conexão fechada: " + (str(e) or repr(e)))
+                self._writer.close()
+
+            while self._pendentes:
+                futuro = self._pendentes.popleft()
+                if not futuro.done():
+                    futuro.set_exception(erro)
+        finally:
+            # Acorda quem espera uma vaga, para ver que a conexão fechou (uma tarefa pega até `janela` vagas)
+            for _ in range(self._janela):
+                self._vagas.release()
+
+    async def requisitaVarias(self, requisicoes):
+        """Envia várias requisições, em partes de até `janela` requisições, sem esperar as
+        respostas. Antes de cada parte, espera as respostas mais antigas até a parte caber
+        na janela, e depois dela espera o buffer de envio esvaziar.
+
+        Args:
+            `requisicoes` (Iterable[Tuple]): Tuplas `(op, campo, ...)` com o código da operação e os campos.
+
+        Returns:
+            List[asyncio.Future]: As futures das respostas, na ordem das requisições.
+
+        Raises:
+            ConnectionError: Se a conexão foi fechada.
+        """
+
+        loop = asyncio.get_running_loop()
+        requisicoes = list(requisicoes)
+        futuros = []
+
+        for inicio in range(0, len(requisicoes), self._janela):
+            parte = requisicoes[inicio:inicio + self._janela]
+
+            async with self._envio_lock:
+                # Espera as respostas mais antigas chegarem, até ter uma vaga para cada requisição da parte
+                vagas = 0
+                while vagas < len(parte) and not self._leitora.done():
+                    await self._vagas.acquire()
+                    vagas += 1
+
+                if self._leitora.done():
+                    for _ in range(vagas):
+                        self._vagas.release() # Devolve as vagas, para as outras tarefas também verem o erro
+                    raise ConnectionError("Conexão fechada")
+
+                buffers = []
+                for op, *campos in parte:
+                    msg = protocolo.codificaRequisicao(op, *campos)
+                    buffers.append(len(msg).to_bytes(4, 'big'))
+                    buffers.append(msg)
+                    futuros.append(loop.create_future())
+
+                # O envio e a fila de pendentes ficam na mesma ordem (não há await entre eles)
+                self._pendentes.extend(futuros[inicio:])
+                self._writer.writelines(buffers)
+
+                # Respeita o controle de fluxo do socket quando o servidor está lento para ler
+                await self._writer.drain()
+
+        return futuros
+
+    async def requisita(self, op, *campos):
+        """Envia uma requisição sem esperar a resposta.
+
+        Returns:
+            asyncio.Future: A future da resposta.
+        """
+
+        return (await self.requisitaVarias([(op, *campos)]))[0]
+
+    async def executa(self, op, *campos):
+        """Envia uma requisição e espera a resposta.
+
+        Args:
+            `op` (int): Código da operação (`protocolo.OP_*`).
+            `campos` (str): Chaves e valores da operação.
+
+        Returns:
+            Any: O conteúdo da resposta.
+        """
+
+        futuro = await self.requisita(op, *campos)
+        return await futuro
+
+    async def fecha(self):
+        """Fecha a conexão."""
+
+        self._writer.close()
+        await self._writer.wait_closed()
+        await asyncio.gather(self._leitora, return_exceptions=True)
+
+class PoolConexoesAsync(_Operacoes):
+    """Conjunto de conexões `ConexaoRemotaAsync` usadas em rodízio."""
+
+    def __init__(self, conexoes):
+        """Instancia um `PoolConexoesAsync` com conexões já abertas. Use `PoolConexoesAsync.abre` para conectar."""
+
+        self._conexoes = conexoes
+        self._proxima = itertools.count()
+
+    @classmethod
+    async def abre(cls, end, porta, tamanho=4, janela=JANELA_PADRAO):
+        """Abre as conexões do pool.
+
+        Args:
+            `end` (str): Endereço IP do servidor.
+            `porta` (int): Porta do servidor.
+            `tamanho` (int, optional): Número de conexões.
+            `janela` (int, optional): Número máximo de requisições sem resposta em cada conexão.
+
+        Returns:
+            PoolConexoesAsync: O pool.
+        """
+
+        conexoes = await asyncio.gather(*[ConexaoRemotaAsync.abre(end, porta, janela) for _ in range(tamanho)])
+        return cls(list(conexoes))
+
+    def conexao(self):
+        """Retorna a próxima conexão do rodízio."""
+
+        return self._conexoes[next(self._proxima) % len(self._conexoes)]
+
+    def executa(self, op, *campos):
+        """Envia uma requisição por uma das conexões e retorna a corrotina que espera a resposta."""
+
+        return self.conexao().executa(op, *campos)
+
+    async def fecha(self):
+        """Fecha todas as conexões."""
+
+        await asyncio.gather(*[conexao.fecha() for conexao in self._conexoes])
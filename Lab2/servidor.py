@@ -1,11 +1,54 @@
-from dicionario import Dicionario
+from dicionario import Dicionario, fimPrefixo, juntaDicionarios
 from conexao import Conexao
-from select import select
-
+from travas import LocksParticionados
+from registro import Registrador
+from metricas import Metricas
+from perfil import Perfilador, RastreadorMemoria
+import protocolo
+import registro
+from concurrent.futures import ThreadPoolExecutor
+
+import os
 import sys
 import time
+import queue
+import socket
+import selectors
 import threading
 
+def resumo(texto, limite=200):
+    """Encurta um texto longo (como um comando em lote) para ser impresso no log.
+
+    Args:
+        `texto` (str): O texto que será encurtado.
+        `limite` (int, optional): Número máximo de caracteres mantidos.
+
+    Returns:
+        str: O texto, cortado em `limite` caracteres se for maior que isso.
+    """
+
+    if len(texto) <= limite:
+        return texto
+
+    return texto[:limite] + "... (" + str(len(texto)) + " caracteres)"
+
+def segundosValidos(args):
+    """Converte o tempo de vida informado em um comando para segundos.
+
+    Args:
+        `args` (List[str]): Lista com o argumento de segundos (vazia se ele não foi informado).
+
+    Returns:
+        float: O tempo de vida, ou `None` se ele não foi informado ou não é um número não negativo.
+    """
+
+    try:
+        segundos = float(args[0])
+    except (IndexError, ValueError):
+        return None
+
+    return segundos if segundos >= 0 else None
+
 class Servidor:
     """Componente Servidor - Recebe e processa as requisições do cliente e envia respostas com os valores do dicionário. Também implementa uma interface para o administrador do servidor."""
 
@@ -15,13 +58,61 @@ class Servidor:
     _dict = None
     """Objeto `Dicionario` associado ao servidor"""
 
-    _print_lock = threading.Lock()
-    """Lock para as chamadas de print."""
+    _log = None
+    """Objeto `Registrador` que imprime os logs do servidor."""
+
+    _metricas = None
+    """Objeto `Metricas` com os contadores do servidor (comando `STATS`)."""
+
+    _dict_lock = None
+    """Locks de leitura e escrita para acesso ao dicionário, particionados pelas chaves."""
+
+    _TAM_PAGINA = 100
+    """Número máximo de chaves em cada página das respostas de `PREFIX` e `RANGE`."""
+
+    _INTERVALO_EXPIRACAO = 0.1
+    """Tempo máximo (em segundos) entre duas verificações da fila de expiração."""
+
+    _expirador = None
+    """Thread que remove as chaves cujo tempo de vida acabou."""
 
-    _dict_lock = threading.Lock()
-    """Lock para acesso ao dicionário."""
+    _encerrando = None
+    """Evento que indica que o servidor está encerrando (para a thread de expiração)."""
 
-    def __init__(self, end, porta, dict_path):
+    _backlog = 5
+    """Tamanho da fila de conexões esperando para serem aceitas pelo sistema operacional."""
+
+    _n_trabalhadores = 16
+    """Número de threads que atendem as requisições das conexões."""
+
+    _max_conexoes = None
+    """Número máximo de conexões simultâneas. As conexões além dele são rejeitadas. É `None` se não houver limite."""
+
+    _tempo_ocioso = None
+    """Tempo (em segundos) sem requisições depois do qual uma conexão é encerrada. É `None` se não houver limite."""
+
+    _trabalhadores = None
+    """Pool de threads que atendem as requisições das conexões prontas."""
+
+    _seletor = None
+    """Seletor que espera novas conexões, comandos do administrador e requisições das conexões que não estão sendo atendidas."""
+
+    _sessoes = None
+    """Endereço, estado (protocolo e contadores de bytes) e instante da última atividade de cada conexão, indexados pelo socket."""
+
+    _devolvidas = None
+    """Fila das conexões que os trabalhadores terminaram de atender e que voltam para o seletor."""
+
+    _despertador = None
+    """Par de sockets usado pelos trabalhadores para acordar a thread principal quando devolvem uma conexão."""
+
+    _proxima_verificacao = 0
+    """Instante (de `time.monotonic`) da próxima verificação das conexões ociosas."""
+
+    def __init__(self, end, porta, dict_path, usa_log=False, limite_log=None, n_particoes=16,
+                 nivel_log=registro.INFO, amostragem_log=1.0, arquivo_log=None, limite_memoria=None, compacto=False,
+                 intervalo_snapshot=None, escritas_snapshot=None, backlog=5, n_trabalhadores=16, max_conexoes=None,
+                 tempo_ocioso=None):
         """Recebe uma máscara de endereco IP, um numero de porta e 
         um caminho para um arquivo de dicionário e instancia um objeto `Servidor`.
 
@@ -29,10 +120,39 @@ class Servidor:
             `end` (str): Uma máscara de endereço IP indicando os endreços aceitos para conexão.
             `porta` (int): A porta onde o servidor receberá conexões.
             `dict_path` (str): Caminho do arquivo que guardará o dicionário.
+            `usa_log` (bool, optional): Ativa o modo de log de escrita do dicionário.
+            `limite_log` (int, optional): Tamanho do log (em bytes) que dispara uma compactação.
+            `n_particoes` (int, optional): Número de partições dos locks do dicionário.
+            `nivel_log` (int, optional): Nível mínimo das mensagens de log.
+            `amostragem_log` (float, optional): Fração das requisições que aparecem no log.
+            `arquivo_log` (str, optional): Arquivo onde o log será escrito, em vez do terminal.
+            `limite_memoria` (int, optional): Memória (em bytes) para as entradas do dicionário. As que não couberem ficam em disco.
+            `compacto` (bool, optional): Usa a representação compacta dos valores do dicionário.
+            `intervalo_snapshot` (float, optional): Intervalo (em segundos) entre snapshots periódicos do dicionário.
+            `escritas_snapshot` (int, optional): Número de alterações que dispara um snapshot periódico do dicionário.
+            `backlog` (int, optional): Tamanho da fila de conexões esperando para serem aceitas.
+            `n_trabalhadores` (int, optional): Número de threads que atendem as requisições das conexões.
+            `max_conexoes` (int, optional): Número máximo de conexões simultâneas.
+            `tempo_ocioso` (float, optional): Tempo (em segundos) sem requisições que encerra uma conexão.
         """
         # Inicia os componentes Conexão e Dicionário
         self._conn = Conexao(end, porta)
-        self._dict = Dicionario(dict_path)
+        self._dict = Dicionario(dict_path, usa_log=usa_log, limite_log=limite_log, limite_memoria=limite_memoria,
+                                compacto=compacto, intervalo_snapshot=intervalo_snapshot,
+                                escritas_snapshot=escritas_snapshot)
+        self._dict_lock = LocksParticionados(n_particoes)
+        self._log = Registrador(nivel_log, amostragem_log, arquivo_log)
+        self._metricas = Metricas()
+        self._encerrando = threading.Event()
+        self._backlog = backlog
+        self._n_trabalhadores = n_trabalhadores
+        self._max_conexoes = max_conexoes
+        self._tempo_ocioso = tempo_ocioso
+        self._sessoes = {}
+        self._perfilador = None # Perfil de CPU em andamento (comando PROFILE)
+        self._memoria = RastreadorMemoria()
+        self._reusa_porta = False # Se outros processos podem escutar na mesma porta (SO_REUSEPORT)
+        self._entrada_pendente = b'' # Parte de um comando do administrador que ainda não terminou de chegar
 
     def inicia(self, n_conexoes):
         """Inicia o servidor, aceitando até `n_conexoes` conexoes.
@@ -41,10 +161,19 @@ class Servidor:
             `n_conexoes` (int): Número máximo de conexões simultâneas no servidor.
         """
         # Inicia a conexão do servidor
-        self._conn.iniciaServidor(n_conexoes)
+        self._conn.iniciaServidor(n_conexoes, self._reusa_porta)
+
+        # Inicia o registrador, que marca o tempo inicial (serve para imprimir logs indicando o tempo)
+        self._log.inicia()
+
+        # Inicia a thread que remove as chaves expiradas
+        self._expirador = threading.Thread(target=self.expiraChaves, daemon=True)
+        self._expirador.start()
 
-        # Marca o tempo inicial (serve para imprimir logs indicando o tempo)
-        self._start_time = time.time()
+        self.imprimeAjuda()
+
+    def imprimeAjuda(self):
+        """Limpa o terminal e imprime a mensagem de início do servidor, com os comandos disponíveis."""
 
         print("\033c", end="") # Limpa o terminal
 
@@ -54,7 +183,18 @@ class Servidor:
         print()
         print("\033[33mREAD [chave]          - \033[0mLê uma entrada do dicionário.")
         print("\033[33mWRITE [chave] [valor] - \033[0mEscreve uma nova entrada no dicionário.")
+        print("\033[33mWRITE [chave] [valor] EX [segundos] - \033[0mEscreve e define o tempo de vida da entrada.")
+        print("\033[33mEXPIRE [chave] [segundos] - \033[0mDefine o tempo de vida de uma entrada.")
         print("\033[33mREMOVE [chave]        - \033[0mRemove uma entrada do dicionário. \033[91m(Apenas para administrador)\033[0m")
+        print("\033[33mMREAD [chave] ...     - \033[0mLê várias entradas do dicionário.")
+        print("\033[33mMWRITE [chave] [valor] ... - \033[0mEscreve vários valores no dicionário.")
+        print("\033[33mMREMOVE [chave] ...   - \033[0mRemove várias entradas do dicionário. \033[91m(Apenas para administrador)\033[0m")
+        print("\033[33mPREFIX [prefixo] [limite] - \033[0mLista as chaves que começam com o prefixo.")
+        print("\033[33mRANGE [de] [ate] [limite] - \033[0mLista as chaves entre duas chaves (inclusive).")
+        print("\033[33mFIND [valor]          - \033[0mLista as chaves que têm o valor.")
+        print("\033[33mSTATS                 - \033[0mMostra as estatísticas do servidor.")
+        print("\033[33mPROFILE START|STOP [arquivo] - \033[0mInicia ou para o perfil de CPU, salvando no arquivo. \033[91m(Apenas para administrador)\033[0m")
+        print("\033[33mMEMSNAP START|STOP|[arquivo] - \033[0mRastreia a memória alocada e salva um snapshot. \033[91m(Apenas para administrador)\033[0m")
         print("\033[33mQUIT                  - \033[0mEncerra o servido se nenhuma conexão estiver ativa.")
         print()
 
@@ -68,7 +208,8 @@ class Servidor:
                 'cliente' - Cliente
 
         Returns:
-            str: Mensagem de resposta do comando.
+            str | Iterator[str]: Mensagem de resposta do comando. Os comandos `PREFIX`
+            e `RANGE` respondem com um iterador de páginas, cada uma com uma chave por linha.
         """
 
         comandos = comando.split(' ') # Separa a string do comando
@@ -90,10 +231,30 @@ class Servidor:
             if len(comandos) < 3: # Verifica se o comando foi escrito corretamente
                 return "Uso do comando WRITE: WRITE [chave] [valor]"
 
+            # Escrita com tempo de vida (WRITE [chave] [valor] EX [segundos])
+            segundos = None
+            if len(comandos) > 3:
+                segundos = segundosValidos(comandos[4:5]) if comandos[3] == "EX" else None
+                if segundos is None:
+                    return "Uso do comando WRITE: WRITE [chave] [valor] EX [segundos]"
+
             # Escreve na entrada do dicionario
-            res = self.escreveEntrada(comandos[1], comandos[2])
+            res = self.escreveEntrada(comandos[1], comandos[2], segundos)
             return res
 
+        elif comandos[0] == "EXPIRE":
+            # Comando de tempo de vida
+
+            segundos = segundosValidos(comandos[2:3])
+            if len(comandos) < 3 or segundos is None: # Verifica se o comando foi escrito corretamente
+                return "Uso do comando EXPIRE: EXPIRE [chave] [segundos]"
+
+            # Define o tempo de vida da entrada
+            if self.defineTempoVida(comandos[1], segundos):
+                return "Entrada '" + comandos[1] + "' expira em " + comandos[2] + " segundos."
+
+            return "Entrada '" + comandos[1] + "' não encontrada no dicionario."
+
         elif comandos[0] == "REMOVE":
             # Comando de remoção
 
@@ -107,43 +268,410 @@ class Servidor:
             res = self.removeEntrada(comandos[1])
             return res
 
+        elif comandos[0] == "MREAD":
+            # Comando de leitura em lote
+
+            if len(comandos) < 2: # Verifica se o comando foi escrito corretamente
+                return "Uso do comando MREAD: MREAD [chave] [chave] ..."
+
+            # Le as entradas do dicionario, respondendo uma lista de valores por linha
+            values = self.leEntradas(comandos[1:])
+            return '\n'.join(str(value) for value in values)
+
+        elif comandos[0] == "MWRITE":
+            # Comando de escrita em lote
+
+            if len(comandos) < 3 or len(comandos) % 2 == 0: # Verifica se o comando foi escrito corretamente
+                return "Uso do comando MWRITE: MWRITE [chave] [valor] [chave] [valor] ..."
+
+            # Escreve os pares (chave, valor) no dicionario
+            res = self.escreveEntradas(list(zip(comandos[1::2], comandos[2::2])))
+            return res
+
+        elif comandos[0] == "MREMOVE":
+            # Comando de remoção em lote
+
+            if priv != "admin": # Verifica se quem enviou o comando tem privilegio adequado
+                return "Apenas o administrador pode usar este comando!"
+
+            if len(comandos) < 2: # Verifica se o comando foi escrito corretamente
+                return "Uso do comando MREMOVE: MREMOVE [chave] [chave] ..."
+
+            # Remove as entradas do dicionario
+            res = self.removeEntradas(comandos[1:])
+            return res
+
+        elif comandos[0] == "PREFIX":
+            # Comando de busca de chaves por prefixo
+
+            # Verifica se o comando foi escrito corretamente
+            if len(comandos) not in (2, 3) or not all(arg.isdigit() for arg in comandos[2:]):
+                return iter(["Uso do comando PREFIX: PREFIX [prefixo] [limite]"])
+
+            limite = int(comandos[2]) if len(comandos) == 3 else None
+            return self.buscaChaves(comandos[1], fimPrefixo(comandos[1]), limite)
+
+        elif comandos[0] == "RANGE":
+            # Comando de busca de chaves por intervalo
+
+            # Verifica se o comando foi escrito corretamente
+            if len(comandos) not in (3, 4) or not all(arg.isdigit() for arg in comandos[3:]):
+                return iter(["Uso do comando RANGE: RANGE [de] [ate] [limite]"])
+
+            # A menor string maior que `ate` é `ate` + '\0', então o intervalo inclui `ate`
+            limite = int(comandos[3]) if len(comandos) == 4 else None
+            return self.buscaChaves(comandos[1], comandos[2] + '\0', limite)
+
+        elif comandos[0] == "FIND":
+            # Comando de busca reversa (valor -> chaves)
+
+            if len(comandos) < 2: # Verifica se o comando foi escrito corretamente
+                return "Uso do comando FIND: FIND [valor]"
+
+            # Busca as chaves no índice invertido
+            keys = self.buscaValor(comandos[1])
+            return str(keys)
+
+        elif comandos[0] == "STATS":
+            # Comando de estatísticas
+            return self.estatisticas()
+
         # Se o camndo não for válido, retorna uma mensagem indicando isso
         return "COMANDO '" + comandos[0] + "' INVALIDO"
     
-    def atendeRequisicoes(self, sock, end):
-        """Atende requisições de uma conexão por tempo indeterminado.
-        Função que será executada pela thread de cada conexão.
+    def processaMensagem(self, msg, sessao, priv, registrar=True):
+        """Processa uma mensagem recebida de uma conexão, no protocolo de texto
+        ou no protocolo binário, dependendo do que a conexão negociou.
+
+        Args:
+            `msg` (bytes): A mensagem recebida.
+            `sessao` (dict): Estado da conexão. A chave `'binario'` indica se ela usa o protocolo binário
+                e a chave `'bytes'` guarda os bytes recebidos e enviados por ela.
+            `priv` (str): O privilégio de quem enviou a mensagem.
+            `registrar` (bool, optional): Se False, não monta a descrição da requisição para o log.
+
+        Returns:
+            Tuple[bytes | Iterator[bytes], str]: A resposta codificada e uma descrição da requisição
+            para o log (ou `None`). Respostas paginadas são um iterador de mensagens, terminado por
+            uma mensagem vazia.
+        """
+
+        inicio = time.perf_counter()
+        binario = sessao['binario'] # A negociação muda o protocolo só das próximas mensagens
+
+        if binario:
+            # Mensagem do protocolo binário. Uma requisição mal formada recebe uma resposta de erro,
+            # e a conexão continua (o tamanho de cada mensagem vem antes dela, então as próximas não são afetadas)
+            try:
+                op, campos = protocolo.decodificaRequisicao(msg)
+            except ValueError as e:
+                campos, nome = [], "INVALIDA"
+                tipo, valor = protocolo.RESP_ERRO, "Requisição inválida: " + str(e)
+            else:
+                tipo, valor = self.interpretaBinario(op, campos, priv)
+                nome = protocolo.NOMES_OPERACOES.get(op, str(op))
+            resp_raw = protocolo.codificaResposta(tipo, valor)
+        else:
+            comando = str(msg, encoding='utf-8')
+            nome = comando.split(' ', 1)[0]
+
+            if comando == protocolo.COMANDO_NEGOCIACAO:
+                # A conexão passa a usar o protocolo binário
+                sessao['binario'] = True
+                resp = "OK"
+            else:
+                # Interpreta o comando de texto
+                resp = self.interpretaComando(comando, priv)
+
+            if isinstance(resp, str):
+                resp_raw = resp.encode('utf-8')
+            else:
+                # Resposta paginada: as páginas são lidas do dicionário enquanto são enviadas
+                resp_raw = self.codificaPaginas(resp, sessao)
+                resp = "[resposta paginada]"
+
+        # Registra as métricas da requisição (o cabeçalho de cada mensagem tem 4 bytes)
+        self._metricas.registraComando(nome, time.perf_counter() - inicio)
+        sessao['bytes'][0] += len(msg) + 4
+        if isinstance(resp_raw, bytes):
+            sessao['bytes'][1] += len(resp_raw) + 4
+
+        if not registrar:
+            return resp_raw, None
+
+        if binario:
+            return resp_raw, "[bin] " + resumo(nome + " " + " ".join(campos)) + " --- R: " + resumo(str(valor))
+
+        return resp_raw, resumo(comando) + " --- R: " + resumo(resp)
+
+    def codificaPaginas(self, paginas, sessao):
+        """Codifica as páginas de uma resposta paginada, uma mensagem por página,
+        seguidas de uma mensagem vazia que indica o fim da resposta.
+
+        Args:
+            `paginas` (Iterator[str]): As páginas da resposta.
+            `sessao` (dict): Estado da conexão (para contar os bytes enviados).
+
+        Yields:
+            bytes: Cada mensagem da resposta.
+        """
+
+        for pagina in paginas:
+            quadro = pagina.encode('utf-8')
+            sessao['bytes'][1] += len(quadro) + 4
+            yield quadro
+
+        sessao['bytes'][1] += 4
+        yield b''
+
+    def interpretaBinario(self, op, campos, priv):
+        """Executa uma operação do protocolo binário.
+
+        Args:
+            `op` (int): Código da operação (`protocolo.OP_*`).
+            `campos` (List[str]): Chaves e valores da operação.
+            `priv` (str): O privilégio de quem enviou a operação.
+
+        Returns:
+            Tuple[int, Any]: O tipo (`protocolo.RESP_*`) e o conteúdo da resposta.
+        """
+
+        # Verifica se o número de campos está correto para a operação
+        n_campos = {protocolo.OP_READ: (1,), protocolo.OP_WRITE: (2, 3), protocolo.OP_REMOVE: (1,),
+                    protocolo.OP_EXPIRE: (2,), protocolo.OP_RANGE: (3,), protocolo.OP_FIND: (1,)}
+        if op in n_campos and len(campos) not in n_campos[op]:
+            return protocolo.RESP_ERRO, "Número de campos inválido para " + protocolo.NOMES_OPERACOES[op]
+        if op == protocolo.OP_MWRITE and len(campos) % 2:
+            return protocolo.RESP_ERRO, "Número de campos inválido para MWRITE"
+
+        # Verifica se quem enviou tem privilegio para remover
+        if op in (protocolo.OP_REMOVE, protocolo.OP_MREMOVE) and priv != "admin":
+            return protocolo.RESP_ERRO, "Apenas o administrador pode usar este comando!"
+
+        if op == protocolo.OP_READ:
+            return protocolo.RESP_LISTA, self.leEntrada(campos[0])
+        elif op == protocolo.OP_WRITE:
+            segundos = segundosValidos(campos[2:])
+            if len(campos) == 3 and segundos is None:
+                return protocolo.RESP_ERRO, "Tempo de vida inválido para WRITE"
+            return protocolo.RESP_BOOL, self.adicionaValor(campos[0], campos[1], segundos)
+        elif op == protocolo.OP_REMOVE:
+            return protocolo.RESP_BOOL, self.apagaEntrada(campos[0])
+        elif op == protocolo.OP_MREAD:
+            return protocolo.RESP_LISTAS, self.leEntradas(campos)
+        elif op == protocolo.OP_MWRITE:
+            return protocolo.RESP_BOOLS, self.adicionaValores(list(zip(campos[0::2], campos[1::2])))
+        elif op == protocolo.OP_MREMOVE:
+            return protocolo.RESP_BOOLS, self.apagaEntradas(campos)
+        elif op == protocolo.OP_EXPIRE:
+            segundos = segundosValidos(campos[1:])
+            if segundos is None:
+                return protocolo.RESP_ERRO, "Tempo de vida inválido para EXPIRE"
+            return protocolo.RESP_BOOL, self.defineTempoVida(campos[0], segundos)
+        elif op == protocolo.OP_RANGE:
+            if campos[2] and not campos[2].isdigit():
+                return protocolo.RESP_ERRO, "Limite inválido para RANGE"
+            return protocolo.RESP_LISTA, self.listaChaves(campos[0], campos[1] or None, int(campos[2]) if campos[2] else None)
+        elif op == protocolo.OP_FIND:
+            return protocolo.RESP_LISTA, self.buscaValor(campos[0])
+
+        return protocolo.RESP_ERRO, "OPERAÇÃO " + str(op) + " INVALIDA"
+
+    def atendeRequisicoes(self, sock):
+        """Atende as requisições que já chegaram de uma conexão pronta para leitura.
+        Função executada por um trabalhador do pool. Enquanto isso, a conexão fica
+        fora do seletor, então só um trabalhador atende cada conexão por vez.
 
         Args:
             sock (socket): Socket da conexão que atenderá as requisições.
-            end (Tuple): Tupla que indica o endereço de IP e a porta do outro lado da conexão.
         """
 
-        # Executa por tempo indeterminado
-        while True:
-            # Recebe uma requisição do outro lado da conexão
-            # Se vier vazio (o outro lado fechou a conexão), sai do loop
-            comando = self._conn.recebeMensagem(sock)
-            if not comando: break
+        end, sessao, _ = self._sessoes[sock]
+
+        try:
+            # Recebe os bytes que já chegaram (se o outro lado fechou a conexão, aberta é False)
+            aberta = self._conn.recebeDisponivel(sock)
+
+            # Atende todas as requisições completas (o cliente pode ter enviado várias de uma vez).
+            # Uma requisição incompleta continua no buffer até o resto dela chegar
+            respostas = [] # Respostas que ainda não foram enviadas (são enviadas juntas)
+            while self._conn.temMensagem(sock):
+                msg = self._conn.recebeBytes(sock)
+
+                # Interpreta a requisição enviada com privilegio de cliente
+                # (só monta a mensagem de log se a requisição foi sorteada para o log)
+                resp, log = self.processaMensagem(msg, sessao, 'cliente', self._log.amostra())
+
+                # Guarda a resposta do comando. Uma resposta paginada é enviada
+                # (depois das respostas anteriores) página por página
+                if isinstance(resp, bytes):
+                    respostas.append(resp)
+                else:
+                    self._conn.enviaMensagens(respostas, sock=sock)
+                    respostas = []
+                    for quadro in resp:
+                        self._conn.enviaBytes(quadro, sock=sock)
+
+                # Imprime o comando recebido e a resposta enviada
+                if log:
+                    self.print_log(str(end) + ": " + log)
+
+            # Envia as respostas de todas as requisições atendidas de uma vez
+            if respostas:
+                self._conn.enviaMensagens(respostas, sock=sock)
+        except OSError:
+            aberta = False
+        except Exception as e:
+            self.print_log(str(end) + ": Erro ao atender requisição: " + repr(e), registro.ERRO)
+            aberta = False
+
+        if not aberta:
+            self.encerraConexao(sock)
+            return
+
+        # Devolve a conexão para o seletor da thread principal e acorda ela
+        self._sessoes[sock][2] = time.monotonic()
+        self._devolvidas.put(sock)
+        self._despertador[1].send(b'\0')
+
+    def encerraConexao(self, sock, motivo="Conexão encerrada"):
+        """Encerra uma conexão, registrando o motivo no log.
+
+        Args:
+            sock (socket): Socket da conexão.
+            motivo (str, optional): Mensagem do log.
+        """
+
+        end = self._sessoes.pop(sock)[0]
+        self.print_log(str(end) + ": " + motivo)
+        self._metricas.fechaConexao(end)
+        self._conn.fechaConexao(sock)
+
+    def recebeDevolvidas(self):
+        """Coloca de volta no seletor as conexões devolvidas pelos trabalhadores."""
 
-            # Interpreta o comando da requisição enviada com privilegio de cliente
-            resp = self.interpretaComando(comando, 'cliente')
+        # Esvazia o despertador (cada conexão devolvida escreve um byte nele)
+        try:
+            while self._despertador[0].recv(4096): pass
+        except BlockingIOError:
+            pass
+
+        while True:
+            try:
+                sock = self._devolvidas.get_nowait()
+            except queue.Empty:
+                break
+            self._seletor.register(sock, selectors.EVENT_READ)
+
+    def verificaOciosas(self):
+        """Encerra as conexões que estão no seletor sem requisições há mais de `_tempo_ocioso` segundos.
+        As conexões são verificadas no máximo uma vez por segundo, para o custo não crescer com o número de eventos.
             
-            # Envia a resposta do comando
-            self._conn.enviaMensagem(resp, sock=sock)
+        Returns:
+            float: Tempo máximo (em segundos) que o seletor pode esperar, ou `None` se não houver limite de inatividade.
+        """
 
-            # Imprime o comando recebido e a resposta enviada
-            self.print_log(str(end) + ": " + comando + " --- R: " + resp)
+        if self._tempo_ocioso is None:
+            return None
         
-        # Ao sair do loop, informa que a conexão foi encerrada e fecha o socket
-        self.print_log(str(end) + ": Conexão encerrada")
+        agora = time.monotonic()
+        if agora < self._proxima_verificacao:
+            return self._proxima_verificacao - agora
+
+        intervalo = min(1.0, self._tempo_ocioso)
+        self._proxima_verificacao = agora + intervalo
+
+        for sock, (_, _, ultima) in list(self._sessoes.items()):
+            # Conexões que estão com um trabalhador não estão no seletor (e não estão ociosas)
+            if agora - ultima < self._tempo_ocioso or sock not in self._seletor.get_map():
+                continue
+
+            self._seletor.unregister(sock)
+            self._metricas.registraRecusa(ociosa=True)
+            self.encerraConexao(sock, "Conexão encerrada por inatividade")
+
+        return intervalo
+
+    def rejeitaConexao(self, sock, end):
+        """Rejeita uma conexão quando o servidor já está com o número máximo de conexões,
+        enviando uma mensagem de erro e fechando ela sem ocupar um trabalhador.
+
+        Args:
+            sock (socket): Socket da conexão.
+            end (Tuple): Endereço do outro lado da conexão.
+        """
+
+        self.print_log("Conexão rejeitada (servidor cheio): " + str(end), registro.AVISO)
+        self._metricas.registraRecusa()
+
+        # A mensagem é pequena e o socket é novo, então o envio não bloqueia
+        try:
+            self._conn.enviaBytes("SERVIDOR CHEIO - Tente novamente mais tarde".encode('utf-8'), sock=sock)
+        except OSError:
+            pass
         self._conn.fechaConexao(sock)
 
     def encerraServidor(self):
         """Desativa o servidor e salva o dicionário de volta no arquivo."""
         self._conn.fechaConexao()
+
+        # Espera os trabalhadores terminarem (não há mais conexões, então eles estão livres)
+        if self._trabalhadores:
+            self._trabalhadores.shutdown()
+            self._seletor.close()
+            for sock in self._despertador:
+                sock.close()
+
+        # Para a thread de expiração antes de salvar o dicionário
+        self._encerrando.set()
+        if self._expirador:
+            self._expirador.join()
+
         self._dict.saveDict()
 
+        # Escreve os logs que ainda estão na fila
+        self._log.encerra()
+
+    def temConexoes(self):
+        """Informa se ainda existem conexoes ativas.
+
+        Returns:
+            bool: True se ainda existe alguma conexão ativa.
+        """
+
+        return self.numeroConexoes() > 0
+
+    def numeroConexoes(self):
+        """Retorna o número de conexões ativas.
+
+        Returns:
+            int: Número de conexões ativas.
+        """
+
+        return self._conn.numeroConexoes()
+
+    def estatisticas(self):
+        """Monta o relatório das métricas do servidor (comando `STATS`).
+
+        Returns:
+            str: O relatório, com uma métrica por linha.
+        """
+
+        return self._metricas.estatisticas(self.numeroConexoes(), self._dict_lock.espera())
+
+    def verificaCompactacao(self):
+        """Compacta o log do dicionário se ele tiver passado do tamanho limite, ou
+        inicia um snapshot periódico se estiver na hora. A compactação guarda o estado
+        do dicionário (com um fork ou uma cópia), então precisa de acesso exclusivo a ele."""
+
+        if not self._dict.precisaCompactar():
+            return
+
+        with self._dict_lock.todas():
+            # Outra thread pode ter compactado enquanto esta esperava o lock
+            if self._dict.precisaCompactar():
+                self._dict.compactaLog()
+
     def leEntrada(self, key):
         """Busca os valores da entrada `key` do dicionário.
 
@@ -154,31 +682,28 @@ class Servidor:
             List: A lista de valores da entrada.
         """
 
-        self._dict_lock.acquire() # Lock para impedir que as threads mexam no dicionário simultaneamente
+        # Lock de leitura da chave (outras leituras podem acontecer ao mesmo tempo)
+        with self._dict_lock.leitura(key):
+            val = list(self._dict.getItem(key)) # Copia os valores da entrada
 
-        val = self._dict.getItem(key) # Busca os valores da entrada
-
-        self._dict_lock.release() # Libera o lock do dicionário
+        self._metricas.registraLeitura(key, bool(val))
         
         # Retorna a lista de valores da entrada
         return val
 
-    def escreveEntrada(self, key, value):
+    def escreveEntrada(self, key, value, segundos=None):
         """Adiciona um novo valor `value` na entrada `key` do dicionário.
 
         Args:
             `key` (str): A chave da entrada que terá um novo valor adicionado.
             `value` (str): O valor que será adicionado no dicionário.
+            `segundos` (float, optional): Tempo de vida da entrada. Se não for informado, a expiração da entrada não muda.
 
         Returns:
             str: Mensagem de resposta para a adição da entrada.
         """
 
-        self._dict_lock.acquire() # Lock para impedir que as threads mexam no dicionário simultaneamente
-
-        res = self._dict.setItem(key, value) # Adiciona um valor novo no dicionario 
-
-        self._dict_lock.release() # Libera o lock do dicionário
+        res = self.adicionaValor(key, value, segundos) # Adiciona um valor novo no dicionario 
 
         # Retorna uma mensagem diferente dependendo se a entrada já existia no dicionário ou não
         if res:
@@ -196,11 +721,7 @@ class Servidor:
             str: Mensagem de resposta para remoção da entrada.
         """
 
-        self._dict_lock.acquire() # Lock para impedir que as threads mexam no dicionário simultaneamente
-        
-        res = self._dict.removeItem(key) # Remove um item do dicionário
-
-        self._dict_lock.release() # Libera o lock do dicionário
+        res = self.apagaEntrada(key) # Remove um item do dicionário
         
         # Retorna uma mensagem diferente dependendo se a entrada já existia no dicionário ou não
         if res:
@@ -208,41 +729,285 @@ class Servidor:
         
         return "Entrada '" + key + "' não encontrada no dicionario."
 
-    def print_log(self, msg):
-        """Imprime uma mensagem de log do servidor, indicando o tempo desde que o servidor iniciou.
+    def adicionaValor(self, key, value, segundos=None):
+        """Adiciona um novo valor `value` na entrada `key` do dicionário.
 
         Args:
-            `msg` (str): Mensagem de log.
+            `key` (str): A chave da entrada que terá um novo valor adicionado.
+            `value` (str): O valor que será adicionado no dicionário.
+            `segundos` (float, optional): Tempo de vida da entrada. Se não for informado, a expiração da entrada não muda.
+
+        Returns:
+            bool: Se a entrada já existia no dicionário.
         """
 
-        self._print_lock.acquire() # Lock para que threads não imprimam ao mesmo tempo
+        # Lock de escrita da chave, para impedir que outras threads mexam na mesma entrada
+        with self._dict_lock.escrita(key):
+            res = self._dict.setItem(key, value)
+            if segundos is not None:
+                self._dict.defineExpiracao(key, segundos)
+
+        self._metricas.registraChave(key)
+        self.verificaCompactacao()
+        return res
 
-        # Calcula o tempo desde que o servidor iniciou usando _start_time
-        timestamp = "{:7.2f}".format(time.time() - self._start_time)
+    def apagaEntrada(self, key):
+        """Remove a entrada `key` do dicionário.
 
-        print("\r\033[K", end="") # Limpa a última linha do terminal (evita que fique um 'S >>' solto no terminal)
+        Args:
+            `key` (str): A chave da entrada que será removida.
 
-        # Imprime o log, indicando o tempo
-        print("\033[94m[" + timestamp + "]\033[0m", msg)
+        Returns:
+            bool: Se a entrada existia e foi removida.
+        """
 
-        print("\r\033[92mS >> \033[0m", end="") # Imprime um 'S >>', indicando que o administrador pode enviar um comando
-        
-        self._print_lock.release() # Libera o lock de impressão
+        # Lock de escrita da chave, para impedir que outras threads mexam na mesma entrada
+        with self._dict_lock.escrita(key):
+            res = self._dict.removeItem(key)
+
+        self.verificaCompactacao()
+        return res
+
+    def adicionaValores(self, pares):
+        """Adiciona vários pares (chave, valor) no dicionário, segurando os locks uma vez só.
+
+        Args:
+            `pares` (List[Tuple]): Os pares `(chave, valor)` que serão adicionados.
+
+        Returns:
+            List[bool]: Para cada par, se a entrada já existia no dicionário.
+        """
+
+        # Lock de escrita de todas as partições das chaves
+        with self._dict_lock.escritaMultipla(key for key, _ in pares):
+            res = self._dict.setItems(pares)
+
+        for key, _ in pares:
+            self._metricas.registraChave(key)
+        self.verificaCompactacao()
+        return res
+
+    def apagaEntradas(self, keys):
+        """Remove várias entradas do dicionário, segurando os locks uma vez só.
+
+        Args:
+            `keys` (List[str]): As chaves das entradas que serão removidas.
+
+        Returns:
+            List[bool]: Para cada chave, se a entrada existia e foi removida.
+        """
+
+        # Lock de escrita de todas as partições das chaves
+        with self._dict_lock.escritaMultipla(keys):
+            res = self._dict.removeItems(keys)
+
+        self.verificaCompactacao()
+        return res
+
+    def defineTempoVida(self, key, segundos):
+        """Define o tempo de vida da entrada `key` do dicionário.
+
+        Args:
+            `key` (str): A chave da entrada.
+            `segundos` (float): Tempo de vida da entrada, a partir de agora.
+
+        Returns:
+            bool: False se a entrada não existe no dicionário.
+        """
+
+        with self._dict_lock.escrita(key):
+            res = self._dict.defineExpiracao(key, segundos)
+
+        self.verificaCompactacao()
+        return res
+
+    def expiraChaves(self):
+        """Remove as chaves cujo tempo de vida acabou, até o servidor encerrar.
+        Função executada pela thread de expiração. Só as chaves no início da fila
+        de expiração são verificadas, então o dicionário nunca é percorrido inteiro.
+        A cada verificação, a thread também inicia os snapshots periódicos por tempo."""
+
+        while not self._encerrando.is_set():
+            try:
+                keys = self._dict.chavesExpiradas()
+
+                if keys:
+                    with self._dict_lock.escritaMultipla(keys):
+                        # Confere de novo com o lock, já que a expiração pode ter mudado
+                        removidas = self._dict.removeExpiradas(keys)
+
+                    self.print_log(str(removidas) + " entradas expiradas removidas do dicionario", registro.DEBUG)
+                    self.verificaCompactacao()
+                    continue # Pode haver mais chaves expiradas na fila
+
+                # Espera até a próxima expiração (ou no máximo o intervalo de verificação)
+                proxima = self._dict.proximaExpiracao()
+                espera = self._INTERVALO_EXPIRACAO if proxima is None else min(self._INTERVALO_EXPIRACAO, max(0, proxima - time.time()))
+                self._encerrando.wait(espera)
+                self.verificaCompactacao()
+            except Exception as e:
+                # Um erro (ex.: ao escrever um snapshot) não pode parar a expiração e os snapshots periódicos
+                self.print_log("Erro na thread de expiração: " + repr(e), registro.ERRO)
+                self._encerrando.wait(self._INTERVALO_EXPIRACAO)
+
+    def buscaChaves(self, inicio, fim, limite):
+        """Busca, em ordem, as chaves do dicionário a partir de `inicio`.
+        Não usa os locks das partições, já que só lê o índice de chaves.
+
+        Args:
+            `inicio` (str): Menor chave que pode ser retornada.
+            `fim` (str): Limite superior (exclusivo) das chaves, ou `None`.
+            `limite` (int): Número máximo de chaves, ou `None`.
+
+        Yields:
+            str: Cada página da resposta, com uma chave por linha.
+        """
+
+        for pagina in self._dict.percorreChaves(inicio, fim, limite, self._TAM_PAGINA):
+            yield '\n'.join(pagina)
+
+    def listaChaves(self, inicio, fim, limite):
+        """Busca, em ordem, as chaves do dicionário a partir de `inicio`, sem dividir em páginas
+        (usado pela operação `RANGE` do protocolo binário).
+
+        Args:
+            `inicio` (str): Menor chave que pode ser retornada.
+            `fim` (str): Limite superior (exclusivo) das chaves, ou `None`.
+            `limite` (int): Número máximo de chaves, ou `None`.
+
+        Returns:
+            List[str]: As chaves, em ordem.
+        """
+
+        return [key for pagina in self._dict.percorreChaves(inicio, fim, limite, self._TAM_PAGINA) for key in pagina]
+
+    def buscaValor(self, value):
+        """Busca as chaves que têm o valor `value`. Não usa os locks das partições,
+        já que só lê o índice invertido do dicionário.
+
+        Args:
+            `value` (str): O valor procurado.
+
+        Returns:
+            List[str]: As chaves que têm o valor, em ordem.
+        """
+
+        return self._dict.buscaValor(value)
+
+    def leEntradas(self, keys):
+        """Busca os valores de várias entradas do dicionário, segurando os locks uma vez só.
+
+        Args:
+            `keys` (List[str]): As chaves das entradas que serão lidas.
+
+        Returns:
+            List[List]: A lista de valores de cada entrada, na ordem das chaves.
+        """
+
+        # Lock de leitura de todas as partições das chaves
+        with self._dict_lock.leituraMultipla(keys):
+            vals = [list(self._dict.getItem(key)) for key in keys]
+
+        for key, val in zip(keys, vals):
+            self._metricas.registraLeitura(key, bool(val))
+        return vals
+
+    def escreveEntradas(self, pares):
+        """Adiciona vários pares (chave, valor) no dicionário, segurando os locks uma vez só.
+
+        Args:
+            `pares` (List[Tuple]): Os pares `(chave, valor)` que serão adicionados.
+
+        Returns:
+            str: Mensagem de resposta para a adição das entradas.
+        """
+
+        res = self.adicionaValores(pares)
+
+        novas = res.count(False)
+        return str(len(pares)) + " valores adicionados ao dicionario (" + str(novas) + " entradas novas)."
+
+    def removeEntradas(self, keys):
+        """Remove várias entradas do dicionário, segurando os locks uma vez só.
+
+        Args:
+            `keys` (List[str]): As chaves das entradas que serão removidas.
+
+        Returns:
+            str: Mensagem de resposta para remoção das entradas.
+        """
+
+        res = self.apagaEntradas(keys)
+
+        removidas = res.count(True)
+        return str(removidas) + " entradas removidas do dicionario (" + str(len(keys) - removidas) + " não encontradas)."
+
+    def print_log(self, msg, nivel=registro.INFO):
+        """Imprime uma mensagem de log do servidor, indicando o tempo desde que o servidor iniciou.
+        A mensagem é impressa pela thread do `Registrador`, então esta função não espera o terminal.
+
+        Args:
+            `msg` (str): Mensagem de log.
+            `nivel` (int, optional): Nível da mensagem (`registro.DEBUG`, `INFO`, `AVISO` ou `ERRO`).
+        """
+
+        self._log.registra(msg, nivel)
 
     def handle_sock(self):
         """Função para lidar com nova conexão."""
 
         sock, end = self._conn.aceitaConexao() # Aceita uma nova conexão
 
+        # Se o servidor já está cheio, rejeita a conexão na hora
+        if self._max_conexoes is not None and self.numeroConexoes() > self._max_conexoes:
+            self.rejeitaConexao(sock, end)
+            return
+
         # Imprime log informando sobre a nova conexão
         self.print_log("Conexão estabelecida com: " + str(end))
 
-        # Cria uma thread para atender as requisições da nova conexão
-        cliente = threading.Thread(target=self.atendeRequisicoes, args=[sock, end])
-        cliente.start()
+        # Registra o estado da conexão e passa a esperar as requisições dela no seletor.
+        # Quando chegar uma requisição, a conexão é atendida por um trabalhador do pool
+        sessao = {'binario': False, 'bytes': self._metricas.abreConexao(end)}
+        self._sessoes[sock] = [end, sessao, time.monotonic()]
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # Respostas pequenas não esperam as anteriores serem confirmadas
+        self._seletor.register(sock, selectors.EVENT_READ)
 
     def handle_stdin(self):
-        """Função para lidar com nova entrada do usuário.
+        """Função para lidar com nova entrada do usuário. Lê o que chegou na entrada padrão
+        com `os.read` e trata cada linha completa. O `input` guardaria no buffer dele as
+        linhas que chegassem juntas (ex.: comandos repassados por um pipe), e o seletor
+        não avisaria de novo sobre elas.
+
+        Returns:
+            bool: 
+                True - O usuário não pediu para encerrar o servidor ou ainda há conexões ativas.
+                
+                False - O usuário pediu para encerrar o servidor e não há conexões ativas.
+        """
+
+        dados = os.read(sys.stdin.fileno(), 4096)
+        if not dados:
+            self.fimDaEntrada()
+            return True
+
+        *linhas, self._entrada_pendente = (self._entrada_pendente + dados).split(b'\n')
+        for linha in linhas:
+            comando = linha.decode('utf-8', 'replace').rstrip('\r')
+            if comando.strip() and not self.trataComando(comando):
+                return False
+        return True
+
+    def fimDaEntrada(self):
+        """Para de observar a entrada padrão, que chegou ao fim (ex.: o pipe foi fechado)."""
+
+        self._seletor.unregister(sys.stdin)
+
+    def trataComando(self, comando):
+        """Trata um comando digitado pelo administrador.
+
+        Args:
+            `comando` (str): O comando.
 
         Returns:
             bool: 
@@ -251,33 +1016,112 @@ class Servidor:
                 False - O usuário pediu para encerrar o servidor e não há conexões ativas.
         """
 
-        comando = input() # Pega entrada do usuário
-        
         if comando.split(' ')[0] == 'QUIT': 
             # Se o usuário indicou para encerrar o servidor, verifica se ainda há conexões ativas
-            if not self._conn.temConexoes():
+            if not self.temConexoes():
                 # Indica que o servidor está encerrando
                 self.print_log("Encerrando servidor...")
                 
-                # Apaga a última linha do terminal (evita que fique um 'S >>' solto após a execuçao do programa)
-                print("\r\033[K", end="") 
-
                 return False # Caso não existam conexões ativas, retorna False
             
             # Informa que ainda há conexões ativas e retorna True
-            self.print_log("Não foi possível encerrar servidor - Ainda há conexões ativas!")
+            self.print_log("Não foi possível encerrar servidor - Ainda há conexões ativas!", registro.AVISO)
+            return True
+
+        # Comandos de diagnóstico (perfil de CPU e snapshots de memória)
+        if comando.split(' ')[0] in ("PROFILE", "MEMSNAP"):
+            self.print_log(self.comandoDiagnostico(comando.split()))
             return True
 
         # Se o usuário não pediu para encerrar o servidor, 
         # interpreta o comando com privilegio de administrador, 
         # imprime a resposta e retorna True
         resp = self.interpretaComando(comando, 'admin')
+        if not isinstance(resp, str):
+            resp = '\n'.join(resp) # Junta as páginas de uma resposta paginada
         self.print_log(resp)
         return True
 
+    def comandoDiagnostico(self, comandos):
+        """Executa um comando de diagnóstico do administrador, que pode ser usado com o servidor
+        atendendo requisições: `PROFILE START`, `PROFILE STOP [arquivo]`, `MEMSNAP START`,
+        `MEMSNAP STOP` e `MEMSNAP [arquivo]`.
+
+        Args:
+            `comandos` (List[str]): O comando, dividido nos espaços.
+
+        Returns:
+            str: Mensagem de resposta do comando.
+        """
+
+        agora = time.strftime('%Y%m%d-%H%M%S')
+
+        if comandos[0] == "PROFILE":
+            if comandos[1:] == ["START"]:
+                if self._perfilador:
+                    return "O perfil de CPU já foi iniciado!"
+
+                # Amostra as pilhas de todas as threads (trabalhadores, registrador, thread principal...)
+                self._perfilador = Perfilador()
+                self._perfilador.inicia()
+                return "Perfil de CPU iniciado"
+
+            if comandos[1:2] == ["STOP"] and len(comandos) <= 3:
+                if not self._perfilador:
+                    return "O perfil de CPU não foi iniciado!"
+
+                arquivo = self.arquivoDiagnostico(comandos[2] if len(comandos) == 3 else "perfil-" + agora + ".txt")
+                perfilador, self._perfilador = self._perfilador, None
+                amostras = perfilador.encerra()
+                try:
+                    perfilador.escreve(arquivo)
+                except OSError as e:
+                    return "Não foi possível salvar o perfil de CPU: " + str(e)
+                return "Perfil de CPU salvo em " + arquivo + " (" + str(amostras) + " amostras)"
+
+            return "Uso do comando PROFILE: PROFILE START | PROFILE STOP [arquivo]"
+
+        # MEMSNAP
+        if comandos[1:] == ["START"]:
+            if self._memoria.ativo():
+                return "O rastreamento de memória já foi iniciado!"
+            self._memoria.inicia()
+            return "Rastreamento de memória iniciado"
+
+        if comandos[1:] == ["STOP"]:
+            if not self._memoria.ativo():
+                return "O rastreamento de memória não foi iniciado!"
+            self._memoria.encerra()
+            return "Rastreamento de memória encerrado"
+
+        if len(comandos) > 2:
+            return "Uso do comando MEMSNAP: MEMSNAP START | MEMSNAP STOP | MEMSNAP [arquivo]"
+        if not self._memoria.ativo():
+            return "O rastreamento de memória não foi iniciado! Use MEMSNAP START"
+
+        arquivo = self.arquivoDiagnostico(comandos[1] if len(comandos) == 2 else "memoria-" + agora + ".txt")
+        try:
+            resumo = self._memoria.salvaSnapshot(arquivo)
+        except OSError as e:
+            return "Não foi possível salvar o snapshot de memória: " + str(e)
+        return resumo + " - Snapshot salvo em " + arquivo
+
+    def arquivoDiagnostico(self, arquivo):
+        """Retorna o caminho do arquivo onde um comando de diagnóstico salva o resultado.
+
+        Args:
+            `arquivo` (str): O arquivo informado no comando (ou o nome padrão).
+
+        Returns:
+            str: O caminho do arquivo.
+        """
+
+        return arquivo
+
     def multiplex(self):
-        """Função de multiplexação. Usa o `select` para receber 
-        entradas ou de uma nova conexão ou da entrada padrão do usuário.
+        """Função de multiplexação. Usa o seletor para receber entradas de uma nova
+        conexão, da entrada padrão do usuário ou das conexões ativas (que são passadas
+        para os trabalhadores do pool).
 
         Returns:
             bool: 
@@ -286,15 +1130,21 @@ class Servidor:
                 False - O usuário pediu para encerrar o servidor e não há conexões ativas.
         """
 
-        # Verifica qual entrada deve ler usando o select
-        leitura, _, _ = select([self._conn, sys.stdin], [], [])
+        # Encerra as conexões ociosas e espera até a próxima verificação delas (no máximo)
+        espera = self.verificaOciosas()
         
-        # Para cada entrada retornada pelo select, rodar uma função diferente, dependendo da entrada
-        for pronto in leitura:
-            if pronto == self._conn:
+        # Para cada entrada retornada pelo seletor, rodar uma função diferente, dependendo da entrada
+        for chave, _ in self._seletor.select(espera):
+            if chave.data == 'conexao':
                 self.handle_sock() # Função para lidar com nova conexão
-            elif pronto == sys.stdin:
+            elif chave.data == 'stdin':
                 if not self.handle_stdin(): return False # Função para lidar com entrada do usuário
+            elif chave.data == 'despertador':
+                self.recebeDevolvidas() # Conexões que os trabalhadores terminaram de atender
+            else:
+                # Requisição de uma conexão: tira ela do seletor e passa para um trabalhador
+                self._seletor.unregister(chave.fileobj)
+                self._trabalhadores.submit(self.atendeRequisicoes, chave.fileobj)
         
         # Se o handle_stdin não retornou False, retorna True
         return True
@@ -303,7 +1153,18 @@ class Servidor:
         """Função principal - Inicia a execução padrão do cliente."""
 
         # Inicia o servidor
-        self.inicia(5)
+        self.inicia(self._backlog)
+
+        # Inicia o pool de trabalhadores e o seletor das entradas
+        self._trabalhadores = ThreadPoolExecutor(self._n_trabalhadores, thread_name_prefix='trabalhador')
+        self._devolvidas = queue.SimpleQueue()
+        self._despertador = socket.socketpair()
+        self._despertador[0].setblocking(False)
+        self._seletor = selectors.DefaultSelector()
+        self._seletor.register(self._conn, selectors.EVENT_READ, 'conexao')
+        self._seletor.register(sys.stdin, selectors.EVENT_READ, 'stdin')
+        self._seletor.register(self._despertador[0], selectors.EVENT_READ, 'despertador')
+
         self.print_log("Aguardando conexão...")
 
         # Roda a função de multiplexação indeterminadamente 
@@ -318,15 +1179,69 @@ if __name__ == '__main__':
     porta = 5016
     dict_path = 'dict.json'
 
+    # Separa as opções (no formato --opcao ou --opcao=valor) dos parametros posicionais
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    opcoes = dict(arg[2:].partition('=')[::2] for arg in sys.argv[1:] if arg.startswith('--'))
+
     # Pega os parametros da linha de comando
-    arg_len = len(sys.argv)
+    arg_len = len(args)
+    if arg_len >= 1:
+        end = args[0]
     if arg_len >= 2:
-        end = sys.argv[1]
+        porta = int(args[1])
     if arg_len >= 3:
-        porta = int(sys.argv[2])
-    if arg_len >= 4:
-        dict_path = sys.argv[3]
+        dict_path = args[2]
+
+    # Pega as opções da linha de comando
+    usa_log = 'log' in opcoes
+    limite_log = int(opcoes['limite-log']) if opcoes.get('limite-log') else None
+    n_particoes = int(opcoes.get('particoes') or 16)
+    nivel_log = (opcoes.get('nivel-log') or 'INFO').upper()
+    niveis_log = {nome: nivel for nivel, nome in registro.NOMES_NIVEIS.items()}
+    if nivel_log not in niveis_log:
+        sys.exit("Uso da opção --nivel-log: --nivel-log=[" + "|".join(niveis_log) + "]")
+    nivel_log = niveis_log[nivel_log]
+    amostragem_log = float(opcoes.get('amostragem-log') or 1.0)
+    arquivo_log = opcoes.get('arquivo-log') or None
+    limite_memoria = int(float(opcoes['memoria']) * 1024 * 1024) if opcoes.get('memoria') else None
+    compacto = 'compacto' in opcoes
+    intervalo_snapshot = float(opcoes['snapshot-intervalo']) if opcoes.get('snapshot-intervalo') else None
+    escritas_snapshot = int(opcoes['snapshot-escritas']) if opcoes.get('snapshot-escritas') else None
+    backlog = int(opcoes.get('backlog') or 5)
+    n_trabalhadores = int(opcoes.get('trabalhadores') or 16)
+    max_conexoes = int(opcoes['max-conexoes']) if opcoes.get('max-conexoes') else None
+    tempo_ocioso = float(opcoes['ocioso']) if opcoes.get('ocioso') else None
+    n_processos = int(opcoes.get('processos') or 1)
+
+    parametros = dict(usa_log=usa_log, limite_log=limite_log, n_particoes=n_particoes,
+                      nivel_log=nivel_log, amostragem_log=amostragem_log, arquivo_log=arquivo_log,
+                      limite_memoria=limite_memoria, compacto=compacto, intervalo_snapshot=intervalo_snapshot,
+                      escritas_snapshot=escritas_snapshot, backlog=backlog, n_trabalhadores=n_trabalhadores,
+                      max_conexoes=max_conexoes, tempo_ocioso=tempo_ocioso)
+
+    # Com a opção --processos, executa o servidor em vários processos, cada um com uma partição das chaves
+    if n_processos > 1:
+        if 'async' in opcoes:
+            sys.exit("A opção --processos não pode ser usada junto com --async")
+        if not hasattr(os, 'fork') or not hasattr(socket, 'SO_REUSEPORT'):
+            sys.exit("A opção --processos precisa de os.fork e SO_REUSEPORT (Linux, macOS)")
+
+        from processos import Supervisor
+        Supervisor(n_processos, end, porta, dict_path, **parametros).main()
+        sys.exit()
+
+    # Se uma execução com vários processos não terminou normalmente, junta as partições que ela deixou
+    from processos import particoesExistentes
+    particoes = particoesExistentes(dict_path)
+    if particoes:
+        juntaDicionarios(particoes, dict_path)
+
+    # Com a opção --async, usa o servidor baseado em asyncio
+    classe = Servidor
+    if 'async' in opcoes:
+        from servidor_async import ServidorAsync
+        classe = ServidorAsync
 
     # Executa o servidor
-    serv = Servidor(end, porta, dict_path)
+    serv = classe(end, porta, dict_path, **parametros)
     serv.main()
\ No newline at end of file
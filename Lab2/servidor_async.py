@@ -0,0 +1,150 @@
+from servidor import Servidor
+import registro
+
+import sys
+import socket
+import asyncio
+
+class ServidorAsync(Servidor):
+    """Componente Servidor (versão asyncio) - Atende todas as conexões em um único
+    loop de eventos do `asyncio`, em vez de usar um pool de threads.
+    Usa o mesmo dicionário, o mesmo interpretador de comandos e a mesma interface
+    de administrador do `Servidor`."""
+
+    _clientes = None
+    """Conjunto com os `StreamWriter` das conexões ativas."""
+
+    _encerra = None
+    """Evento que indica que o administrador pediu para encerrar o servidor."""
+
+    def numeroConexoes(self):
+        """Retorna o número de conexões ativas.
+
+        Returns:
+            int: Número de conexões ativas.
+        """
+
+        return len(self._clientes)
+
+    async def atendeCliente(self, reader, writer):
+        """Atende requisições de uma conexão até que o outro lado feche a conexão.
+        Corrotina executada pelo loop de eventos para cada conexão.
+
+        Args:
+            `reader` (StreamReader): Stream de leitura da conexão.
+            `writer` (StreamWriter): Stream de escrita da conexão.
+        """
+
+        end = writer.get_extra_info('peername')
+
+        # Se o servidor já está cheio, rejeita a conexão na hora
+        if self._max_conexoes is not None and len(self._clientes) >= self._max_conexoes:
+            self.print_log("Conexão rejeitada (servidor cheio): " + str(end), registro.AVISO)
+            self._metricas.registraRecusa()
+            resp = "SERVIDOR CHEIO - Tente novamente mais tarde".encode('utf-8')
+            writer.writelines([len(resp).to_bytes(4, 'big'), resp])
+            writer.close()
+            return
+
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        # Estado da conexão (protocolo usado e contadores de bytes)
+        sessao = {'binario': False, 'bytes': self._metricas.abreConexao(end)}
+        self._clientes.add(writer)
+
+        # Imprime log informando sobre a nova conexão
+        self.print_log("Conexão estabelecida com: " + str(end))
+
+        motivo = "Conexão encerrada"
+        try:
+            while True:
+                # Recebe uma requisição (os 4 primeiros bytes indicam o tamanho dela)
+                # Se a conexão for fechada no meio, ou ficar sem requisições por mais
+                # de `_tempo_ocioso` segundos, sai do loop
+                try:
+                    cabecalho = await asyncio.wait_for(reader.readexactly(4), self._tempo_ocioso)
+                    msg = await reader.readexactly(int.from_bytes(cabecalho, byteorder='big', signed=False))
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.TimeoutError:
+                    motivo = "Conexão encerrada por inatividade"
+                    self._metricas.registraRecusa(ociosa=True)
+                    break
+
+                try:
+                    # Interpreta a requisição enviada com privilegio de cliente
+                    # (só monta a mensagem de log se a requisição foi sorteada para o log)
+                    resp, log = self.processaMensagem(msg, sessao, 'cliente', self._log.amostra())
+
+                    # Envia a resposta do comando, com o tamanho dela no início
+                    # (se for paginada, envia cada página e espera o buffer esvaziar entre elas)
+                    if isinstance(resp, bytes):
+                        writer.writelines([len(resp).to_bytes(4, 'big'), resp])
+                        await writer.drain()
+                    else:
+                        for quadro in resp:
+                            writer.writelines([len(quadro).to_bytes(4, 'big'), quadro])
+                            await writer.drain()
+                except OSError:
+                    break
+                except Exception as e:
+                    self.print_log(str(end) + ": Erro ao atender requisição: " + repr(e), registro.ERRO)
+                    motivo = "Conexão encerrada após um erro"
+                    break
+
+                # Imprime o comando recebido e a resposta enviada
+                if log:
+                    self.print_log(str(end) + ": " + log)
+        finally:
+            # Ao sair do loop, informa que a conexão foi encerrada e fecha a conexão
+            self.print_log(str(end) + ": " + motivo)
+            self._metricas.fechaConexao(end)
+            self._clientes.discard(writer)
+            writer.close()
+
+    def leStdin(self):
+        """Função chamada pelo loop de eventos quando há uma entrada do administrador."""
+
+        if not self.handle_stdin():
+            self._encerra.set()
+
+    def fimDaEntrada(self):
+        """Para de observar a entrada padrão, que chegou ao fim (ex.: o pipe foi fechado)."""
+
+        asyncio.get_running_loop().remove_reader(sys.stdin)
+
+    async def executa(self, n_conexoes):
+        """Inicia o servidor e atende as conexões até que o administrador peça para encerrar.
+
+        Args:
+            `n_conexoes` (int): Tamanho da fila de conexões esperando para serem aceitas.
+        """
+
+        self._clientes = set()
+        self._encerra = asyncio.Event()
+
+        # Inicia o socket do servidor e passa ele para o asyncio
+        self.inicia(n_conexoes)
+        self._conn._main_socket.setblocking(False)
+        servidor = await asyncio.start_server(self.atendeCliente, sock=self._conn._main_socket)
+
+        # Lê os comandos do administrador no mesmo loop de eventos
+        loop = asyncio.get_running_loop()
+        loop.add_reader(sys.stdin, self.leStdin)
+
+        self.print_log("Aguardando conexão...")
+
+        # Espera o administrador encerrar o servidor
+        await self._encerra.wait()
+
+        loop.remove_reader(sys.stdin)
+        servidor.close()
+        await servidor.wait_closed()
+
+    def main(self):
+        """Função principal - Inicia a execução do servidor no loop de eventos."""
+
+        asyncio.run(self.executa(self._backlog))
+
+        # Após o loop de eventos terminar, encerra o servidor
+        self.encerraServidor()
@@ -0,0 +1,284 @@
+"""Formato binário do snapshot do dicionário - Alternativa ao json, que pode ser
+lida sem passar pelo parser de json e sem carregar o arquivo inteiro na memória.
+
+O arquivo tem o formato:
+
+* Cabeçalho: os 8 bytes de `MAGICO`.
+* Entradas, uma depois da outra. Cada entrada começa com o seu tamanho em 4 bytes
+  (sem contar esses 4 bytes), seguido da chave (UTF-8, precedida do seu tamanho em
+  4 bytes), de 1 byte com o tipo da entrada, do número de valores em 4 bytes e dos valores:
+
+  * `TIPO_SEPARADO`: os valores unidos por `'\\0'`, em UTF-8 (usado quando nenhum valor
+    tem `'\\0'`, e lido com um único `split`).
+  * `TIPO_PREFIXADO`: o tamanho de cada valor em 4 bytes, seguido dos valores em UTF-8.
+
+* Índice: a posição (8 bytes) de cada entrada no arquivo, na ordem das chaves.
+* Rodapé: a posição do índice e o número de entradas (8 bytes cada), seguidos de `MAGICO`.
+
+O arquivo pode ser lido em sequência (`Snapshot.__iter__`) ou uma entrada por vez
+(`Snapshot.valores`, com busca binária no índice), usando `mmap`.
+
+Executado como script, converte um snapshot em json para o formato binário, ou o
+contrário: `python3 snapshot.py [entrada] [saida]`.
+"""
+
+import os
+import sys
+import json
+import mmap
+import struct
+
+MAGICO = b'SDDICT\x00\x01'
+"""Bytes do início e do fim de um snapshot binário (o último byte é a versão do formato)."""
+
+TIPO_SEPARADO = 0
+"""Valores unidos por `'\\0'`."""
+
+TIPO_PREFIXADO = 1
+"""Valores precedidos dos seus tamanhos."""
+
+_UINT = struct.Struct('>I')
+_ULONG = struct.Struct('>Q')
+_CABECALHO_ENTRADA = struct.Struct('>II') # Tamanho da entrada e tamanho da chave
+_TIPO_ENTRADA = struct.Struct('>BI') # Tipo e número de valores
+_RODAPE = struct.Struct('>QQ8s') # Posição do índice, número de entradas e `MAGICO`
+
+_TAM_BLOCO = 1024 * 1024
+"""Quantidade de bytes acumulada antes de cada escrita no arquivo."""
+
+def ehBinario(path):
+    """Informa se o arquivo `path` é um snapshot no formato binário.
+
+    Args:
+        `path` (str): Caminho do arquivo.
+
+    Returns:
+        bool: Se o arquivo começa com `MAGICO`.
+    """
+
+    with open(path, 'rb') as f:
+        return f.read(len(MAGICO)) == MAGICO
+
+def codificaEntrada(key, values):
+    """Codifica uma entrada do dicionário no formato do snapshot.
+
+    Args:
+        `key` (str): A chave.
+        `values` (List[str]): Os valores da chave.
+
+    Returns:
+        bytes: A entrada codificada (com o tamanho no início).
+    """
+
+    chave = key.encode('utf-8')
+    unidos = '\0'.join(values)
+
+    # Se algum valor tiver '\0', não dá para separar os valores depois: usa os tamanhos
+    if unidos.count('\0') == max(0, len(values) - 1):
+        corpo = _TIPO_ENTRADA.pack(TIPO_SEPARADO, len(values)) + unidos.encode('utf-8')
+    else:
+        codificados = [value.encode('utf-8') for value in values]
+        corpo = (_TIPO_ENTRADA.pack(TIPO_PREFIXADO, len(values))
+                 + struct.pack('>%dI' % len(codificados), *map(len, codificados))
+                 + b''.join(codificados))
+
+    return _CABECALHO_ENTRADA.pack(_UINT.size + len(chave) + len(corpo), len(chave)) + chave + corpo
+
+def codifica(entradas):
+    """Codifica um snapshot inteiro, uma entrada por vez, sem montar o arquivo na memória.
+
+    Args:
+        `entradas` (Iterable[Tuple[str, List[str]]]): Pares `(chave, valores)`.
+
+    Yields:
+        bytes: Pedaços do arquivo, em ordem.
+    """
+
+    bloco = bytearray(MAGICO)
+    pos = 0 # Posição do início do bloco no arquivo
+    indice = [] # Pares (chave, posição da entrada)
+
+    for key, values in entradas:
+        indice.append((key, pos + len(bloco)))
+        bloco += codificaEntrada(key, values)
+
+        if len(bloco) >= _TAM_BLOCO:
+            pos += len(bloco)
+            yield bytes(bloco)
+            bloco.clear()
+
+    # Índice das posições, na ordem das chaves (a ordem das strings é a mesma dos bytes em UTF-8)
+    inicio_indice = pos + len(bloco)
+    indice.sort()
+    bloco += struct.pack('>%dQ' % len(indice), *(p for _, p in indice))
+    bloco += _RODAPE.pack(inicio_indice, len(indice), MAGICO)
+    yield bytes(bloco)
+
+class Snapshot:
+    """Leitor de um snapshot no formato binário. O arquivo é mapeado na memória
+    (`mmap`), então só as partes lidas são trazidas do disco."""
+
+    def __init__(self, path):
+        """Abre o snapshot binário `path`.
+
+        Args:
+            `path` (str): Caminho do arquivo.
+
+        Raises:
+            ValueError: Se o arquivo não for um snapshot binário válido (ou estiver incompleto).
+        """
+
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mm) < len(MAGICO) + _RODAPE.size or self._mm[:len(MAGICO)] != MAGICO:
+            self.fecha()
+            raise ValueError("Arquivo não é um snapshot binário: " + path)
+
+        self._indice, self._n, magico = _RODAPE.unpack_from(self._mm, len(self._mm) - _RODAPE.size)
+        if magico != MAGICO:
+            self.fecha()
+            raise ValueError("Snapshot binário incompleto: " + path)
+
+    def __len__(self):
+        return self._n
+
+    def fecha(self):
+        """Fecha o mapeamento do arquivo."""
+
+        self._mm.close()
+
+    def _chaveEm(self, pos):
+        """Retorna os bytes da chave da entrada na posição `pos`, e a posição do resto da entrada."""
+
+        _, tam_chave = _CABECALHO_ENTRADA.unpack_from(self._mm, pos)
+        inicio = pos + _CABECALHO_ENTRADA.size
+        return self._mm[inicio:inicio + tam_chave], inicio + tam_chave
+
+    def _valoresEm(self, pos, fim):
+        """Decodifica os valores de uma entrada, que começam (com o tipo) em `pos` e terminam em `fim`."""
+
+        tipo, n = _TIPO_ENTRADA.unpack_from(self._mm, pos)
+        pos += _TIPO_ENTRADA.size
+
+        if tipo == TIPO_SEPARADO:
+            return self._mm[pos:fim].decode('utf-8').split('\0') if n else []
+
+        tamanhos = struct.unpack_from('>%dI' % n, self._mm, pos)
+        pos += 4 * n
+        values = []
+        for tam in tamanhos:
+            values.append(self._mm[pos:pos + tam].decode('utf-8'))
+            pos += tam
+        return values
+
+    def __iter__(self):
+        """Percorre as entradas na ordem do arquivo, lendo o arquivo em sequência.
+
+        Yields:
+            Tuple[str, List[str]]: Cada par `(chave, valores)`.
+        """
+
+        # Laço principal da carga do snapshot: as funções usadas ficam em variáveis locais
+        mm, fim_entradas = self._mm, self._indice
+        cabecalho, tipo_entrada = _CABECALHO_ENTRADA.unpack_from, _TIPO_ENTRADA.unpack_from
+        tam_cabecalho, tam_tipo = _CABECALHO_ENTRADA.size, _TIPO_ENTRADA.size
+
+        pos = len(MAGICO)
+        while pos < fim_entradas:
+            tam, tam_chave = cabecalho(mm, pos)
+            inicio = pos + tam_cabecalho
+            fim = pos + _UINT.size + tam
+            tipo, n = tipo_entrada(mm, inicio + tam_chave)
+
+            if tipo == TIPO_SEPARADO:
+                values = mm[inicio + tam_chave + tam_tipo:fim].decode('utf-8').split('\0') if n else []
+            else:
+                values = self._valoresEm(inicio + tam_chave, fim)
+
+            yield mm[inicio:inicio + tam_chave].decode('utf-8'), values
+            pos = fim
+
+    def chaves(self):
+        """Percorre as chaves na ordem do arquivo, sem decodificar os valores.
+
+        Yields:
+            str: Cada chave.
+        """
+
+        pos = len(MAGICO)
+        while pos < self._indice:
+            tam, _ = _CABECALHO_ENTRADA.unpack_from(self._mm, pos)
+            yield self._chaveEm(pos)[0].decode('utf-8')
+            pos += _UINT.size + tam
+
+    def valores(self, key):
+        """Busca os valores de uma chave, com uma busca binária no índice.
+
+        Args:
+            `key` (str): A chave.
+
+        Returns:
+            List[str]: Os valores da chave, ou `None` se ela não estiver no snapshot.
+        """
+
+        chave = key.encode('utf-8')
+        inicio, fim = 0, self._n
+        while inicio < fim:
+            meio = (inicio + fim) // 2
+            pos = _ULONG.unpack_from(self._mm, self._indice + meio * _ULONG.size)[0]
+            atual, resto = self._chaveEm(pos)
+
+            if atual == chave:
+                tam, _ = _CABECALHO_ENTRADA.unpack_from(self._mm, pos)
+                return self._valoresEm(resto, pos + _UINT.size + tam)
+            if atual < chave:
+                inicio = meio + 1
+            else:
+                fim = meio
+
+        return None
+
+def escreve(path, entradas):
+    """Escreve um snapshot binário no arquivo `path` de forma atômica (em um
+    arquivo temporário, que depois substitui o original).
+
+    Args:
+        `path` (str): Caminho do arquivo.
+        `entradas` (Iterable[Tuple[str, List[str]]]): Pares `(chave, valores)`.
+    """
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for parte in codifica(entradas):
+            f.write(parte)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Uso: python3 snapshot.py [entrada] [saida]")
+        print("Converte um snapshot em json para o formato binário, ou o contrário. "
+              "Sem [saida], substitui o arquivo de entrada.")
+        sys.exit(1)
+
+    entrada = sys.argv[1]
+    saida = sys.argv[2] if len(sys.argv) >= 3 else entrada
+
+    if ehBinario(entrada):
+        snap = Snapshot(entrada)
+        dados = dict(snap)
+        snap.fecha()
+
+        with open(saida + '.tmp', 'w') as f:
+            json.dump(dados, f)
+        os.replace(saida + '.tmp', saida)
+        print("Snapshot binário convertido para json: " + saida)
+    else:
+        with open(entrada, 'r') as f:
+            dados = json.load(f)
+
+        escreve(saida, dados.items())
+        print("Snapshot em json convertido para o formato binário: " + saida)
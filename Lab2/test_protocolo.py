@@ -0,0 +1,27 @@
+import unittest
+
+import protocolo
+
+class TestDecodificaRequisicao(unittest.TestCase):
+    """Testes da decodificação de requisições do protocolo binário."""
+
+    def test_requisicao_valida(self):
+        dados = protocolo.codificaRequisicao(protocolo.OP_WRITE, 'chave', 'valor com espaço')
+        self.assertEqual(protocolo.decodificaRequisicao(dados), (protocolo.OP_WRITE, ['chave', 'valor com espaço']))
+
+    def test_requisicao_vazia(self):
+        with self.assertRaises(ValueError):
+            protocolo.decodificaRequisicao(b'')
+
+    def test_campos_incompletos(self):
+        dados = protocolo.codificaRequisicao(protocolo.OP_READ, 'chave')
+        for fim in range(2, len(dados)):
+            with self.assertRaises(ValueError):
+                protocolo.decodificaRequisicao(dados[:fim])
+
+    def test_campo_invalido(self):
+        with self.assertRaises(ValueError):
+            protocolo.decodificaRequisicao(bytes((protocolo.OP_READ,)) + (1).to_bytes(4, 'big') + b'\xff')
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,85 @@
+import asyncio
+import unittest
+
+import protocolo
+from remoto import ConexaoRemotaAsync
+
+class ServidorFalso:
+    """Servidor de teste que aceita a troca de protocolo, lê as requisições sem responder
+    e, depois de `n_requisicoes`, envia `resposta` (se houver) e fecha a conexão."""
+
+    def __init__(self, n_requisicoes, resposta=None):
+        self._n_requisicoes = n_requisicoes
+        self._resposta = resposta
+        self._servidor = None
+
+    async def _leMensagem(self, reader):
+        tam = int.from_bytes(await reader.readexactly(4), 'big')
+        return await reader.readexactly(tam)
+
+    async def _atende(self, reader, writer):
+        await self._leMensagem(reader) # Troca de protocolo
+        writer.write((2).to_bytes(4, 'big') + b'OK')
+
+        for _ in range(self._n_requisicoes):
+            await self._leMensagem(reader)
+
+        if self._resposta is not None:
+            writer.write(len(self._resposta).to_bytes(4, 'big') + self._resposta)
+            await writer.drain()
+        writer.close()
+
+    async def inicia(self):
+        self._servidor = await asyncio.start_server(self._atende, 'localhost', 0)
+        return self._servidor.sockets[0].getsockname()[1]
+
+    async def encerra(self):
+        self._servidor.close()
+        await self._servidor.wait_closed()
+
+class TestConexaoRemotaAsync(unittest.IsolatedAsyncioTestCase):
+    """Testes da `ConexaoRemotaAsync` quando a conexão cai com requisições em andamento."""
+
+    async def _conecta(self, servidor):
+        porta = await servidor.inicia()
+        self.addAsyncCleanup(servidor.encerra)
+        conn = await ConexaoRemotaAsync.abre('localhost', porta, janela=4)
+        self.addAsyncCleanup(conn.fecha)
+        return conn
+
+    async def test_conexao_fechada_com_janela_cheia(self):
+        conn = await self._conecta(ServidorFalso(4))
+
+        # As 4 requisições ocupam a janela inteira e nunca são respondidas
+        futuros = await conn.requisitaVarias([(protocolo.OP_READ, 'chave')] * 4)
+        for futuro in futuros:
+            with self.assertRaises(ConnectionError):
+                await asyncio.wait_for(futuro, 5)
+
+        # Um novo envio não pode ficar esperando uma vaga para sempre
+        with self.assertRaises(ConnectionError):
+            await asyncio.wait_for(conn.requisitaVarias([(protocolo.OP_READ, 'chave')] * 4), 5)
+
+    async def test_tarefas_esperando_vaga(self):
+        conn = await self._conecta(ServidorFalso(4))
+
+        await conn.requisitaVarias([(protocolo.OP_READ, 'chave')] * 4)
+        esperando = [conn.requisitaVarias([(protocolo.OP_READ, 'chave')] * 3) for _ in range(3)]
+        resultados = await asyncio.wait_for(asyncio.gather(*esperando, return_exceptions=True), 5)
+        for resultado in resultados:
+            self.assertIsInstance(resultado, ConnectionError)
+
+    async def test_resposta_invalida(self):
+        # Uma resposta que não pode ser decodificada também falha as requisições pendentes
+        conn = await self._conecta(ServidorFalso(2, resposta=b''))
+
+        futuros = await conn.requisitaVarias([(protocolo.OP_READ, 'chave')] * 2)
+        for futuro in futuros:
+            with self.assertRaises(ConnectionError):
+                await asyncio.wait_for(futuro, 5)
+
+        with self.assertRaises(ConnectionError):
+            await asyncio.wait_for(conn.requisitaVarias([(protocolo.OP_READ, 'chave')]), 5)
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,170 @@
+import time
+import threading
+from contextlib import contextmanager
+
+class LockLeituraEscrita:
+    """Lock de leitura e escrita - Permite vários leitores ao mesmo tempo ou um único escritor.
+    Escritores esperando têm preferência sobre novos leitores, para que não fiquem esperando para sempre."""
+
+    def __init__(self):
+        """Instancia um objeto `LockLeituraEscrita` livre."""
+
+        self._cond = threading.Condition(threading.Lock())
+        self._leitores = 0
+        self._escritor = False
+        self._escritores_esperando = 0
+        self.espera = 0.0 # Tempo total (em segundos) que as threads esperaram pelo lock
+        self.aquisicoes = 0 # Número de vezes que o lock foi adquirido
+
+    def adquireLeitura(self):
+        """Adquire o lock para leitura. Espera enquanto houver um escritor ativo ou esperando."""
+
+        inicio = time.perf_counter()
+        with self._cond:
+            while self._escritor or self._escritores_esperando:
+                self._cond.wait()
+            self._leitores += 1
+            self.espera += time.perf_counter() - inicio
+            self.aquisicoes += 1
+
+    def liberaLeitura(self):
+        """Libera o lock de leitura. O último leitor acorda os escritores esperando."""
+
+        with self._cond:
+            self._leitores -= 1
+            if not self._leitores:
+                self._cond.notify_all()
+
+    def adquireEscrita(self):
+        """Adquire o lock para escrita. Espera até que não haja nenhum leitor ou escritor ativo."""
+
+        inicio = time.perf_counter()
+        with self._cond:
+            self._escritores_esperando += 1
+            while self._escritor or self._leitores:
+                self._cond.wait()
+            self._escritores_esperando -= 1
+            self._escritor = True
+            self.espera += time.perf_counter() - inicio
+            self.aquisicoes += 1
+
+    def liberaEscrita(self):
+        """Libera o lock de escrita e acorda quem estiver esperando."""
+
+        with self._cond:
+            self._escritor = False
+            self._cond.notify_all()
+
+class LocksParticionados:
+    """Conjunto de `LockLeituraEscrita` particionado pelas chaves do dicionário.
+    Cada chave é protegida pelo lock da partição `hash(chave) % n_particoes`, então
+    leituras nunca bloqueiam umas às outras e escritas em chaves de partições
+    diferentes acontecem em paralelo."""
+
+    def __init__(self, n_particoes=16):
+        """Instancia um objeto `LocksParticionados` com `n_particoes` locks.
+
+        Args:
+            `n_particoes` (int, optional): Número de partições (locks) do conjunto.
+        """
+
+        self._locks = [LockLeituraEscrita() for _ in range(n_particoes)]
+
+    def espera(self):
+        """Retorna o tempo total que as threads esperaram pelos locks e o número de aquisições.
+
+        Returns:
+            Tuple[float, int]: Tempo total de espera (em segundos) e número de aquisições.
+        """
+
+        return sum(lock.espera for lock in self._locks), sum(lock.aquisicoes for lock in self._locks)
+
+    def _particoes(self, keys):
+        """Retorna os índices das partições das chaves `keys`, sem repetição e em ordem crescente.
+        Adquirir os locks sempre em ordem crescente evita deadlocks entre threads.
+
+        Args:
+            `keys` (Iterable): Chaves do dicionário.
+
+        Returns:
+            List: Índices das partições.
+        """
+
+        return sorted({hash(key) % len(self._locks) for key in keys})
+
+    @contextmanager
+    def leitura(self, key):
+        """Context manager que segura o lock de leitura da partição da chave `key`.
+
+        Args:
+            `key` (str): Chave que será lida.
+        """
+
+        lock = self._locks[hash(key) % len(self._locks)]
+        lock.adquireLeitura()
+        try:
+            yield
+        finally:
+            lock.liberaLeitura()
+
+    @contextmanager
+    def escrita(self, key):
+        """Context manager que segura o lock de escrita da partição da chave `key`.
+
+        Args:
+            `key` (str): Chave que será alterada.
+        """
+
+        lock = self._locks[hash(key) % len(self._locks)]
+        lock.adquireEscrita()
+        try:
+            yield
+        finally:
+            lock.liberaEscrita()
+
+    @contextmanager
+    def leituraMultipla(self, keys):
+        """Context manager que segura os locks de leitura de todas as partições das chaves `keys`.
+
+        Args:
+            `keys` (Iterable): Chaves que serão lidas.
+        """
+
+        locks = [self._locks[i] for i in self._particoes(keys)]
+        for lock in locks:
+            lock.adquireLeitura()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.liberaLeitura()
+
+    @contextmanager
+    def escritaMultipla(self, keys):
+        """Context manager que segura os locks de escrita de todas as partições das chaves `keys`.
+
+        Args:
+            `keys` (Iterable): Chaves que serão alteradas.
+        """
+
+        locks = [self._locks[i] for i in self._particoes(keys)]
+        for lock in locks:
+            lock.adquireEscrita()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.liberaEscrita()
+
+    @contextmanager
+    def todas(self):
+        """Context manager que segura os locks de escrita de todas as partições,
+        dando acesso exclusivo ao dicionário inteiro."""
+
+        for lock in self._locks:
+            lock.adquireEscrita()
+        try:
+            yield
+        finally:
+            for lock in reversed(self._locks):
+                lock.liberaEscrita()
@@ -0,0 +1,172 @@
+#!/usr/bin/python3.8
+
+from processamento import Processamento
+
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import subprocess
+
+class Benchmark:
+    """Mede o custo do comando READ para entradas com listas de valores de vários tamanhos:
+    quantos pedidos o cliente faz ao servidor (idas e voltas pela rede) em cada READ
+    e a latência do comando. Serve para verificar que o READ continua sendo uma única
+    chamada ao servidor, qualquer que seja o número de valores da entrada."""
+
+    def __init__(self, opcoes):
+        """Instancia um objeto `Benchmark`.
+
+        Args:
+            `opcoes` (dict): Configuração do benchmark (ver `OPCOES_PADRAO`).
+        """
+
+        self._opcoes = dict(OPCOES_PADRAO, **opcoes)
+        self._tamanhos = [int(tam) for tam in self._opcoes['tamanhos'].split(',')]
+        self._servidor = None
+
+    def iniciaServidor(self):
+        """Inicia o servidor em um subprocesso, com um dicionário em um diretório temporário
+        que já tem uma entrada para cada tamanho, e espera até que ele aceite conexões."""
+
+        op = self._opcoes
+        self._dir = tempfile.TemporaryDirectory()
+        dict_path = os.path.join(self._dir.name, 'dict.json')
+
+        with open(dict_path, 'w') as f:
+            json.dump({'lista' + str(tam): ['valor' + str(i) for i in range(tam)] for tam in self._tamanhos}, f)
+
+        comando = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'servidor.py'),
+                   str(op['porta']), dict_path]
+        self._servidor = subprocess.Popen(comando, stdout=subprocess.DEVNULL)
+
+        # Espera o servidor começar a aceitar conexões
+        for _ in range(100):
+            try:
+                socket.create_connection((op['endereco'], op['porta'])).close()
+                return
+            except OSError:
+                time.sleep(0.1)
+
+        raise RuntimeError("O servidor não iniciou")
+
+    def encerraServidor(self):
+        """Encerra o servidor iniciado pelo benchmark (como um Ctrl+C) e espera ele terminar."""
+
+        if not self._servidor:
+            return
+
+        self._servidor.send_signal(subprocess.signal.SIGINT)
+        self._servidor.wait()
+        self._dir.cleanup()
+
+    def executa(self):
+        """Executa o benchmark.
+
+        Returns:
+            dict: Os resultados de cada tamanho de lista e a configuração usada.
+        """
+
+        op = self._opcoes
+        if not op['externo']:
+            self.iniciaServidor()
+
+        try:
+            proc = Processamento(op['endereco'], op['porta'])
+            pedidos = contaPedidos(proc._dict)
+            resultados = {'config': op, 'instante': time.strftime('%Y-%m-%dT%H:%M:%S'), 'tamanhos': {}}
+
+            for tam in self._tamanhos:
+                comando = "READ lista" + str(tam)
+                proc.enviaComando(comando) # Aquecimento (ex.: a primeira chamada busca o `root`)
+
+                latencias = []
+                antes = pedidos[0]
+                for _ in range(op['leituras']):
+                    inicio = time.perf_counter()
+                    proc.enviaComando(comando) # O mesmo caminho do READ na interface, incluindo a formatação da resposta
+                    latencias.append(time.perf_counter() - inicio)
+
+                latencias.sort()
+                resultados['tamanhos'][tam] = {
+                    'idas_por_read': (pedidos[0] - antes) / op['leituras'],
+                    'p50_ms': latencias[len(latencias) // 2] * 1000,
+                    'p99_ms': latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))] * 1000,
+                }
+
+            proc.encerra()
+        finally:
+            if not op['externo']:
+                self.encerraServidor()
+
+        return resultados
+
+def contaPedidos(conexao):
+    """Passa a contar os pedidos síncronos feitos por uma conexão rpyc (chamadas, acessos a
+    atributos e conversões de objetos remotos). Cada um espera a resposta do servidor, ou
+    seja, é uma ida e volta pela rede. Mensagens que não esperam resposta (como a liberação
+    de uma referência remota) não são contadas.
+
+    Args:
+        `conexao` (rpyc.Connection): A conexão.
+
+    Returns:
+        List[int]: Lista com o número de pedidos feitos, atualizado a cada pedido.
+    """
+
+    contador = [0]
+    pede = conexao.sync_request
+
+    def pedeContando(handler, *args):
+        contador[0] += 1
+        return pede(handler, *args)
+
+    conexao.sync_request = pedeContando
+    return contador
+
+OPCOES_PADRAO = {
+    'endereco': 'localhost',
+    'porta': 5117,
+    'externo': False, # Se True, usa um servidor já em execução (que precisa ter as entradas `lista[tamanho]`)
+    'tamanhos': '1,10,100,1000', # Números de valores das entradas lidas
+    'leituras': 200, # Número de READs de cada entrada
+    'max_idas': 0.0, # Se maior que 0, o benchmark falha se algum READ precisar de mais idas e voltas que isso
+    'saida': 'benchmark.json',
+}
+"""Configuração padrão do benchmark. Cada opção pode ser alterada na linha de comando com `--opcao=valor`."""
+
+if __name__ == '__main__':
+    # Pega as opções da linha de comando (no formato --opcao=valor), convertendo para o tipo do valor padrão
+    opcoes = {}
+    for arg in sys.argv[1:]:
+        nome, _, valor = arg.lstrip('-').partition('=')
+        nome = nome.replace('-', '_')
+        if nome not in OPCOES_PADRAO:
+            print("Opção desconhecida: " + arg)
+            print("Opções disponíveis: " + ", ".join('--' + op.replace('_', '-') for op in OPCOES_PADRAO))
+            sys.exit(1)
+
+        padrao = OPCOES_PADRAO[nome]
+        if isinstance(padrao, bool):
+            opcoes[nome] = valor.lower() not in ('0', 'false', 'nao')
+        else:
+            opcoes[nome] = type(padrao)(valor)
+
+    resultados = Benchmark(opcoes).executa()
+
+    # Salva os resultados em json, para comparar execuções diferentes
+    with open(resultados['config']['saida'], 'w') as f:
+        json.dump(resultados, f, indent=2)
+
+    # Imprime um resumo dos resultados
+    for tam, res in resultados['tamanhos'].items():
+        print("READ de {:>6} valores: {:.1f} idas e voltas  p50={:.3f}ms p99={:.3f}ms".format(
+            tam, res['idas_por_read'], res['p50_ms'], res['p99_ms']))
+
+    # Verificação de regressão: o READ não pode voltar a fazer chamadas por elemento
+    max_idas = resultados['config']['max_idas']
+    if max_idas > 0 and any(res['idas_por_read'] > max_idas for res in resultados['tamanhos'].values()):
+        print("FALHA: algum READ precisou de mais de {} idas e voltas".format(max_idas))
+        sys.exit(1)
@@ -8,13 +8,20 @@ if __name__ == '__main__':
     end = 'localhost'
     porta = 5016
 
+    # Separa as opções (no formato --opcao ou --opcao=valor) dos parametros posicionais
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    opcoes = dict(arg[2:].partition('=')[::2] for arg in sys.argv[1:] if arg.startswith('--'))
+
     # Pega os parametros da linha de comando
-    arg_len = len(sys.argv)
+    arg_len = len(args)
+    if arg_len >= 1:
+        end = args[0]
     if arg_len >= 2:
-        end = sys.argv[1]
-    if arg_len >= 3:
-        porta = int(sys.argv[2])
+        porta = int(args[1])
+
+    # Com a opção --cache=[n], guarda até n entradas lidas no cliente
+    tam_cache = int(opcoes.get('cache') or 0)
 
     # Executa o cliente
-    cli = Interface(end, porta)
+    cli = Interface(end, porta, tam_cache)
     cli.main()
\ No newline at end of file
@@ -1,7 +1,12 @@
-import os
-import json
+from persistencia import Persistencia
+
+from contextlib import contextmanager
+
+import sys
 import rpyc
 import time
+import queue
+import threading
 
 class Dicionario(rpyc.Service):
     """Componente Dicionário - Implementa o acesso, a remoção e a edição do dicionário
@@ -13,13 +18,24 @@ class Dicionario(rpyc.Service):
     _dict = {}
     """Dicionario que guarda os pares chave-valor."""
 
-    def __init__(self, dict_path):
+    _N_LISTRAS = 64
+    """Número de locks das entradas do dicionario. Cada chave usa sempre o mesmo lock,
+    então alterações de chaves diferentes podem ser feitas ao mesmo tempo."""
+
+    _TAM_FILA_LOG = 10000
+    """Número máximo de mensagens de log esperando para serem impressas."""
+
+    def __init__(self, dict_path, politica="sempre", intervalo=0.05, n_escritas=100, duravel=True):
         """ Recebe um arquivo contendo o dicionario em json
         e inctancia um objeto `Dicionario`. Se o caminho de arquivo
         informado não existir, cria o arquivo.
 
         Args:
             `dict_path` (str): Caminho para o arquivo contendo o dicionario
+            `politica` (str, optional): Quando as alterações são gravadas em disco (ver `Persistencia.POLITICAS`).
+            `intervalo` (float, optional): Tempo entre as gravações (política `intervalo`), em segundos.
+            `n_escritas` (int, optional): Número de alterações de cada gravação (política `escritas`).
+            `duravel` (bool, optional): Se True, as alterações só retornam depois de gravadas em disco.
         """
         super(Dicionario, self).__init__()
         self._DICT_FILE_PATH = dict_path
@@ -27,6 +43,12 @@ class Dicionario(rpyc.Service):
         # Marca o tempo inicial (serve para imprimir logs indicando o tempo)
         self._start_time = time.time()
 
+        # As mensagens de log são impressas por uma thread separada, para as chamadas não esperarem o terminal
+        self._logs = queue.Queue(self._TAM_FILA_LOG)
+        self._logs_descartados = 0
+        self._thread_log = threading.Thread(target=self._imprimeLogs, name='log', daemon=True)
+        self._thread_log.start()
+
         print("\033c", end="") # Limpa o terminal
 
         # Imprime mensagem mostrando que o servidor iniciou e instruções dos comandos
@@ -39,21 +61,27 @@ class Dicionario(rpyc.Service):
         print("\033[33mQUIT                  - \033[0mEncerra o servido se nenhuma conexão estiver ativa.")
         print()
 
-        # Se o arquivo nao existir, ele chama saveDict, que cria um 
-        # arquivo e escreve o dicionario vazio nele
-        if not os.path.isfile(self._DICT_FILE_PATH):
-            self.saveDict()
-            return
+        # Le o dicionario do arquivo (e as alterações do log) e inicia a thread de persistência.
+        # Se o arquivo nao existir, ele é criado com o dicionario vazio
+        # As alterações de cada chave são registradas na persistência na mesma ordem em que são feitas
+        self._listras = [threading.Lock() for _ in range(self._N_LISTRAS)]
+        self._persistencia = Persistencia(dict_path, politica, intervalo, n_escritas, duravel)
+        self._dict = self._persistencia.carrega()
+        self._persistencia.inicia(self.copiaDict)
 
-        # Se o arquivo existe, le o dicionario dele
-        with open(self._DICT_FILE_PATH, 'r') as f:
-            self._dict = json.loads(f.read())
+        # Clientes avisados das alterações (para invalidar os seus caches): pares (conexão, função)
+        self._assinantes = []
+        self._assinantes_lock = threading.Lock()
 
     def on_connect(self, conx):
         # Imprime log informando sobre a nova conexão
         self.print_log("Conexão estabelecida com: " + str(conx._channel.stream.sock.getpeername()))
 
     def on_disconnect(self, conx):
+        # Remove as funções de aviso registradas pela conexão
+        with self._assinantes_lock:
+            self._assinantes = [(conn, callback) for conn, callback in self._assinantes if conn is not conx]
+
         # Informa que a conexão foi encerrada
         self.print_log("Uma conexão foi encerrada")
     
@@ -69,37 +97,177 @@ class Dicionario(rpyc.Service):
 
         # print("\r\033[K", end="") # Limpa a última linha do terminal (evita que fique um 'S >>' solto no terminal)
 
-        # Imprime o log, indicando o tempo
-        print("\033[94m[" + timestamp + "]\033[0m", msg)
+        # Coloca o log, indicando o tempo, na fila da thread de log. Se a fila estiver cheia
+        # (o terminal não está dando conta), descarta a mensagem em vez de esperar
+        try:
+            self._logs.put_nowait("\033[94m[" + timestamp + "]\033[0m " + msg)
+        except queue.Full:
+            self._logs_descartados += 1
 
         # print("\r\033[92mS >> \033[0m", end="") # Imprime um 'S >>', indicando que o administrador pode enviar um comando
 
-    def saveDict(self):
-        """ Salva o dicionario para o arquivo json
+    def _imprimeLogs(self):
+        """ Laço da thread de log: imprime as mensagens da fila, juntando as que já estão
+        esperando em uma única escrita no terminal, até receber None."""
+
+        while True:
+            msgs = [self._logs.get()]
+            while msgs[-1] is not None and not self._logs.empty() and len(msgs) < 1000:
+                msgs.append(self._logs.get_nowait())
+
+            fim = msgs[-1] is None
+            if fim:
+                msgs.pop()
+
+            if self._logs_descartados:
+                descartados, self._logs_descartados = self._logs_descartados, 0
+                msgs.append("\033[91m" + str(descartados) + " mensagens de log descartadas\033[0m")
+
+            if msgs:
+                sys.stdout.write("\n".join(msgs) + "\n")
+                sys.stdout.flush()
+
+            if fim:
+                return
+
+    @contextmanager
+    def _trava(self, keys=None):
+        """ Segura os locks das entradas `keys` (ou de todas as entradas, se `keys` for None)
+        enquanto o bloco `with` executa. Os locks são sempre pegos na mesma ordem, então
+        duas chamadas com chaves em comum nunca ficam esperando uma pela outra para sempre.
+
+        Args:
+            `keys` (Iterable[str], optional): As chaves das entradas
+        """
+
+        if keys is None:
+            listras = self._listras
+        else:
+            listras = [self._listras[i] for i in sorted({hash(key) % self._N_LISTRAS for key in keys})]
+
+        for lock in listras:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(listras):
+                lock.release()
+
+    def copiaDict(self):
+        """ Retorna uma cópia do dicionario, usada pela persistência para salvar o dicionario inteiro.
+
+        Returns:
+            dict: A cópia, com uma lista de valores nova para cada chave.
         """
         
-        # Salva o dicionario inteiro no arquivo em _DICT_FILE_PATH
-        with open(self._DICT_FILE_PATH, 'w') as f:
-            f.write(json.dumps(self._dict))
+        with self._trava():
+            return {key: list(valores) for key, valores in self._dict.items()}
+
+    def encerra(self):
+        """ Grava as alterações pendentes e salva o dicionario inteiro no arquivo json
+        """
+
+        self._persistencia.encerra()
+
+        # Espera a thread de log imprimir as mensagens que ainda estão na fila
+        self._logs.put(None)
+        self._thread_log.join()
+
+    def exposed_subscribe(self, callback):
+        """ Registra uma função do cliente que é chamada com as chaves alteradas a cada
+        alteração do dicionario, para o cliente invalidar o seu cache. A função é chamada
+        sem esperar o retorno, e o aviso de uma alteração feita pelo próprio cliente chega
+        antes da resposta da chamada que fez a alteração.
+
+        Args:
+            `callback` (Callable[[Tuple[str]], Any]): A função (uma referência remota), que recebe uma tupla de chaves
+        """
+
+        with self._assinantes_lock:
+            self._assinantes = self._assinantes + [(callback.____conn__, rpyc.async_(callback))]
+
+        self.print_log("subscribe() ==> " + str(len(self._assinantes)) + " assinantes")
+
+    def _notifica(self, keys):
+        """ Avisa os clientes registrados em `exposed_subscribe` que as chaves foram alteradas.
+
+        Args:
+            `keys` (Tuple[str]): As chaves alteradas
+        """
+
+        if not keys:
+            return
+
+        for _, callback in self._assinantes:
+            try:
+                callback(keys)
+            except (EOFError, OSError, ReferenceError):
+                pass # A conexão foi fechada: a função é removida no on_disconnect
 
     def exposed_getItem(self, key):
         """ Acessa um valor associado a uma chave no dicionario.
-        Se a chave não existir no dicionario, retorna uma lista vazia.
+        Se a chave não existir no dicionario, retorna uma tupla vazia.
+
+        Os valores são retornados em uma tupla nova, que o rpyc copia para o cliente.
+        A lista do dicionario seria passada por referência (netref): cada acesso do
+        cliente a ela seria uma nova chamada ao servidor, e o cliente poderia alterá-la.
 
         Args:
             `key` (str): Chave a ser acessada no dicionario
 
         Returns:
-            Any: O valor associado a chave `key`
+            Tuple[str]: Os valores associados a chave `key`
+        """
+        # Se a chave ja existe no dicionario, retorna uma cópia dos valores
+        with self._trava((key,)):
+            val = tuple(self._dict.get(key, ()))
+        self.print_log("getItem(" + key + ") ==> " + str(list(val)))
+        return val
+
+    def _adicionaValor(self, key, value):
+        """ Adiciona o valor `value` na entrada `key` e registra a alteração na persistência.
+        Deve ser chamada segurando o lock de `key` (ver `_trava`).
+
+        Args:
+            `key` (str): A chave do par chave-valor
+            `value` (Any): O valor do par chave-valor
+
+        Returns:
+            Tuple[bool, int]: Se a entrada já existia e o número da alteração na persistência.
+        """
+
+        # Se a chave ja existe no dicionario,
+        # concatena um valor novo na lista de valores
+        existia = key in self._dict
+        if existia:
+            valores = sorted(self._dict[key] + [value])
+        else:
+            # Se a chave nao existe no dicionario,
+            # cria uma lista com um unico valor
+            valores = [value]
+
+        # Registra antes de alterar o dicionario: um valor que não pode ser gravado é recusado aqui
+        alteracao = self._persistencia.registra(key, valores)
+        self._dict[key] = valores
+        return existia, alteracao
+
+    def _removeEntrada(self, key):
+        """ Remove a entrada `key` e registra a alteração na persistência.
+        Deve ser chamada segurando o lock de `key` (ver `_trava`).
+
+        Args:
+            `key` (str): A chave da entrada que sera removida
+
+        Returns:
+            Tuple[bool, int]: Se a entrada existia e o número da alteração na persistência (None se não existia).
         """
-        # Se a chave ja existe no dicionario, retorna o valor
-        if key in self._dict:
-            self.print_log("getItem(" + key + ") ==> " + str(self._dict[key]))
-            return self._dict[key]
-        
-        # Se a chave nao existe no dicionario, retorna None
-        self.print_log("getItem(" + key + ") ==> []")
-        return []
+
+        if key not in self._dict:
+            return False, None
+
+        alteracao = self._persistencia.registra(key, None)
+        del self._dict[key]
+        return True, alteracao
 
     def exposed_setItem(self, key, value):
         """ Adiciona um par chave-valor no dicionario.
@@ -111,21 +279,15 @@ class Dicionario(rpyc.Service):
             `value` (Any): O valor do par chave-valor
         """
 
-        # Se a chave ja existe no dicionario,
-        # concatena um valor novo na lista de valores
-        if key in self._dict:
-            self._dict[key].append(value)
-            self._dict[key].sort()
-            self.saveDict()
-            self.print_log("setItem(" + key + "," + value + ") ==> True")
-            return True
-        
-        # Se a chave nao existe no dicionario, 
-        # cria uma lista com um unico valor
-        self._dict[key] = [value]
-        self.saveDict()
-        self.print_log("setItem(" + key + "," + value + ") ==> False")
-        return False
+        with self._trava((key,)):
+            existia, alteracao = self._adicionaValor(key, value)
+
+        self._notifica((key,))
+
+        # Espera a gravação fora do lock, para outras alterações entrarem no mesmo grupo
+        self._persistencia.espera(alteracao)
+        self.print_log("setItem(" + key + "," + value + ") ==> " + str(existia))
+        return existia
 
     def exposed_removeItem(self, key):
         """ Remove uma entrada do dicionario. Se a entrada 
@@ -144,13 +306,133 @@ class Dicionario(rpyc.Service):
 
         # Se a chave ja existe no dicionario,
         # remove a entrada do dicionario e retorna True
-        if key in self._dict:
-            self._dict.pop(key)
-            self.saveDict()
+        with self._trava((key,)):
+            existia, alteracao = self._removeEntrada(key)
+
+        if existia:
+            self._notifica((key,))
+            self._persistencia.espera(alteracao)
             self.print_log("removeItem(" + key + ") ==> True")
             return True
         
         # Se a chave nao existe no dicionario, 
         # nao remove nada e retorna False
         self.print_log("removeItem(" + key + ") ==> False")
-        return False
\ No newline at end of file
+        return False
+
+    def exposed_getMany(self, keys):
+        """ Acessa os valores de várias chaves do dicionario em uma única chamada.
+        O cliente deve enviar as chaves em uma tupla, que é copiada na chamada
+        (uma lista seria acessada pelo servidor um elemento por vez, pela rede).
+
+        Args:
+            `keys` (Tuple[str]): As chaves a serem acessadas
+
+        Returns:
+            Tuple[Tuple]: Os valores de cada chave (uma tupla vazia se a chave não existir), na ordem das chaves
+        """
+
+        keys = tuple(keys)
+        with self._trava(keys):
+            vals = tuple(tuple(self._dict.get(key, ())) for key in keys)
+
+        self.print_log("getMany(" + str(len(keys)) + " chaves) ==> " + str(sum(1 for val in vals if val)) + " encontradas")
+        return vals
+
+    def exposed_setMany(self, pares):
+        """ Adiciona vários pares chave-valor no dicionario em uma única chamada.
+        As alterações são gravadas juntas, e a chamada espera só a gravação da última.
+
+        Args:
+            `pares` (Tuple[Tuple[str, Any]]): Os pares `(chave, valor)`
+
+        Returns:
+            Tuple[bool]: Para cada par, se a chave já existia no dicionario
+        """
+
+        pares = tuple(pares)
+        res = []
+        try:
+            with self._trava(key for key, _ in pares):
+                for key, value in pares:
+                    res.append(self._adicionaValor(key, value))
+        finally:
+            # Avisa as alterações feitas mesmo se um par foi recusado (as anteriores a ele continuam feitas)
+            self._notifica(tuple(dict.fromkeys(key for (key, _), _ in zip(pares, res))))
+
+        if res:
+            self._persistencia.espera(res[-1][1])
+
+        existiam = tuple(existia for existia, _ in res)
+        self.print_log("setMany(" + str(len(pares)) + " pares) ==> " + str(existiam.count(False)) + " entradas novas")
+        return existiam
+
+    def exposed_removeMany(self, keys):
+        """ Remove várias entradas do dicionario em uma única chamada.
+
+        Args:
+            `keys` (Tuple[str]): As chaves das entradas que serão removidas
+
+        Returns:
+            Tuple[bool]: Para cada chave, se a entrada existia e foi removida
+        """
+
+        keys = tuple(keys)
+        with self._trava(keys):
+            res = [self._removeEntrada(key) for key in keys]
+
+        self._notifica(tuple(dict.fromkeys(key for key, (existia, _) in zip(keys, res) if existia)))
+        alteracoes = [alteracao for _, alteracao in res if alteracao is not None]
+        if alteracoes:
+            self._persistencia.espera(alteracoes[-1])
+
+        removidas = tuple(existia for existia, _ in res)
+        self.print_log("removeMany(" + str(len(keys)) + " chaves) ==> " + str(removidas.count(True)) + " removidas")
+        return removidas
+
+    def exposed_batch(self, operacoes):
+        """ Executa várias operações no dicionario em uma única chamada, na ordem.
+        As operações são executadas sem que outras alterações das mesmas chaves aconteçam entre elas.
+
+        Args:
+            `operacoes` (Tuple[Tuple]): As operações, no formato `("get", chave)`,
+                `("set", chave, valor)` ou `("remove", chave)`
+
+        Returns:
+            Tuple: O resultado de cada operação (os valores da chave em uma tupla para
+            `get`, e o mesmo que `setItem` e `removeItem` para `set` e `remove`)
+
+        Raises:
+            ValueError: Se alguma operação for inválida (nesse caso, nenhuma é executada)
+        """
+
+        operacoes = tuple(tuple(op) for op in operacoes)
+        formatos = {"get": 2, "set": 3, "remove": 2} # Número de elementos de cada operação
+        for op in operacoes:
+            if not op or formatos.get(op[0]) != len(op):
+                raise ValueError("Operação inválida: " + str(op))
+
+        res = []
+        alteradas = {} # Chaves alteradas, sem repetições
+        ultima = None # Número da última alteração registrada na persistência
+        try:
+            with self._trava(op[1] for op in operacoes):
+                for op in operacoes:
+                    if op[0] == "get":
+                        res.append(tuple(self._dict.get(op[1], ())))
+                        continue
+
+                    existia, alteracao = self._adicionaValor(op[1], op[2]) if op[0] == "set" else self._removeEntrada(op[1])
+                    res.append(existia)
+                    ultima = alteracao or ultima
+                    if alteracao is not None:
+                        alteradas[op[1]] = True
+        finally:
+            # Avisa as alterações feitas mesmo se uma operação foi recusada
+            self._notifica(tuple(alteradas))
+
+        if ultima is not None:
+            self._persistencia.espera(ultima)
+
+        self.print_log("batch(" + str(len(operacoes)) + " operações)")
+        return tuple(res)
\ No newline at end of file
@@ -7,14 +7,15 @@ import sys
 class Interface:
     """Componente Interface - Implementa a interface de usuário e envia requisições para o componente de processamento."""
 
-    def __init__(self, end, porta):
+    def __init__(self, end, porta, tam_cache=0):
         """Recebe um endereco IP e um numero de porta e instancia um objeto `Interface`. 
 
         Args:
             `end` (str): Endereco IP para a conexão do cliente.
             `porta` (int): Porta para a conexão do cliente.
+            `tam_cache` (int, optional): Número máximo de entradas no cache de leituras (0 desativa o cache).
         """
-        self._proc = Processamento(end, porta)
+        self._proc = Processamento(end, porta, tam_cache)
 
     def enviaRequisicoes(self):
         """Aceita entrada do usuário e envia para o componente de processamento.
@@ -49,6 +50,8 @@ class Interface:
         print("\033[33mREAD [chave]          - \033[0mLê uma entrada do dicionário.")
         print("\033[33mWRITE [chave] [valor] - \033[0mEscreve uma nova entrada no dicionário.")
         print("\033[33mREMOVE [chave]        - \033[0mRemove uma entrada do dicionário. \033[91m(Apenas para administrador)\033[0m")
+        print("\033[33mMREAD [chave] ...     - \033[0mLê várias entradas do dicionário de uma vez.")
+        print("\033[33mLOAD [arq] [saida]    - \033[0mExecuta os comandos de um arquivo (um por linha), em lotes.")
         print("\033[33mQUIT                  - \033[0mEncerra o cliente.")
         print()
 
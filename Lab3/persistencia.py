@@ -0,0 +1,276 @@
+import os
+import json
+import time
+import threading
+
+class Persistencia:
+    """Componente Persistência - Grava as alterações do dicionário em disco com uma thread
+    separada. As alterações são acumuladas e gravadas em grupo (group commit) no final de um
+    log (`[arquivo do dicionário].log`), com um único `fsync` por grupo, então o custo de uma
+    escrita não depende do tamanho do dicionário. Quando o log fica maior que o último
+    snapshot, o dicionário inteiro é salvo de novo no arquivo e o log recomeça.
+
+    Cada linha do log guarda a lista de valores completa de uma chave depois da alteração
+    (ou `null` se a chave foi removida), então reaplicar uma linha mais de uma vez não
+    muda o resultado."""
+
+    POLITICAS = ("sempre", "intervalo", "escritas")
+    """Políticas de gravação: a cada escrita (assim que possível, juntando as escritas que
+    chegarem enquanto o disco está ocupado), a cada intervalo ou a cada número de escritas."""
+
+    _LIMITE_LOG = 1024 * 1024
+    """Tamanho mínimo do log (em bytes) antes de salvar um novo snapshot."""
+
+    def __init__(self, dict_path, politica="sempre", intervalo=0.05, n_escritas=100, duravel=True):
+        """ Instancia um objeto `Persistencia` para o arquivo `dict_path`.
+
+        Args:
+            `dict_path` (str): Caminho para o arquivo do dicionario.
+            `politica` (str, optional): Quando as alterações são gravadas (ver `POLITICAS`).
+            `intervalo` (float, optional): Tempo entre as gravações na política `intervalo`, em segundos.
+                Na política `escritas`, é o tempo máximo que uma alteração espera para ser gravada.
+            `n_escritas` (int, optional): Número de alterações de cada gravação na política `escritas`.
+            `duravel` (bool, optional): Se True, `espera` só retorna depois que a alteração foi gravada.
+        """
+
+        if politica not in self.POLITICAS:
+            raise ValueError("Política de persistência inválida: " + str(politica))
+
+        self._DICT_FILE_PATH = dict_path
+        self._LOG_FILE_PATH = dict_path + '.log'
+        self._politica = politica
+        self._intervalo = intervalo
+        self._n_escritas = n_escritas
+        self._duravel = duravel
+
+        self._pendentes = {} # Chave -> linha do log (em json) da última alteração ainda não gravada
+        self._registradas = 0 # Número de alterações registradas
+        self._tentadas = 0 # Número de alterações que a thread de persistência já tentou gravar
+        self._gravadas = 0 # Número de alterações já gravadas em disco
+        self._cond = threading.Condition()
+        self._encerrando = False
+        self._erro = None # Erro da última gravação, se ela falhou
+        self._log = None
+        self._tam_log = 0
+        self._tam_snapshot = 0
+        self._estado = None
+        self._thread = None
+
+    def carrega(self):
+        """ Lê o dicionario do arquivo e reaplica as alterações do log.
+        Se o arquivo não existir, retorna um dicionario vazio.
+
+        Returns:
+            dict: O dicionario salvo.
+        """
+
+        dicionario = {}
+        if os.path.isfile(self._DICT_FILE_PATH):
+            with open(self._DICT_FILE_PATH, 'r') as f:
+                dicionario = json.loads(f.read())
+
+        # O log antigo só existe se um snapshot foi interrompido
+        for path in (self._LOG_FILE_PATH + '.antigo', self._LOG_FILE_PATH):
+            if not os.path.isfile(path):
+                continue
+
+            with open(path, 'r') as f:
+                for linha in f:
+                    try:
+                        key, valores = json.loads(linha)
+                    except ValueError:
+                        break # Última linha incompleta (o servidor parou no meio de uma gravação)
+
+                    if valores is None:
+                        dicionario.pop(key, None)
+                    else:
+                        dicionario[key] = valores
+
+        return dicionario
+
+    def inicia(self, estado):
+        """ Salva o estado atual em um snapshot e inicia a thread que grava as alterações.
+
+        Args:
+            `estado` (Callable): Função que retorna uma cópia do dicionario, usada para salvar os snapshots.
+                Ela não pode ser executada ao mesmo tempo que as alterações do dicionário.
+        """
+
+        self._estado = estado
+        self.salvaSnapshot()
+
+        self._thread = threading.Thread(target=self._executa, name='persistencia', daemon=True)
+        self._thread.start()
+
+    def registra(self, key, valores):
+        """ Registra uma alteração do dicionario. Deve ser chamada na mesma ordem em que as
+        alterações de uma chave são feitas (ex.: segurando o lock da alteração), e antes de
+        aplicar a alteração no dicionario: a alteração é convertida para json aqui, então um
+        valor que não pode ser gravado é recusado sem chegar ao dicionario.
+
+        Args:
+            `key` (str): A chave alterada.
+            `valores` (List): A lista de valores da chave depois da alteração, ou None se ela foi removida.
+
+        Returns:
+            int: O número da alteração, usado em `espera`.
+
+        Raises:
+            TypeError: Se a chave não é uma string ou algum valor não pode ser convertido para json.
+        """
+
+        if not isinstance(key, str):
+            raise TypeError("A chave deve ser uma string, não " + type(key).__name__)
+        linha = json.dumps([key, valores]) + '\n'
+
+        with self._cond:
+            # A thread de persistência é acordada para gravar ou, na primeira alteração pendente, para marcar o tempo de espera
+            if (self._politica == "sempre" or not self._pendentes
+                    or self._registradas + 1 - self._tentadas >= self._n_escritas):
+                self._cond.notify_all()
+
+            self._pendentes[key] = linha
+            self._registradas += 1
+            return self._registradas
+
+    def espera(self, alteracao):
+        """ Espera a alteração número `alteracao` ser gravada, se a persistência for durável.
+
+        Args:
+            `alteracao` (int): O número retornado por `registra`.
+
+        Raises:
+            Exception: O erro da gravação, se ela falhou (ex.: `OSError`).
+        """
+
+        if not self._duravel:
+            return
+
+        with self._cond:
+            while self._tentadas < alteracao:
+                self._cond.wait()
+
+            if self._gravadas < alteracao:
+                raise self._erro
+
+    def _prontoParaGravar(self, desde):
+        """ Informa se as alterações pendentes já devem ser gravadas, de acordo com a política.
+
+        Args:
+            `desde` (float): Instante da última gravação.
+        """
+
+        if not self._pendentes:
+            return False
+        if self._encerrando or self._politica == "sempre":
+            return True
+        if self._politica == "escritas" and self._registradas - self._tentadas >= self._n_escritas:
+            return True
+        return time.monotonic() - desde >= self._intervalo
+
+    def _executa(self):
+        """ Laço da thread de persistência: espera as alterações pendentes ficarem prontas
+        para gravar, grava todas elas de uma vez e avisa quem estava esperando."""
+
+        desde = time.monotonic()
+        while True:
+            with self._cond:
+                while not self._prontoParaGravar(desde):
+                    if self._encerrando:
+                        return
+
+                    espera = None
+                    if self._pendentes and self._politica != "sempre":
+                        espera = max(0, self._intervalo - (time.monotonic() - desde))
+                    self._cond.wait(espera)
+
+                # Separa o grupo de alterações; as que chegarem durante a gravação vão para o próximo
+                grupo, self._pendentes = self._pendentes, {}
+                alvo = self._registradas
+
+            # Qualquer erro é tratado como uma gravação que falhou: a thread nunca para,
+            # senão quem espera as alterações ficaria esperando para sempre
+            try:
+                if self._erro is None:
+                    self._gravaGrupo(grupo)
+                else:
+                    # Depois de uma falha, o log pode ter uma linha pela metade: salva o dicionario inteiro
+                    self.salvaSnapshot()
+                erro = None
+            except Exception as e:
+                erro = e
+
+            desde = time.monotonic()
+            with self._cond:
+                self._tentadas = alvo
+                if erro is None:
+                    self._gravadas = alvo
+                self._erro = erro
+                self._cond.notify_all()
+
+            # O snapshot é salvo depois de liberar quem esperava pelo grupo
+            if erro is None and self._tam_log > max(self._LIMITE_LOG, self._tam_snapshot):
+                try:
+                    self.salvaSnapshot()
+                except Exception:
+                    pass # O log continua aberto e válido: o snapshot é tentado de novo na próxima gravação
+
+    def _gravaGrupo(self, grupo):
+        """ Escreve um grupo de alterações no final do log e espera elas chegarem ao disco.
+
+        Args:
+            `grupo` (dict): A linha do log da última alteração de cada chave alterada.
+        """
+
+        dados = ''.join(grupo.values())
+        self._log.write(dados)
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._tam_log += len(dados)
+
+    def salvaSnapshot(self):
+        """ Salva o dicionario inteiro no arquivo e recomeça o log. O log atual é renomeado
+        antes de copiar o dicionario, então as alterações feitas durante o snapshot ficam no
+        log novo, e o log antigo só é apagado depois que o arquivo novo foi escrito.
+
+        O log aberto só é trocado depois que o novo foi aberto, então se alguma etapa falhar
+        as gravações continuam em um log válido (o atual, ou o antigo, que também é reaplicado)."""
+
+        antigo_path = self._LOG_FILE_PATH + '.antigo'
+
+        # Se sobrou um log antigo (um snapshot falhou), não sobrescreve ele
+        if os.path.isfile(self._LOG_FILE_PATH) and not os.path.isfile(antigo_path):
+            os.replace(self._LOG_FILE_PATH, antigo_path)
+
+        log = open(self._LOG_FILE_PATH, 'a')
+        if self._log is not None:
+            self._log.close()
+        self._log = log
+        self._tam_log = 0
+
+        dados = json.dumps(self._estado())
+
+        # Escreve em um arquivo temporário e substitui o original, para nunca deixar um arquivo pela metade
+        tmp_path = self._DICT_FILE_PATH + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._DICT_FILE_PATH)
+        self._tam_snapshot = len(dados)
+
+        if os.path.isfile(antigo_path):
+            os.remove(antigo_path)
+
+    def encerra(self):
+        """ Grava as alterações pendentes, para a thread de persistência e salva o dicionario
+        inteiro no arquivo (o log fica vazio)."""
+
+        with self._cond:
+            self._encerrando = True
+            self._cond.notify_all()
+        self._thread.join()
+
+        self.salvaSnapshot()
+        self._log.close()
+        os.remove(self._LOG_FILE_PATH)
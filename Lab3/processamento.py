@@ -1,7 +1,9 @@
+import os
 import sys
 import time
 import threading
 import rpyc
+from collections import OrderedDict
 
 class Processamento:
     """Componente Processamento - Recebe e processa as requisições do cliente e envia para o servidor."""
@@ -9,21 +11,72 @@ class Processamento:
     _dict = None
     """Objeto `Dicionario` implementado no servidor, acessado através do RPC"""
 
-    def __init__(self, end, porta):
+    _TAM_LOTE = 1000
+    """Número máximo de operações enviadas ao servidor em uma única chamada pelo comando LOAD"""
+
+    def __init__(self, end, porta, tam_cache=0):
         """Recebe um endereco IP e um numero de porta e instancia um objeto `Processamento`.
 
         Args:
             `end` (str): Endereco IP para a conexão com o servidor.
             `porta` (int): Porta para a conexão com o servidor.
+            `tam_cache` (int, optional): Número máximo de entradas no cache de leituras (0 desativa o cache).
         """
         # Inicia a conexão com o servidor
         self._dict = rpyc.connect(end, porta)
 
+        # Busca uma vez os métodos usados em cada comando: cada acesso a um atributo do
+        # objeto remoto é uma chamada ao servidor, antes da chamada do próprio método
+        self._getItem = self._dict.root.getItem
+        self._setItem = self._dict.root.setItem
+        self._removeItem = self._dict.root.removeItem
+
+        # Cache das leituras, mantido coerente pelos avisos de alteração do servidor
+        self._cache = None
+        self._servidor_avisos = None
+        if tam_cache > 0:
+            self._tam_cache = tam_cache
+            self._cache = OrderedDict() # Chave -> valores, da leitura mais antiga para a mais recente
+            self._cache_lock = threading.Lock()
+            self._invalidacoes = 0 # Número de avisos de alteração recebidos
+
+            # Thread que atende os avisos do servidor enquanto o cliente não está fazendo chamadas.
+            # Se a conexão cair, a thread chama `desativaCache`, já que os avisos param de chegar
+            self._servidor_avisos = rpyc.BgServingThread(self._dict, self.desativaCache, serve_interval=0.1, sleep_interval=0)
+            self._dict.root.subscribe(self.invalida)
+
     def encerra(self):
         """Finaliza a conexão com o servidor RPC"""
 
+        # Se a conexão já caiu, a thread dos avisos para sozinha
+        if self._servidor_avisos is not None and not self._dict.closed:
+            self._servidor_avisos.stop()
+        self._servidor_avisos = None
+
         self._dict.close()
 
+    def desativaCache(self):
+        """Esvazia e desativa o cache de leituras. Chamado quando a conexão com o servidor
+        cai: sem os avisos de alteração, as entradas do cache podem estar desatualizadas,
+        então as leituras passam a ir ao servidor (e falham como as outras chamadas)."""
+
+        with self._cache_lock:
+            self._cache = None
+
+    def invalida(self, keys):
+        """Remove do cache as entradas alteradas no servidor. Função chamada pelo servidor
+        (registrada com `subscribe`) a cada alteração do dicionário.
+
+        Args:
+            `keys` (Tuple[str]): As chaves das entradas alteradas.
+        """
+
+        with self._cache_lock:
+            self._invalidacoes += 1
+            if self._cache is not None:
+                for key in keys:
+                    self._cache.pop(key, None)
+
     def enviaComando(self, comando):
         """Processa um comando e envia ao servidor se ele for válido.
 
@@ -45,7 +98,7 @@ class Processamento:
 
             # Le a entrada do dicionario
             value = self.leEntrada(comandos[1])
-            return str(value)
+            return str(list(value))
 
         elif comandos[0] == "WRITE":
             # Comando de escrita
@@ -66,11 +119,34 @@ class Processamento:
             # Remove a entrada do dicionario
             res = self.removeEntrada(comandos[1])
             return res
+
+        elif comandos[0] == "MREAD":
+            # Comando de leitura de várias entradas
+
+            if len(comandos) < 2: # Verifica se o comando foi escrito corretamente
+                return "Uso do comando MREAD: MREAD [chave] [chave] ..."
+
+            # Le as entradas do dicionario em uma única chamada, uma linha por chave
+            values = self.leEntradas(comandos[1:])
+            return "\n".join(key + ": " + str(list(value)) for key, value in zip(comandos[1:], values))
+
+        elif comandos[0] == "LOAD":
+            # Comando de execução de um arquivo de comandos
+
+            if len(comandos) < 2: # Verifica se o comando foi escrito corretamente
+                return "Uso do comando LOAD: LOAD [arquivo] [arquivo_respostas]"
+
+            # Executa os comandos do arquivo em lotes
+            try:
+                return self.executaArquivo(comandos[1], comandos[2] if len(comandos) >= 3 else None)
+            except OSError as e:
+                return "Não foi possível executar o arquivo: " + str(e)
+
         elif comandos[0] == "QUIT":
             # Comando de encerrar
 
             # Encerra a conexão
-            self._dict.close()
+            self.encerra()
             return None
 
         # Se o comando não for válido, retorna uma mensagem indicando isso
@@ -83,10 +159,31 @@ class Processamento:
             `key` (str): A chave da entrada que será lida.
 
         Returns:
-            List: A lista de valores da entrada.
+            Tuple[str]: Os valores da entrada.
         """
 
-        val = self._dict.root.getItem(key) # Busca os valores da entrada
+        if self._cache is None:
+            return self._getItem(key) # Busca os valores da entrada (uma cópia, em uma tupla)
+
+        # Se a entrada está no cache, não precisa chamar o servidor. Se a conexão caiu
+        # (e a thread dos avisos ainda não percebeu), o cache não vale mais
+        if self._dict.closed:
+            self.desativaCache()
+        with self._cache_lock:
+            if self._cache is not None and key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            invalidacoes = self._invalidacoes
+
+        val = self._getItem(key) # Busca os valores da entrada (uma cópia, em uma tupla)
+
+        # Só guarda os valores se nenhum aviso chegou durante a chamada: o aviso pode ser
+        # de uma alteração feita no servidor depois que os valores foram lidos
+        with self._cache_lock:
+            if self._cache is not None and self._invalidacoes == invalidacoes:
+                self._cache[key] = val
+                if len(self._cache) > self._tam_cache:
+                    self._cache.popitem(last=False) # Descarta a entrada lida há mais tempo
         
         # Retorna a lista de valores da entrada
         return val
@@ -102,7 +199,21 @@ class Processamento:
             str: Mensagem de resposta para a adição da entrada.
         """
 
-        res = self._dict.root.setItem(key, value) # Adiciona um valor novo no dicionario 
+        res = self._setItem(key, value) # Adiciona um valor novo no dicionario 
+
+        return self.respostaEscrita(key, value, res)
+
+    def respostaEscrita(self, key, value, res):
+        """Monta a mensagem de resposta para a adição de um valor.
+
+        Args:
+            `key` (str): A chave da entrada.
+            `value` (str): O valor adicionado.
+            `res` (bool): Se a entrada já existia no dicionário.
+
+        Returns:
+            str: Mensagem de resposta para a adição da entrada.
+        """
 
         # Retorna uma mensagem diferente dependendo se a entrada já existia no dicionário ou não
         if res:
@@ -120,10 +231,142 @@ class Processamento:
             str: Mensagem de resposta para remoção da entrada.
         """
         
-        res = self._dict.root.removeItem(key) # Remove um item do dicionário
+        res = self._removeItem(key) # Remove um item do dicionário
+
+        return self.respostaRemocao(key, res)
+
+    def respostaRemocao(self, key, res):
+        """Monta a mensagem de resposta para a remoção de uma entrada.
+
+        Args:
+            `key` (str): A chave da entrada.
+            `res` (bool): Se a entrada existia e foi removida.
+
+        Returns:
+            str: Mensagem de resposta para remoção da entrada.
+        """
 
         # Retorna uma mensagem diferente dependendo se a entrada já existia no dicionário ou não
         if res:
             return "Entrada '" + key + "' removida do dicionario."
         
-        return "Entrada '" + key + "' não encontrada no dicionario."
\ No newline at end of file
+        return "Entrada '" + key + "' não encontrada no dicionario."
+
+    def leEntradas(self, keys):
+        """Busca os valores de várias entradas do dicionário em uma única chamada.
+
+        Args:
+            `keys` (List[str]): As chaves das entradas que serão lidas.
+
+        Returns:
+            Tuple[Tuple]: Os valores de cada entrada, na ordem das chaves.
+        """
+
+        # As chaves vão em uma tupla, que é copiada para o servidor (uma lista seria acessada remotamente)
+        return self._dict.root.getMany(tuple(keys))
+
+    def escreveEntradas(self, pares):
+        """Adiciona vários pares (chave, valor) no dicionário em uma única chamada.
+
+        Args:
+            `pares` (List[Tuple]): Os pares `(chave, valor)` que serão adicionados.
+
+        Returns:
+            Tuple[bool]: Para cada par, se a entrada já existia no dicionário.
+        """
+
+        return self._dict.root.setMany(tuple((key, value) for key, value in pares))
+
+    def removeEntradas(self, keys):
+        """Remove várias entradas do dicionário em uma única chamada.
+
+        Args:
+            `keys` (List[str]): As chaves das entradas que serão removidas.
+
+        Returns:
+            Tuple[bool]: Para cada chave, se a entrada existia e foi removida.
+        """
+
+        return self._dict.root.removeMany(tuple(keys))
+
+    def operacaoArquivo(self, linha):
+        """Converte uma linha de um arquivo de comandos na operação correspondente do servidor.
+
+        Args:
+            `linha` (str): A linha, com um comando READ, WRITE ou REMOVE.
+
+        Returns:
+            Tuple: A operação (ver `Dicionario.exposed_batch`), ou None se o comando for inválido.
+        """
+
+        comandos = linha.split(' ')
+
+        if comandos[0] == "READ" and len(comandos) >= 2:
+            return ("get", comandos[1])
+        if comandos[0] == "WRITE" and len(comandos) >= 3:
+            return ("set", comandos[1], comandos[2])
+        if comandos[0] == "REMOVE" and len(comandos) >= 2:
+            return ("remove", comandos[1])
+        return None
+
+    def enviaLote(self, lote):
+        """Envia as operações válidas de um lote em uma única chamada e monta as respostas.
+
+        Args:
+            `lote` (List[Tuple]): Pares `(linha, operação)` (a operação é None se o comando for inválido).
+
+        Returns:
+            List[str]: A resposta de cada linha, na ordem do lote.
+        """
+
+        validas = tuple(op for _, op in lote if op is not None)
+        resultados = iter(self._dict.root.batch(validas) if validas else ())
+
+        respostas = []
+        for linha, op in lote:
+            if op is None:
+                respostas.append("COMANDO '" + linha.split(' ')[0] + "' INVALIDO")
+            elif op[0] == "get":
+                respostas.append(str(list(next(resultados))))
+            elif op[0] == "set":
+                respostas.append(self.respostaEscrita(op[1], op[2], next(resultados)))
+            else:
+                respostas.append(self.respostaRemocao(op[1], next(resultados)))
+        return respostas
+
+    def executaArquivo(self, path, saida=None):
+        """Executa os comandos (READ, WRITE e REMOVE, um por linha) de um arquivo, enviando
+        até `_TAM_LOTE` comandos ao servidor em cada chamada, em vez de uma chamada por comando.
+
+        Args:
+            `path` (str): Caminho do arquivo de comandos.
+            `saida` (str, optional): Caminho do arquivo onde as respostas são escritas, uma por linha.
+
+        Returns:
+            str: Resumo da execução.
+        """
+
+        n_comandos, n_lotes, n_invalidos = 0, 0, 0
+        with open(path, 'r') as f, open(saida or os.devnull, 'w') as out:
+            lote = []
+            for linha in f:
+                linha = linha.strip()
+                if not linha: # Ignora linhas vazias
+                    continue
+
+                op = self.operacaoArquivo(linha)
+                n_invalidos += op is None
+                lote.append((linha, op))
+
+                if len(lote) == self._TAM_LOTE:
+                    out.writelines(resp + "\n" for resp in self.enviaLote(lote))
+                    n_comandos, n_lotes, lote = n_comandos + len(lote), n_lotes + 1, []
+
+            if lote:
+                out.writelines(resp + "\n" for resp in self.enviaLote(lote))
+                n_comandos, n_lotes = n_comandos + len(lote), n_lotes + 1
+
+        resumo = str(n_comandos) + " comandos executados em " + str(n_lotes) + " chamadas (" + str(n_invalidos) + " inválidos)."
+        if saida:
+            resumo += " Respostas salvas em " + saida
+        return resumo
\ No newline at end of file
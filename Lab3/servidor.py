@@ -1,21 +1,98 @@
 from dados import Dicionario
-from rpyc.utils.server import ThreadedServer
+from rpyc.utils.server import ThreadedServer, ThreadPoolServer
 
 import sys
+import select
+import socket
+
+class EpollPoll:
+    """Objeto de polling com epoll, no formato usado pelo `ThreadPoolServer` do rpyc.
+    O `poll` padrão do rpyc só percebe uma conexão registrada enquanto ele está esperando
+    na próxima espera (até 0.1s depois), o que atrasa cada chamada que chega nela. No epoll,
+    o registro vale na hora."""
+
+    def __init__(self):
+        self._epoll = select.epoll()
+
+        # Eventos do epoll e as letras que o rpyc usa para eles
+        self._MASCARAS = ((select.EPOLLIN | select.EPOLLPRI, "r"), (select.EPOLLOUT, "w"), (select.EPOLLERR, "e"),
+                          (select.EPOLLHUP | select.EPOLLRDHUP, "h"))
+
+    def register(self, fd, mode):
+        flags = 0
+        for evento, letra in self._MASCARAS:
+            if letra in mode:
+                flags |= evento
+        self._epoll.register(fd, flags)
+
+    def modify(self, fd, mode):
+        self.unregister(fd)
+        self.register(fd, mode)
+
+    def unregister(self, fd):
+        self._epoll.unregister(fd)
+
+    def poll(self, timeout=None):
+        return [(fd, "".join(letra for evento, letra in self._MASCARAS if evt & evento))
+                for fd, evt in self._epoll.poll(-1 if timeout is None else timeout)]
+
+class ServidorTrabalhadores(ThreadPoolServer):
+    """Servidor do rpyc que executa as chamadas com um número fixo de threads (ver `ThreadPoolServer`),
+    usando epoll quando ele existe."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if hasattr(select, 'epoll'):
+            self.poll_object = EpollPoll()
+
+    def close(self):
+        """Encerra o servidor e as conexões dos clientes. O `ThreadPoolServer` não fecha as conexões
+        que estão esperando chamadas, e cada uma delas seria fechada no fim do programa esperando
+        uma resposta do cliente."""
+
+        super().close()
+        for conn in list(self.fd_to_conn.values()):
+            try:
+                conn._channel.stream.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+        self.fd_to_conn.clear()
 
 if __name__ == '__main__':
     # Define os parametros padroes
     porta = 5016
     dict_path = 'dict.json'
 
+    # Separa as opções (no formato --opcao ou --opcao=valor) dos parametros posicionais
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    opcoes = dict(arg[2:].partition('=')[::2] for arg in sys.argv[1:] if arg.startswith('--'))
+
     # Pega os parametros da linha de comando
-    arg_len = len(sys.argv)
+    arg_len = len(args)
+    if arg_len >= 1:
+        porta = int(args[0])
     if arg_len >= 2:
-        porta = int(sys.argv[1])
-    if arg_len >= 3:
-        dict_path = sys.argv[2]
+        dict_path = args[1]
+
+    # Pega as opções de persistência: quando as alterações são gravadas em disco
+    # (--persistencia=sempre, intervalo ou escritas) e se as chamadas esperam a gravação
+    politica = opcoes.get('persistencia') or 'sempre'
+    intervalo = float(opcoes['intervalo']) / 1000 if opcoes.get('intervalo') else 0.05
+    n_escritas = int(opcoes.get('escritas') or 100)
+    duravel = 'assincrona' not in opcoes
+
+    # Com a opção --trabalhadores=[n], as chamadas são executadas por um grupo fixo de n threads
+    # em vez de uma thread por conexão (o número de threads não cresce com o número de clientes)
+    trabalhadores = int(opcoes.get('trabalhadores') or 0)
 
     # Executa o servidor
-    serv = ThreadedServer(Dicionario(dict_path), port=porta)
+    dicionario = Dicionario(dict_path, politica=politica, intervalo=intervalo, n_escritas=n_escritas, duravel=duravel)
+    if trabalhadores > 0:
+        serv = ServidorTrabalhadores(dicionario, port=porta, nbThreads=trabalhadores)
+    else:
+        serv = ThreadedServer(dicionario, port=porta)
     serv.start()
-    
\ No newline at end of file
+
+    # Ao encerrar o servidor (Ctrl+C), grava as alterações pendentes e salva o dicionario inteiro
+    dicionario.encerra()